@@ -0,0 +1,124 @@
+"""
+Benchmarks the selector and calldata helpers of `scripts/calldata.py` against the
+ones previously copied in the scripts and tests:
+
+    python benchmarks/bench_calldata.py --calls 2000 --portions 64
+
+- `selectors`: `from_call_to_call_array`, which computed a keccak per call;
+- `multicall hash`: `hash_multicall` of the same calls sent with new nonces,
+  the call hashes are cached instead of recomputed;
+- `uint arrays`: `uarr2cd(uint_array(values))` against `encode_uint_array`;
+- `abi encoding`: `set_vesting_params` of AstralyIDOContract with `--portions`
+  portions, built by hand against `CalldataEncoder`.
+
+Every result is checked against the previous helpers.
+"""
+import argparse
+import os
+import sys
+import time
+
+from starkware.cairo.common.hash_state import compute_hash_on_elements
+from starkware.starknet.public.abi import get_selector_from_name
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from utils import get_contract_def  # noqa: E402
+
+import calldata  # noqa: E402
+
+SELECTORS = ["transfer", "approve", "deposit", "harvestRewards", "burn", "participate"]
+
+
+def legacy_to_uint(a):
+    return (a & ((1 << 128) - 1), a >> 128)
+
+
+def legacy_uint_array(l):
+    return list(map(legacy_to_uint, l))
+
+
+def legacy_uarr2cd(arr):
+    acc = [len(arr)]
+    for lo, hi in arr:
+        acc.append(lo)
+        acc.append(hi)
+    return acc
+
+
+def legacy_from_call_to_call_array(calls):
+    call_array = []
+    calldata = []
+    for i, call in enumerate(calls):
+        assert len(call) == 3, "Invalid call parameters"
+        entry = (call[0], get_selector_from_name(
+            call[1]), len(calldata), len(call[2]))
+        call_array.append(entry)
+        calldata.extend(call[2])
+    return (call_array, calldata)
+
+
+def legacy_hash_multicall(sender, calls, nonce, max_fee):
+    hash_array = []
+    for call in calls:
+        call_elements = [call[0], call[1], compute_hash_on_elements(call[2])]
+        hash_array.append(compute_hash_on_elements(call_elements))
+
+    message = [
+        calldata.str_to_felt('StarkNet Transaction'),
+        sender,
+        compute_hash_on_elements(hash_array),
+        nonce,
+        max_fee,
+        calldata.TRANSACTION_VERSION
+    ]
+    return compute_hash_on_elements(message)
+
+
+def compare(name, count, legacy, new):
+    start = time.perf_counter()
+    expected = legacy()
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    result = new()
+    seconds = time.perf_counter() - start
+    assert result == expected, f"{name} differs from the previous helpers"
+    print(f"{name:<16} {count:>7} x  before {legacy_seconds:>8.4f}s  after {seconds:>8.4f}s  "
+          f"{legacy_seconds / seconds:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--portions", type=int, default=64, help="vesting portions of set_vesting_params")
+    args = parser.parse_args()
+
+    calls = [(0x1234 + i % 3, SELECTORS[i % len(SELECTORS)], [i % 5, 0, 7]) for i in range(args.calls)]
+    compare("selectors", len(calls),
+            lambda: legacy_from_call_to_call_array(calls),
+            lambda: calldata.from_call_to_call_array(calls))
+
+    # one call per transaction, nonces 0..7 of each of them
+    hashed = [(to, get_selector_from_name(name), data) for to, name, data in calls[:args.calls // 8]]
+    transactions = [([call], nonce) for nonce in range(8) for call in hashed]
+    compare("multicall hash", len(transactions),
+            lambda: [legacy_hash_multicall(0x42, c, nonce, 0) for c, nonce in transactions],
+            lambda: [calldata.hash_multicall(0x42, c, nonce, 0) for c, nonce in transactions])
+
+    values = [10 ** 18 * i for i in range(args.calls)]
+    compare("uint arrays", 100,
+            lambda: [legacy_uarr2cd(legacy_uint_array(values)) for _ in range(100)],
+            lambda: [calldata.encode_uint_array(values) for _ in range(100)])
+
+    encoder = calldata.CalldataEncoder(get_contract_def("AstralyIDOContract.cairo").abi)
+    times = [1_700_000_000 + 86400 * i for i in range(args.portions)]
+    percents = [1000 // args.portions] * args.portions
+    compare("abi encoding", args.calls,
+            lambda: [[len(times), *times, *legacy_uarr2cd(legacy_uint_array(percents)), 0]
+                     for _ in range(args.calls)],
+            lambda: [encoder.encode("set_vesting_params", times, percents, 0) for _ in range(args.calls)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares looking deployments up by scanning `{network}.deployments.txt` (what
+`nre.get_deployment` does) with `DeploymentRegistry`, built by parsing the
+deployments file directly or loaded from its pickled cache.
+
+    python benchmarks/bench_deployment_registry.py --deployments 2000 --lookups 300
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from nile import deployments  # noqa: E402
+from nile.common import DEPLOYMENTS_FILENAME  # noqa: E402
+from deployment_registry import DeploymentRegistry  # noqa: E402
+
+NETWORK = "bench"
+
+
+def write_abi(path, nb_functions):
+    abi = [{"type": "function", "name": f"function_{i}", "stateMutability": "view",
+            "inputs": [{"name": "account", "type": "felt"}],
+            "outputs": [{"name": "balance", "type": "Uint256"}]}
+           for i in range(nb_functions)]
+    with open(path, "w") as f:
+        json.dump(abi, f)
+
+
+def populate(nb_deployments, nb_abis, nb_functions):
+    abis = [f"abis/contract_{i}.json" for i in range(nb_abis)]
+    os.mkdir("abis")
+    for path in abis:
+        write_abi(path, nb_functions)
+    aliases = [f"contract_{i}" for i in range(nb_deployments)]
+    with open(f"{NETWORK}.{DEPLOYMENTS_FILENAME}", "w") as f:
+        for alias in aliases:
+            f.write(f"{hex(random.getrandbits(251))}:{random.choice(abis)}:{alias}\n")
+    return aliases
+
+
+def scan(identifiers):
+    """`nre.get_deployment`: one pass over the file per lookup."""
+    return [next(deployments.load(identifier, NETWORK)) for identifier in identifiers]
+
+
+def registry(identifiers, rebuild):
+    if rebuild and os.path.exists(f"{NETWORK}.deployments.cache"):
+        os.remove(f"{NETWORK}.deployments.cache")
+    indexed = DeploymentRegistry(NETWORK)
+    return [indexed.get(identifier) for identifier in identifiers]
+
+
+def measure(name, repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    print(f"{name:<28} {min(times) * 1e3:>10.2f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deployments", type=int, default=2_000,
+                        help="lines of the deployments file")
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--abis", type=int, default=20, help="distinct ABI files")
+    parser.add_argument("--functions", type=int, default=40, help="functions per ABI")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            aliases = populate(args.deployments, args.abis, args.functions)
+            identifiers = random.choices(aliases, k=args.lookups)
+            print(f"{args.lookups} lookups, {args.deployments} deployments, {args.abis} ABIs")
+
+            expected = measure("scan per lookup", args.repeat, lambda: scan(identifiers))
+            parsed = measure("registry, parse the file", args.repeat,
+                             lambda: registry(identifiers, rebuild=True))
+            cached = measure("registry, pickled cache", args.repeat,
+                             lambda: registry(identifiers, rebuild=False))
+            assert expected == parsed == cached, "registry lookups differ from the scan"
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmarks `generate_merkle_root`, `generate_merkle_proof` and `verify_merkle_proof`
+of both `scripts/utils.py` and `tests/utils.py`.
+
+Every (path, leaves) case runs in a fresh process so its peak RSS is its own.
+Results are written as JSON and can be compared with a previous run:
+
+    python benchmarks/bench_merkle.py --output merkle.json
+    python benchmarks/bench_merkle.py --sizes 1000,10000 --compare merkle.json
+
+Pedersen hashing runs at a few hundred to a thousand hashes per second per core,
+so a plain run only covers 1k and 10k leaves and takes a few minutes. Larger
+trees are opt-in, a 1M leaves root alone takes from twenty minutes to an hour:
+
+    python benchmarks/bench_merkle.py --sizes 100000,1000000 --output merkle_large.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PATHS = {
+    "scripts": os.path.join(ROOT, "scripts", "utils.py"),
+    "tests": os.path.join(ROOT, "tests", "utils.py"),
+}
+DEFAULT_LEAVES = "1000,10000"
+
+
+class HashCounter:
+    """Wraps `pedersen_hash` in the namespace of `modules` to count its calls."""
+
+    def __init__(self, *modules):
+        self.count = 0
+        self.hash = modules[0].pedersen_hash
+        for module in modules:
+            module.pedersen_hash = self
+
+    def __call__(self, a, b):
+        self.count += 1
+        return self.hash(a, b)
+
+
+def load_utils(name):
+    path = PATHS[name]
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(f"{name}_utils", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate_proof(name, utils, leaves, index, cached_level):
+    if name == "scripts":
+        # scripts/utils.py returns hex strings and caches the levels between proofs
+        return [int(x, 16) for x in utils.generate_merkle_proof(list(leaves), index, cached_level)]
+    return utils.generate_merkle_proof(list(leaves), index)
+
+
+def timed(operation, counter, func):
+    counter.count = 0
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    return result, {
+        "operation": operation,
+        "seconds": seconds,
+        "hashes": counter.count,
+        "hashes_per_second": counter.count / seconds if seconds > 0 else None,
+    }
+
+
+def run_case(name, nb_leaves, nb_proofs, seed):
+    """Runs in a worker process, returns the measures of one (path, leaves) case."""
+    utils = load_utils(name)
+    # scripts/utils.py builds its levels through scripts/merkle.py
+    counter = HashCounter(utils, *([sys.modules["merkle"]] if name == "scripts" else []))
+    rng = random.Random(seed)
+    leaves = [rng.getrandbits(251) for _ in range(nb_leaves)]
+    indices = rng.sample(range(nb_leaves), min(nb_proofs, nb_leaves))
+
+    measures = []
+    root, measure = timed("generate_merkle_root", counter,
+                          lambda: utils.generate_merkle_root(list(leaves)))
+    measures.append(measure)
+
+    cached_level = {"1": [], "2": []}
+    proofs, measure = timed("generate_merkle_proof", counter, lambda: [
+        generate_proof(name, utils, leaves, i, cached_level) for i in indices])
+    measures.append(measure)
+
+    valid, measure = timed("verify_merkle_proof", counter, lambda: [
+        utils.verify_merkle_proof(leaves[i], proof + [root]) for i, proof in zip(indices, proofs)])
+    measures.append(measure)
+    assert all(valid), f"{name}: invalid proof"
+
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for measure in measures:
+        measure.update({"path": name, "leaves": nb_leaves, "calls": 1 if measure["operation"]
+                       == "generate_merkle_root" else len(indices), "peak_rss_kb": peak_rss_kb})
+    return measures
+
+
+def key(result):
+    return result["path"], result["leaves"], result["operation"]
+
+
+def report(results, baseline=None):
+    previous = {key(r): r for r in (baseline or {}).get("results", [])}
+    print(f"{'path':<8} {'leaves':>8} {'operation':<22} {'calls':>5} {'seconds':>10} "
+          f"{'hashes/s':>9} {'peak RSS':>10}" + ("  vs baseline" if previous else ""))
+    for r in results:
+        line = (f"{r['path']:<8} {r['leaves']:>8} {r['operation']:<22} {r['calls']:>5} "
+                f"{r['seconds']:>10.3f} {r['hashes_per_second'] or 0:>9.0f} "
+                f"{r['peak_rss_kb'] / 1024:>8.1f}MB")
+        old = previous.get(key(r))
+        if old is not None and old["seconds"] > 0:
+            line += f"  x{r['seconds'] / old['seconds']:.2f} time, " \
+                f"x{r['peak_rss_kb'] / old['peak_rss_kb']:.2f} RSS"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", "--leaves", dest="leaves", default=DEFAULT_LEAVES,
+                        help=f"comma separated leaf counts, {DEFAULT_LEAVES} by default")
+    parser.add_argument("--paths", default=",".join(PATHS),
+                        help="comma separated among " + ", ".join(PATHS))
+    parser.add_argument("--proofs", type=int, default=4,
+                        help="proofs generated and verified per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file the results are written to")
+    parser.add_argument("--compare", help="JSON file of a previous run")
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.leaves.split(",")]
+    paths = args.paths.split(",")
+    for name in paths:
+        if name not in PATHS:
+            parser.error(f"unknown path {name}")
+
+    results = []
+    for nb_leaves in sizes:
+        for name in paths:
+            # a new process per case, `spawn` so nothing is inherited from this one
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                results.extend(executor.submit(
+                    run_case, name, nb_leaves, args.proofs, args.seed).result())
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "proofs": args.proofs,
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Load test of `proof_server.py`: builds a random quests store, starts the service
+in-process and reports request latencies under concurrent load.
+
+    python benchmarks/bench_proof_server.py --leaves 4096 --requests 20000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from aiohttp import ClientSession, TCPConnector, web
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from merkle_store import MerkleStore  # noqa: E402
+from proof_server import ProofService  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def load(url, addresses, nb_requests, concurrency):
+    latencies = []
+    queue = [random.choice(addresses) for _ in range(nb_requests)]
+
+    async def worker(session):
+        while queue:
+            address = queue.pop()
+            start = time.perf_counter()
+            async with session.get(f"{url}/proof/{hex(address)}") as response:
+                assert response.status == 200
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def report(name, latencies, elapsed):
+    ms = [x * 1000 for x in latencies]
+    print(f"{name:<6} {len(ms) / elapsed:>9.0f} req/s  p50 {percentile(ms, 50):>7.2f}ms  "
+          f"p99 {percentile(ms, 99):>7.2f}ms  max {max(ms):>7.2f}ms  mean {statistics.mean(ms):>7.2f}ms")
+
+
+async def run(args, store):
+    service = ProofService(store, args.cache_size)
+    runner = web.AppRunner(service.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    url = f"http://127.0.0.1:{args.port}"
+    addresses = [store.get_record(i)[0] for i in range(len(store))]
+    try:
+        report("cold", *await load(url, addresses, args.requests, args.concurrency))
+        report("warm", *await load(url, addresses, args.requests, args.concurrency))
+        print(service.cache_info())
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--leaves", type=int, default=4096)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    recipients = list({random.getrandbits(251) for _ in range(args.leaves)})
+    amounts = [random.randint(1, 10) for _ in recipients]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        with ProcessPoolExecutor() as executor:
+            store = MerkleStore.create(os.path.join(
+                tmp, "bench.merkle"), recipients, amounts, executor)
+        print(f"store of {args.leaves} leaves built in {time.perf_counter() - start:.2f}s")
+        with store:
+            asyncio.run(run(args, store))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares the per-account `count_documents` loop with the streamed aggregation
+used by `generate_quest_data.py`, against the in-memory Mongo stand-in.
+
+    python benchmarks/bench_quest_data.py --accounts 10000 --latency 0.0005
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from memory_mongo import MemoryClient  # noqa: E402
+from generate_quest_data import IDO_ID, quest_counts  # noqa: E402
+
+
+def populate(db, nb_accounts, max_quests):
+    accounts = [hex(random.getrandbits(251)) for _ in range(nb_accounts)]
+    db.accounts.insert_many([{"address": a} for a in accounts])
+    history = []
+    for address in accounts:
+        for _ in range(random.randint(0, max_quests)):
+            history.append({"address": address, "idoId": IDO_ID})
+    db.questsHistory.insert_many(history)
+
+
+def count_per_account(db):
+    """Previous implementation: one round-trip per account."""
+    for account in db.accounts.find():
+        address = account['address']
+        nb_quest = db.questsHistory.count_documents(
+            {"address": address, "idoId": IDO_ID})
+        if nb_quest > 0:
+            yield int(address, 16), nb_quest
+
+
+def measure(name, db, func):
+    db.round_trips = 0
+    start = time.perf_counter()
+    result = dict(func(db))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<20} {elapsed:>8.3f}s {db.round_trips:>8} round-trips {len(result):>8} recipients")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=2_000)
+    parser.add_argument("--max-quests", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0005,
+                        help="simulated seconds per round-trip")
+    args = parser.parse_args()
+
+    db = MemoryClient(latency=args.latency)['zkpad-dev']
+    populate(db, args.accounts, args.max_quests)
+
+    old = measure("count_documents", db, count_per_account)
+    new = measure("aggregate", db, lambda db: quest_counts(db, IDO_ID))
+    assert old == new, "aggregation results differ from count_documents"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares waiting for each transaction in turn, as `nile debug` did, with the
+batched `ReceiptTracker`, against the local gateway stand-in.
+
+    python benchmarks/bench_receipts.py --transactions 50 --block-time 1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import ClientSession, web
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from gateway_stub import GatewayStub  # noqa: E402
+from receipt_tracker import ReceiptTracker, TransactionRejected  # noqa: E402
+
+
+async def submit(session, url):
+    async with session.post(f"{url}/gateway/add_transaction", json={}) as response:
+        return (await response.json())["transaction_hash"]
+
+
+async def one_by_one(session, url, nb_transactions, poll_interval):
+    """Previous behaviour: every transaction waits for the previous one to be accepted."""
+    async with ReceiptTracker(f"{url}/feeder_gateway", poll_interval) as tracker:
+        for _ in range(nb_transactions):
+            try:
+                await tracker.track(await submit(session, url))
+            except TransactionRejected:
+                pass
+        return tracker.requests
+
+
+async def batched(session, url, nb_transactions, poll_interval):
+    async with ReceiptTracker(f"{url}/feeder_gateway", poll_interval) as tracker:
+        futures = [tracker.track(await submit(session, url))
+                   for _ in range(nb_transactions)]
+        await asyncio.gather(*futures, return_exceptions=True)
+        return tracker.requests
+
+
+async def run(args):
+    stub = GatewayStub(args.block_time, args.reject_rate, seed=0)
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with ClientSession() as session:
+            for name, track in (("one by one", one_by_one), ("batched", batched)):
+                start = time.perf_counter()
+                requests = await track(session, url, args.transactions, args.poll_interval)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<12} {elapsed:>8.2f}s {requests:>8} status requests "
+                      f"for {args.transactions} transactions")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=50)
+    parser.add_argument("--block-time", type=float, default=1.0)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--reject-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmarks the transaction signing of `tests/signers.py` against nile's
+`Signer.sign_transaction`, which the tests used to go through:
+
+    python benchmarks/bench_signing.py --transactions 200 --workers 4
+
+`cold` signs transactions never seen before, `cached` signs them again (e.g. the
+same transaction replayed on the fixture snapshot of another test) and `batch`
+signs them ahead of time with `sign_batch`. Every signature is checked against
+nile's.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from nile.signer import Signer  # noqa: E402
+
+import signers  # noqa: E402
+
+ACCOUNT = 0x3a0fd5d2aeb1ea1fa5d6ad0a4a1e6b1e3b5a9fc1d2d5e7c3c1f2f4b6e8a0c2d
+LOTTERY = 0x1c3b5d7f9e1a3c5e7a9c1e3a5c7e9a1c3e5a7c9e1a3c5e7a9c1e3a5c7e9a1c3
+
+
+def transactions(count):
+    # lottery burns, one per nonce
+    return [(ACCOUNT, [(LOTTERY, "burn", [ACCOUNT, 0, 0, 1, 0])], nonce) for nonce in range(count)]
+
+
+def timed(name, count, func):
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    print(f"{name:<8} {count:>6} transactions in {seconds:>7.3f}s, {count / seconds:>8.1f}/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--private-key", type=int, default=1234)
+    args = parser.parse_args()
+    txs = transactions(args.transactions)
+
+    nile_signer = Signer(args.private_key)
+    expected = timed("nile", len(txs), lambda: [
+        list(nile_signer.sign_transaction(
+            hex(account), [[hex(to), name, data] for to, name, data in calls], nonce, 0)[2:])
+        for account, calls, nonce in txs])
+
+    signer = signers.MockSigner(args.private_key)
+    cold = timed("cold", len(txs), lambda: [
+        signer.sign_transaction(account, calls, nonce)[3] for account, calls, nonce in txs])
+    cached = timed("cached", len(txs), lambda: [
+        signer.sign_transaction(account, calls, nonce)[3] for account, calls, nonce in txs])
+
+    # fresh caches, the batch signs everything
+    signers._transaction_hashes.clear()
+    signer = signers.MockSigner(args.private_key)
+    batch = timed("batch", len(txs), lambda: signer.sign_batch(txs, max_workers=args.workers))
+
+    for name, signatures in (("cold", cold), ("cached", cached), ("batch", batch)):
+        assert signatures == expected, f"{name} signatures differ from nile's"
+
+
+if __name__ == "__main__":
+    main()
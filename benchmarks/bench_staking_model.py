@@ -0,0 +1,72 @@
+"""
+Measures how many random operation sequences per second the Python model of the
+`AstralyStaking` reward accounting (`tests/staking_model.py`) generates and runs,
+and how often each operation reverts.
+
+    python benchmarks/bench_staking_model.py --sequences 100000 --length 20
+
+Sequences are split between `--workers` processes, each seeded from `--seed`.
+Failing sequences can be replayed against the contract with
+`pytest tests/test_staking_model.py --staking-seed SEED`.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from staking_model import StakingModel, random_sequence  # noqa: E402
+
+
+def run_chunk(seed, sequences, length, users):
+    """Runs in a worker process, returns the (operation, error) counts."""
+    rng = random.Random(seed)
+    counts = Counter()
+    for _ in range(sequences):
+        ops, errors = random_sequence(rng, length, users, StakingModel())
+        counts.update((op[0], error) for op, error in zip(ops, errors))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sequences", type=int, default=100_000)
+    parser.add_argument("--length", type=int, default=20, help="operations per sequence")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks = [args.sequences // args.workers + (i < args.sequences % args.workers)
+              for i in range(args.workers)]
+    start = time.perf_counter()
+    counts = Counter()
+    with ProcessPoolExecutor(args.workers) as executor:
+        for result in executor.map(run_chunk, [args.seed + i for i in range(args.workers)], chunks,
+                                   [args.length] * args.workers, [args.users] * args.workers):
+            counts.update(result)
+    seconds = time.perf_counter() - start
+
+    print(f"{args.sequences} sequences of {args.length} operations in {seconds:.2f}s "
+          f"with {args.workers} workers: {args.sequences / seconds:,.0f} sequences/s, "
+          f"{args.sequences * args.length / seconds:,.0f} operations/s")
+    operations = Counter()
+    for (name, _), count in counts.items():
+        operations[name] += count
+    for name, total in operations.most_common():
+        print(f"  {name:<40} {total:>9} ops, {counts[name, None] / total:>6.1%} went through")
+    errors = Counter()
+    for (_, error), count in counts.items():
+        if error is not None:
+            errors[error.split(" lower than")[0] if error.startswith("timestamp") else error] += count
+    for error, count in errors.most_common(8):
+        print(f"  {count:>9} x {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+"""
+Cairo steps of the staking, lottery and IDO entry points in representative states,
+checked against the committed baseline `benchmarks/steps_baseline.json`.
+
+    python benchmarks/bench_steps.py                     # exits 1 if steps regressed
+    python benchmarks/bench_steps.py -k depositLP -k harvest
+    python benchmarks/bench_steps.py --update-baseline   # after an intended change
+
+Each scenario runs at several scales (whitelisted LP tokens, vesting portions,
+quests tree leaves, ...). The state of a scale is built once and every scenario
+measures one transaction on a snapshot of it. Resources are those of the measured
+call, nested calls included, without the account `__execute__` around it.
+Addresses and block times are fixed so the steps are the same on every run.
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+import cachetools  # noqa: E402
+from starkware.starknet.core.os.class_hash import set_class_hash_cache  # noqa: E402
+from starkware.starknet.public.abi import get_selector_from_name  # noqa: E402
+from starkware.starknet.testing.starknet import Starknet  # noqa: E402
+
+from signers import MockSigner  # noqa: E402
+from utils import (  # noqa: E402
+    MAX_UINT256, cached_contract, generate_merkle_proof, generate_merkle_root, get_contract_def,
+    get_leaves, set_block_number, set_block_timestamp, snapshot_state, str_to_felt, to_uint,
+    uarr2cd, uint_array
+)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "steps_baseline.json")
+THRESHOLD = 0.02
+
+ACCOUNT = "openzeppelin/account/presets/Account.cairo"
+PROXY = "openzeppelin/upgrades/presets/Proxy.cairo"
+ERC20 = "mocks/test_erc20.cairo"
+
+NOW = 1_660_000_000
+ONE_DAY = 24 * 60 * 60
+LOCK_DAYS = 365
+ETHER = 10 ** 18
+
+owner = MockSigner(1234)
+user = MockSigner(2345)
+admin = MockSigner(3456)
+sale_owner = MockSigner(4567)
+
+
+class World:
+    """
+    Contracts deployed on one `StarknetState`, reachable as attributes.
+
+    `fork` rebinds every contract to a copy-on-write snapshot of the state, the
+    world itself must not change once it has been forked.
+    """
+
+    def __init__(self, state, contracts=None, salt=0):
+        self.state = state
+        self.contracts = {} if contracts is None else contracts
+        # deployments use increasing salts so addresses, and steps, are reproducible
+        self.salt = salt
+
+    async def declare(self, path):
+        return await Starknet(self.state).declare(contract_class=get_contract_def(path))
+
+    async def deploy(self, name, path, calldata=(), interface=None):
+        """Deploys `path` as `name`, with the ABI of `interface` if given (proxies)."""
+        self.salt += 1
+        deployed = await Starknet(self.state).deploy(
+            contract_class=get_contract_def(path), contract_address_salt=self.salt,
+            constructor_calldata=list(calldata))
+        definition = get_contract_def(interface or path)
+        contract = cached_contract(self.state, definition, deployed)
+        self.contracts[name] = (definition, contract)
+        return contract
+
+    def add(self, name, path, address):
+        """Registers a contract deployed by another contract, e.g. by the IDO factory."""
+        definition = get_contract_def(path)
+        contract = cached_contract(self.state, definition, namedtuple(
+            "Deployed", "contract_address deploy_execution_info")(address, None))
+        self.contracts[name] = (definition, contract)
+        return contract
+
+    def fork(self):
+        state = snapshot_state(self.state)
+        world = World(state, {name: (definition, cached_contract(state, definition, contract))
+                              for name, (definition, contract) in self.contracts.items()})
+        # salt and the values noted by the world builder, e.g. `last_lp`
+        world.__dict__.update({key: value for key, value in vars(self).items()
+                               if key not in ("state", "contracts")})
+        return world
+
+    def __getattr__(self, name):
+        try:
+            return self.contracts[name][1]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+async def empty_world(timestamp=NOW):
+    world = World((await Starknet.empty()).state)
+    set_block_timestamp(world.state, timestamp)
+    set_block_number(world.state, 0)
+    return world
+
+
+_worlds = {}
+
+
+async def fork(builder, *args):
+    """Snapshot of the world `builder(*args)`, built on first use."""
+    key = (builder.__name__, *args)
+    if key not in _worlds:
+        _worlds[key] = await builder(*args)
+    return _worlds[key].fork()
+
+
+#
+# Worlds
+#
+
+async def staking_world(lp_tokens):
+    """
+    xZKP vault where the user staked ZKP and `lp_tokens - 1` LP tokens, the last
+    of the `lp_tokens` whitelisted LP tokens is approved but not staked yet.
+    """
+    w = await empty_world()
+    await w.deploy("owner", ACCOUNT, [owner.public_key])
+    await w.deploy("user", ACCOUNT, [user.public_key])
+    await w.deploy("zkp", "mocks/test_AstralyToken.cairo", [
+        str_to_felt("Astraly"), str_to_felt("ZKP"), 18, *to_uint(10 ** 6 * ETHER),
+        w.owner.contract_address, w.owner.contract_address, *to_uint(10 ** 12 * ETHER)])
+    staking_class = await w.declare("AstralyStaking.cairo")
+    await w.deploy("staking", PROXY, [staking_class.class_hash], interface="AstralyStaking.cairo")
+    staking = w.staking.contract_address
+
+    await owner.send_transactions(w.owner, [
+        (staking, "initializer", [
+            str_to_felt("xAstraly"), str_to_felt("xZKP"), w.zkp.contract_address,
+            w.owner.contract_address, *to_uint(10 * ETHER), 0, 10_000]),
+        (staking, "setFeePercent", [int(0.1e18)]),
+        (staking, "setHarvestDelay", [6 * 60 * 60]),
+        (staking, "setTargetFloatPercent", [int(0.1e18)]),
+        (staking, "setStakeBoost", [25]),
+        (w.zkp.contract_address, "set_vault_address", [staking]),
+        (w.zkp.contract_address, "transfer", [w.user.contract_address, *to_uint(1000 * ETHER)]),
+        (w.zkp.contract_address, "approve", [staking, *MAX_UINT256]),
+    ])
+    await user.send_transactions(w.user, [
+        (w.zkp.contract_address, "approve", [staking, *MAX_UINT256]),
+        (staking, "deposit", [*to_uint(100 * ETHER), w.user.contract_address]),
+    ])
+
+    calculator = await w.deploy("mint_calculator", "mocks/test_mint_calculator.cairo")
+    lps = [await w.deploy(f"lp{i}", ERC20, [
+        str_to_felt(f"LP {i}"), str_to_felt(f"LP{i}"), 18, *to_uint(1000 * ETHER),
+        w.user.contract_address, w.owner.contract_address]) for i in range(lp_tokens)]
+    addresses = [lp.contract_address for lp in lps]
+    await owner.send_transaction(w.owner, staking, "addWhitelistedTokens", [
+        lp_tokens, *addresses, lp_tokens, *[calculator.contract_address] * lp_tokens,
+        lp_tokens, *[0] * lp_tokens])
+    await user.send_transactions(w.user, [
+        (lp, "approve", [staking, *MAX_UINT256]) for lp in addresses] + [
+        (staking, "depositLP", [lp, *to_uint(10 * ETHER), w.user.contract_address, LOCK_DAYS])
+        for lp in addresses[:-1]])
+    w.last_lp = addresses[-1]
+    return w
+
+
+async def lottery_world():
+    """Lottery tickets of one IDO, claimable with xZKP, before the IDO launch."""
+    w = await empty_world(timestamp=0)
+    await w.deploy("owner", ACCOUNT, [owner.public_key])
+    ido_class = await w.declare("AstralyIDOContract.cairo")
+    factory = await w.deploy("factory", "AstralyIDOFactory.cairo",
+                             [ido_class.class_hash, w.owner.contract_address])
+    task = await w.deploy("task", "AstralyTask.cairo", [factory.contract_address])
+    rnd = await w.deploy("rnd", "utils/xoroshiro128_starstar.cairo", [1])
+    lottery = await w.deploy("lottery", "AstralyLotteryToken.cairo",
+                             [0, w.owner.contract_address, factory.contract_address])
+    zkp = await w.deploy("zkp", "AstralyToken.cairo", [
+        str_to_felt("Astraly"), str_to_felt("ZKP"), 18, *to_uint(10 ** 6 * ETHER),
+        w.owner.contract_address, w.owner.contract_address, *to_uint(10 ** 12 * ETHER)])
+    staking_class = await w.declare("AstralyStaking.cairo")
+    staking = await w.deploy("staking", PROXY, [staking_class.class_hash],
+                             interface="AstralyStaking.cairo")
+    await owner.send_transactions(w.owner, [
+        (staking.contract_address, "initializer", [
+            str_to_felt("xAstraly"), str_to_felt("xZKP"), zkp.contract_address,
+            w.owner.contract_address, *to_uint(10 * ETHER), 0, 10_000]),
+        (factory.contract_address, "set_task_address", [task.contract_address]),
+        (factory.contract_address, "set_lottery_ticket_contract_address", [lottery.contract_address]),
+        (factory.contract_address, "set_random_number_generator_address", [rnd.contract_address]),
+        (factory.contract_address, "create_ido", [w.owner.contract_address]),
+        (lottery.contract_address, "set_xzkp_contract_address", [staking.contract_address]),
+        (zkp.contract_address, "approve", [staking.contract_address, *MAX_UINT256]),
+    ])
+    return w
+
+
+async def sale_world(portions):
+    """
+    IDO whose tokens are deposited, sold in `portions` vesting portions, during
+    its registration window. The participant holds 1000 lottery tickets.
+    """
+    w = await empty_world()
+    for name, signer in (("owner", owner), ("admin", admin), ("sale_owner", sale_owner),
+                         ("participant", user)):
+        await w.deploy(name, ACCOUNT, [signer.public_key])
+    ido_class = await w.declare("AstralyIDOContract.cairo")
+    factory = await w.deploy("factory", "AstralyIDOFactory.cairo",
+                             [ido_class.class_hash, w.owner.contract_address])
+    task = await w.deploy("task", "AstralyTask.cairo", [factory.contract_address])
+    rnd = await w.deploy("rnd", "utils/xoroshiro128_starstar.cairo", [76823])
+    lottery = await w.deploy("lottery", "AstralyLotteryToken.cairo",
+                             [0, w.owner.contract_address, factory.contract_address])
+    zkp = await w.deploy("zkp", "AstralyToken.cairo", [
+        str_to_felt("Astraly"), str_to_felt("ZKP"), 18, *to_uint(10 ** 6 * ETHER),
+        w.sale_owner.contract_address, w.sale_owner.contract_address, *to_uint(10 ** 12 * ETHER)])
+    eth = await w.deploy("eth", "mocks/Astraly_ETH_ERC20_mock.cairo",
+                         [w.owner.contract_address, w.owner.contract_address])
+
+    await owner.send_transactions(w.owner, [
+        (factory.contract_address, "set_task_address", [task.contract_address]),
+        (factory.contract_address, "set_lottery_ticket_contract_address", [lottery.contract_address]),
+        (factory.contract_address, "set_random_number_generator_address", [rnd.contract_address]),
+        (factory.contract_address, "set_payment_token_address", [eth.contract_address]),
+        (factory.contract_address, "create_ido", [w.admin.contract_address]),
+        (eth.contract_address, "transfer", [w.participant.contract_address, *to_uint(10 * ETHER)]),
+        (lottery.contract_address, "mint", [w.participant.contract_address, 0, 0, *to_uint(1000), 0]),
+    ])
+    ido = w.add("ido", "AstralyIDOContract.cairo",
+                (await factory.get_ido_address(0).call()).result.address)
+
+    sale_end = NOW + 90 * ONE_DAY
+    w.tokens_unlock = sale_end + 7 * ONE_DAY
+    w.purchase_start = NOW + 9 * ONE_DAY
+    unlock_times = [w.tokens_unlock + i * ONE_DAY for i in range(1, portions + 1)]
+    await admin.send_transactions(w.admin, [
+        (ido.contract_address, "set_sale_params", [
+            zkp.contract_address, w.sale_owner.contract_address, *to_uint(100),
+            *to_uint(10 ** 5 * ETHER), sale_end, w.tokens_unlock, *to_uint(100 * portions),
+            *to_uint(10_000)]),
+        (ido.contract_address, "set_vesting_params", [
+            portions, *unlock_times, *uarr2cd(uint_array([100] * portions)), 0]),
+        (ido.contract_address, "set_registration_time", [NOW + ONE_DAY, NOW + 8 * ONE_DAY]),
+        (ido.contract_address, "set_purchase_round_params", [w.purchase_start, NOW + 16 * ONE_DAY]),
+    ])
+    await sale_owner.send_transactions(w.sale_owner, [
+        (zkp.contract_address, "approve", [ido.contract_address, *MAX_UINT256]),
+        (ido.contract_address, "deposit_tokens", []),
+    ])
+    set_block_timestamp(w.state, NOW + 2 * ONE_DAY)
+    w.last_unlock = unlock_times[-1]
+    return w
+
+
+async def register(w, signer, account, tickets=1000):
+    await signer.send_transaction(account, w.lottery.contract_address, "burn",
+                                  [account.contract_address, 0, 0, *to_uint(tickets)])
+
+
+async def open_purchase_round(w, registrants):
+    """Registers the participant and `registrants - 1` other accounts, then computes the allocation."""
+    await register(w, user, w.participant)
+    for i in range(1, registrants):
+        signer = MockSigner(10_000 + i)
+        account = await w.deploy(f"registrant{i}", ACCOUNT, [signer.public_key])
+        await owner.send_transaction(w.owner, w.lottery.contract_address, "mint",
+                                     [account.contract_address, 0, 0, *to_uint(1000), 0])
+        await register(w, signer, account)
+    set_block_timestamp(w.state, w.purchase_start + 60)
+    await admin.send_transaction(w.admin, w.ido.contract_address, "calculate_allocation", [])
+    await user.send_transaction(w.participant, w.eth.contract_address, "approve",
+                                [w.ido.contract_address, *MAX_UINT256])
+
+
+#
+# Scenarios
+#
+
+Scenario = namedtuple("Scenario", "name scale values run")
+SCENARIOS = []
+
+
+def scenario(name, scale, values):
+    def register_scenario(run):
+        SCENARIOS.append(Scenario(name, scale, values, run))
+        return run
+    return register_scenario
+
+
+LP_TOKENS = [1, 4, 16]
+
+
+@scenario("deposit", "lp_tokens", LP_TOKENS)
+async def bench_deposit(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    set_block_number(w.state, 10)
+    return await user.send_transaction(w.user, w.staking.contract_address, "deposit",
+                                       [*to_uint(10 * ETHER), w.user.contract_address])
+
+
+@scenario("depositForTime", "lp_tokens", LP_TOKENS)
+async def bench_deposit_for_time(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    set_block_number(w.state, 10)
+    return await user.send_transaction(w.user, w.staking.contract_address, "depositForTime",
+                                       [*to_uint(10 * ETHER), w.user.contract_address, 730])
+
+
+@scenario("depositLP", "lp_tokens", LP_TOKENS)
+async def bench_deposit_lp(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    return await user.send_transaction(w.user, w.staking.contract_address, "depositLP", [
+        w.last_lp, *to_uint(10 * ETHER), w.user.contract_address, LOCK_DAYS])
+
+
+@scenario("redeem", "lp_tokens", LP_TOKENS)
+async def bench_redeem(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    set_block_timestamp(w.state, NOW + (LOCK_DAYS + 1) * ONE_DAY)
+    set_block_number(w.state, 10)
+    return await user.send_transaction(w.user, w.staking.contract_address, "redeem", [
+        *to_uint(10 * ETHER), w.user.contract_address, w.user.contract_address])
+
+
+@scenario("withdrawLP", "lp_tokens", LP_TOKENS)
+async def bench_withdraw_lp(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    await user.send_transaction(w.user, w.staking.contract_address, "depositLP", [
+        w.last_lp, *to_uint(10 * ETHER), w.user.contract_address, LOCK_DAYS])
+    set_block_timestamp(w.state, NOW + (LOCK_DAYS + 1) * ONE_DAY)
+    return await user.send_transaction(w.user, w.staking.contract_address, "withdrawLP", [
+        w.last_lp, *to_uint(10 * ETHER), w.user.contract_address, w.user.contract_address])
+
+
+@scenario("harvestRewards", "lp_tokens", LP_TOKENS)
+async def bench_harvest_rewards(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    set_block_number(w.state, 10)
+    return await user.send_transaction(w.user, w.staking.contract_address, "harvestRewards", [])
+
+
+@scenario("getUserStakeInfo", "lp_tokens", LP_TOKENS)
+async def bench_get_user_stake_info(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    return await user.send_transaction(w.user, w.staking.contract_address, "getUserStakeInfo",
+                                       [w.user.contract_address])
+
+
+@scenario("addWhitelistedToken", "lp_tokens", LP_TOKENS)
+async def bench_add_whitelisted_token(lp_tokens):
+    w = await fork(staking_world, lp_tokens)
+    return await owner.send_transaction(w.owner, w.staking.contract_address, "addWhitelistedToken",
+                                        [0x1234, w.mint_calculator.contract_address, 0])
+
+
+@scenario("harvest", "strategies", [1, 2])
+async def bench_harvest(strategies):
+    w = await fork(staking_world, 1)
+    staking = w.staking.contract_address
+    addresses = []
+    for i in range(strategies):
+        strategy = await w.deploy(f"strategy{i}", "mocks/test_mock_ERC20_strategy.cairo",
+                                  [w.zkp.contract_address])
+        addresses.append(strategy.contract_address)
+        await owner.send_transactions(w.owner, [
+            (staking, "trustStrategy", [strategy.contract_address]),
+            (staking, "depositIntoStrategy", [strategy.contract_address, *to_uint(10 * ETHER)]),
+            # profit of the strategy
+            (w.zkp.contract_address, "transfer", [strategy.contract_address, *to_uint(ETHER)]),
+        ])
+    return await owner.send_transaction(w.owner, staking, "harvest", [strategies, *addresses])
+
+
+@scenario("claimLotteryTickets", "staked_zkp", [10, 10_000])
+async def bench_claim_lottery_tickets(staked_zkp):
+    w = await fork(lottery_world)
+    await owner.send_transaction(w.owner, w.staking.contract_address, "deposit",
+                                 [*to_uint(staked_zkp * ETHER), w.owner.contract_address])
+    return await owner.send_transaction(w.owner, w.lottery.contract_address,
+                                        "claimLotteryTickets", [0, 0, 0])
+
+
+@scenario("burn", "tickets", [1, 1000])
+async def bench_burn(tickets):
+    w = await fork(sale_world, 4)
+    return await user.send_transaction(w.participant, w.lottery.contract_address, "burn", [
+        w.participant.contract_address, 0, 0, *to_uint(tickets)])
+
+
+@scenario("burn_with_quest", "quest_leaves", [2, 64, 1024])
+async def bench_burn_with_quest(quest_leaves):
+    w = await fork(sale_world, 4)
+    participant = w.participant.contract_address
+    leaves = [leaf for leaf, _, _ in get_leaves(
+        [participant, *range(1, quest_leaves)], [2] * quest_leaves)]
+    await owner.send_transaction(w.owner, w.factory.contract_address, "set_merkle_root",
+                                 [generate_merkle_root(list(leaves)), 0])
+    proof = generate_merkle_proof(leaves, 0)
+    return await user.send_transaction(w.participant, w.lottery.contract_address, "burn_with_quest", [
+        participant, 0, 0, *to_uint(1000), 2, len(proof), *proof])
+
+
+@scenario("participate", "registrants", [1, 4])
+async def bench_participate(registrants):
+    w = await fork(sale_world, 4)
+    await open_purchase_round(w, registrants)
+    return await user.send_transaction(w.participant, w.ido.contract_address, "participate",
+                                       [*to_uint(1000)])
+
+
+@scenario("withdraw_multiple_portions", "portions", [1, 4, 12])
+async def bench_withdraw_multiple_portions(portions):
+    w = await fork(sale_world, portions)
+    await open_purchase_round(w, 1)
+    await user.send_transaction(w.participant, w.ido.contract_address, "participate",
+                                [*to_uint(1000)])
+    set_block_timestamp(w.state, w.last_unlock + 60)
+    return await user.send_transaction(w.participant, w.ido.contract_address,
+                                       "withdraw_multiple_portions",
+                                       [portions, *range(1, portions + 1)])
+
+
+#
+# Measurements
+#
+
+def measured_call(tx, name):
+    """The call to `name` made by the account `__execute__` of `tx`."""
+    selector = get_selector_from_name(name)
+    return next(call for call in tx.call_info.internal_calls if call.selector == selector)
+
+
+def resources(call):
+    execution_resources = call.execution_resources
+    return {
+        "n_steps": execution_resources.n_steps,
+        "n_memory_holes": execution_resources.n_memory_holes,
+        "builtins": dict(sorted(execution_resources.builtin_instance_counter.items())),
+    }
+
+
+async def run(scenarios):
+    results = {}
+    for s in scenarios:
+        for value in s.values:
+            key = f"{s.name}[{s.scale}={value}]"
+            start = time.perf_counter()
+            results[key] = resources(measured_call(await s.run(value), s.name))
+            print(f"{key:<48} {results[key]['n_steps']:>8} steps "
+                  f"({time.perf_counter() - start:.1f}s)", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints the change of each scenario, returns the scenarios that regressed."""
+    regressions = []
+    print(f"\n{'scenario':<48} {'steps':>8} {'baseline':>9} {'change':>8}")
+    for key, result in results.items():
+        steps = result["n_steps"]
+        base = baseline.get(key, {}).get("n_steps")
+        if base is None:
+            print(f"{key:<48} {steps:>8} {'-':>9} {'new':>8}")
+            continue
+        change = (steps - base) / base
+        regressed = change > threshold
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<48} {steps:>8} {base:>9} {change:>+7.1%}" + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="patterns", action="append", default=[],
+                        help="only run the scenarios whose name matches this glob, repeatable")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative increase of steps over the baseline that fails the run")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write the measured resources to the baseline instead of comparing")
+    parser.add_argument("--output", help="also write the measured resources to this JSON file")
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if not args.patterns
+                 or any(fnmatch.fnmatchcase(s.name, p) for p in args.patterns)]
+    # every world declares and deploys the same classes, their hashes are computed once
+    with set_class_hash_cache(cachetools.LRUCache(maxsize=64)):
+        results = asyncio.run(run(scenarios))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} scenarios use more than {args.threshold:.0%} more steps "
+              f"than the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from starkware.cairo.common.uint256 import (
 )
 from starkware.cairo.common.math import assert_nn_le, assert_not_zero
 from starkware.cairo.common.alloc import alloc
+from starkware.cairo.common.memcpy import memcpy
 from starkware.cairo.common.hash import hash2
 from starkware.cairo.common.math_cmp import is_le_felt
 from starkware.cairo.common.bool import TRUE, FALSE
@@ -398,6 +399,99 @@ func burn_with_quest{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_che
     return ()
 end
 
+# @dev Burns the tickets of several accounts completing quests, checked with one merkle multiproof
+# @param id : IDO id
+# @param accounts_len : The length of the accounts array
+# @param accounts : The accounts array, sorted by leaf index in the quests merkle tree
+# @param amounts_len : The length of the amounts array
+# @param amounts : The amounts of tickets to burn for each account
+# @param nb_quests_len : The length of the nb_quests array
+# @param nb_quests : The number of quests done by each account
+# @param merkle_proof_len : The length of the multiproof
+# @param merkle_proof : The sibling nodes that can't be computed from the leaves
+# @param proof_flags_len : The length of the proof flags array
+# @param proof_flags : For each hash, 1 if the second node is taken from the leaves/hashes queue, 0 from the proof
+@external
+func batch_burn_with_quest{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    id : Uint256,
+    accounts_len : felt,
+    accounts : felt*,
+    amounts_len : felt,
+    amounts : Uint256*,
+    nb_quests_len : felt,
+    nb_quests : felt*,
+    merkle_proof_len : felt,
+    merkle_proof : felt*,
+    proof_flags_len : felt,
+    proof_flags : felt*,
+):
+    alloc_locals
+    with_attr error_message("AstralyLotteryToken::accounts, amounts and nb_quests length mismatch"):
+        assert_not_zero(accounts_len)
+        assert accounts_len = amounts_len
+        assert accounts_len = nb_quests_len
+    end
+    let (factory_address : felt) = ido_factory_address.read()
+    let (_id : felt) = _uint_to_felt(id)
+    let (merkle_root : felt) = IAstralyIDOFactory.get_merkle_root(
+        contract_address=factory_address, id=_id
+    )
+    let (local leaves : felt*) = alloc()
+    _hash_quest_leaves(accounts_len, accounts, nb_quests, leaves)
+    let (_valid : felt) = merkle_multi_verify(
+        accounts_len,
+        leaves,
+        merkle_root,
+        merkle_proof_len,
+        merkle_proof,
+        proof_flags_len,
+        proof_flags,
+    )
+    with_attr error_message("AstralyLotteryToken::Error in the number of quests done"):
+        assert _valid = 1
+    end
+    let (ido_address : felt) = IAstralyIDOFactory.get_ido_address(
+        contract_address=factory_address, id=_id
+    )
+    _burn_with_quest_loop(ido_address, id, accounts_len, accounts, amounts, nb_quests)
+    return ()
+end
+
+func _hash_quest_leaves{pedersen_ptr : HashBuiltin*}(
+    accounts_len : felt, accounts : felt*, nb_quests : felt*, leaves : felt*
+):
+    if accounts_len == 0:
+        return ()
+    end
+    let (leaf) = hash2{hash_ptr=pedersen_ptr}([accounts], [nb_quests])
+    assert [leaves] = leaf
+    return _hash_quest_leaves(accounts_len - 1, accounts + 1, nb_quests + 1, leaves + 1)
+end
+
+func _burn_with_quest_loop{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    ido_address : felt,
+    id : Uint256,
+    accounts_len : felt,
+    accounts : felt*,
+    amounts : Uint256*,
+    nb_quests : felt*,
+):
+    if accounts_len == 0:
+        return ()
+    end
+    owner_or_approved(owner=[accounts])
+    ERC1155_burn([accounts], id, [amounts])
+    let (success : felt) = IAstralyIDOContract.register_user(
+        contract_address=ido_address, amount=[amounts], account=[accounts], nb_quest=[nb_quests]
+    )
+    with_attr error_message("AstralyLotteryToken::Error while claiming the allocation"):
+        assert success = TRUE
+    end
+    return _burn_with_quest_loop(
+        ido_address, id, accounts_len - 1, accounts + 1, amounts + Uint256.SIZE, nb_quests + 1
+    )
+end
+
 func merkle_verify{pedersen_ptr : HashBuiltin*, range_check_ptr}(
     leaf : felt, root : felt, proof_len : felt, proof : felt*
 ) -> (res : felt):
@@ -434,6 +528,110 @@ func calc_merkle_root{pedersen_ptr : HashBuiltin*, range_check_ptr}(
     let (res) = calc_merkle_root(node, proof_len - 1, proof + 1)
     return (res)
 end
+# @dev Checks several leaves against `root` at once, hashing the nodes their paths share only once.
+#      `leaves` must be sorted by leaf index. Leaves and computed nodes are consumed in order from a
+#      single queue: each hash takes its first node from the queue and its second one from the queue
+#      if the matching proof flag is set, from the proof otherwise.
+func merkle_multi_verify{pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    leaves_len : felt,
+    leaves : felt*,
+    root : felt,
+    proof_len : felt,
+    proof : felt*,
+    proof_flags_len : felt,
+    proof_flags : felt*,
+) -> (res : felt):
+    alloc_locals
+    if leaves_len == 0:
+        return (0)
+    end
+    # every hash consumes two nodes and produces one, only the root is left
+    if leaves_len + proof_len - 1 != proof_flags_len:
+        return (0)
+    end
+
+    let (local queue : felt*) = alloc()
+    memcpy(queue, leaves, leaves_len)
+    let (calc_root) = calc_merkle_multi_root(
+        queue, leaves_len, queue + leaves_len, proof_len, proof, proof_flags_len, proof_flags
+    )
+    if calc_root == root:
+        return (1)
+    else:
+        return (0)
+    end
+end
+
+func calc_merkle_multi_root{pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    queue : felt*,
+    queue_len : felt,
+    queue_end : felt*,
+    proof_len : felt,
+    proof : felt*,
+    proof_flags_len : felt,
+    proof_flags : felt*,
+) -> (res : felt):
+    alloc_locals
+
+    if proof_flags_len == 0:
+        with_attr error_message("AstralyLotteryToken::Invalid merkle multiproof"):
+            assert proof_len = 0
+        end
+        return ([queue_end - 1])
+    end
+
+    with_attr error_message("AstralyLotteryToken::Invalid merkle multiproof"):
+        assert_not_zero(queue_len)
+    end
+    local a = [queue]
+    local b
+    local next_queue : felt*
+    local next_queue_len
+    local next_proof_len
+    local flag = [proof_flags]
+
+    if flag == FALSE:
+        with_attr error_message("AstralyLotteryToken::Invalid merkle multiproof"):
+            assert_not_zero(proof_len)
+        end
+        b = [proof]
+        next_queue = queue + 1
+        next_queue_len = queue_len - 1
+        next_proof_len = proof_len - 1
+    else:
+        with_attr error_message("AstralyLotteryToken::Invalid merkle multiproof"):
+            assert_not_zero(queue_len - 1)
+        end
+        b = [queue + 1]
+        next_queue = queue + 2
+        next_queue_len = queue_len - 2
+        next_proof_len = proof_len
+    end
+
+    local node
+    let (le) = is_le_felt(a, b)
+
+    if le == 1:
+        let (n) = hash2{hash_ptr=pedersen_ptr}(a, b)
+        node = n
+    else:
+        let (n) = hash2{hash_ptr=pedersen_ptr}(b, a)
+        node = n
+    end
+
+    assert [queue_end] = node
+    let (res) = calc_merkle_multi_root(
+        next_queue,
+        next_queue_len + 1,
+        queue_end + 1,
+        next_proof_len,
+        proof + proof_len - next_proof_len,
+        proof_flags_len - 1,
+        proof_flags + 1,
+    )
+    return (res)
+end
+
 # @external
 # func burnBatch{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
 #         _from : felt, ids_len : felt, ids : Uint256*, amounts_len : felt, amounts : Uint256*):
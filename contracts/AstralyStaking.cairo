@@ -1,6 +1,7 @@
 %lang starknet
 
-from starkware.cairo.common.cairo_builtins import HashBuiltin, BitwiseBuiltin
+from starkware.cairo.common.cairo_builtins import HashBuiltin
+from starkware.cairo.common.hash import hash2
 from starkware.cairo.common.uint256 import Uint256, uint256_le, uint256_lt, uint256_check
 from starkware.cairo.common.math import (
     assert_not_equal,
@@ -10,8 +11,6 @@ from starkware.cairo.common.math import (
     unsigned_div_rem,
 )
 from starkware.cairo.common.math_cmp import is_le
-from starkware.cairo.common.pow import pow
-from starkware.cairo.common.bitwise import bitwise_and, bitwise_xor, bitwise_or
 from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.bool import TRUE, FALSE
 from starkware.starknet.common.syscalls import (
@@ -19,7 +18,10 @@ from starkware.starknet.common.syscalls import (
     get_contract_address,
     get_block_timestamp,
     get_block_number,
+    storage_read,
+    storage_write,
 )
+from starkware.starknet.common.storage import normalize_address
 
 from openzeppelin.security.safemath.library import SafeUint256
 from openzeppelin.security.pausable.library import Pausable
@@ -105,13 +107,17 @@ namespace IMintCalculator:
 end
 
 struct WhitelistedToken:
-    member bit_mask : felt
+    # position in whitelisted_tokens_list, starting at 1, 0 when not whitelisted
+    member index : felt
     member mint_calculator_address : felt
     member is_NFT : felt
 end
 
 const EMERGENCY_BREAKER_ROLE = 'EMERGENCY_BREAKER'
 const HARVESTER_ROLE = 'HARVESTER'
+# sn_keccak('user_staked_tokens'), base address of the per-user token bit masks of the
+# previous implementation, user_staked_tokens(user) -> (tokens_mask)
+const USER_TOKENS_MASK_BASE = 0x1d32c8f04c2ddebb346b8e04ae87bd74604f4f1d2e0e731dbe968e23fb21452
 
 #
 # Events
@@ -172,11 +178,21 @@ end
 func whitelisted_tokens(lp_token : felt) -> (details : WhitelistedToken):
 end
 
+# whitelisted tokens at positions 1 to whitelisted_tokens_len
+@storage_var
+func whitelisted_tokens_list(index : felt) -> (lp_token : felt):
+end
+
+@storage_var
+func whitelisted_tokens_len() -> (len : felt):
+end
+
+# bit masks whitelist of the previous implementation, read by migrateWhitelistedTokens,
+# token_mask_addresses is kept to decode the user masks in migrateUserStakedTokens
 @storage_var
 func token_mask_addresses(bit_mask : felt) -> (address : felt):
 end
 
-# bit mask with all whitelisted LP tokens
 @storage_var
 func whitelisted_tokens_mask() -> (mask : felt):
 end
@@ -189,8 +205,18 @@ end
 func deposit_unlock_time(user : felt) -> (unlock_time : felt):
 end
 
+# tokens staked by a user at positions 1 to user_staked_tokens_len
+@storage_var
+func user_staked_tokens(user : felt, index : felt) -> (token : felt):
+end
+
+@storage_var
+func user_staked_tokens_len(user : felt) -> (len : felt):
+end
+
+# position of a token in user_staked_tokens, 0 when not staked
 @storage_var
-func user_staked_tokens(user : felt) -> (tokens_mask : felt):
+func user_staked_token_index(user : felt, token : felt) -> (index : felt):
 end
 
 # value is multiplied by 10 to store floating points number in felt type
@@ -215,7 +241,7 @@ func isTokenWhitelisted{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_
     lp_token : felt
 ) -> (res : felt):
     let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(lp_token)
-    if whitelisted_token.bit_mask == 0:
+    if whitelisted_token.index == 0:
         return (FALSE)
     end
     return (TRUE)
@@ -295,26 +321,26 @@ func getCurrentBoostValue{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, rang
 end
 
 @view
-func getUserStakeInfo{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(user : felt) -> (unlock_time : felt, tokens_len : felt, tokens : felt*):
+func getUserStakeInfo{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    user : felt
+) -> (unlock_time : felt, tokens_len : felt, tokens : felt*):
     alloc_locals
     let (unlock_time : felt) = deposit_unlock_time.read(user)
-    let (user_bit_mask : felt) = user_staked_tokens.read(user)
-
-    let (staked_tokens_array : felt*) = alloc()
-    let (array_len : felt) = get_tokens_addresses_from_mask(
-        0, user_bit_mask, 0, staked_tokens_array
-    )
-    return (unlock_time, array_len, staked_tokens_array)
+    let (tokens_len : felt) = user_staked_tokens_len.read(user)
+    let (tokens : felt*) = alloc()
+    read_user_staked_tokens(user, tokens_len, tokens)
+    return (unlock_time, tokens_len, tokens)
 end
 
 @view
-func getTokensMask{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}() -> (
-    tokens_mask : felt
+func getWhitelistedTokens{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}() -> (
+    tokens_len : felt, tokens : felt*
 ):
-    let (bit_mask : felt) = whitelisted_tokens_mask.read()
-    return (bit_mask)
+    alloc_locals
+    let (tokens_len : felt) = whitelisted_tokens_len.read()
+    let (tokens : felt*) = alloc()
+    read_whitelisted_tokens(tokens_len, tokens)
+    return (tokens_len, tokens)
 end
 
 @view
@@ -488,9 +514,9 @@ func initializer{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_p
     setStakeBoost(25)
     setFeePercent(1)  # TODO : Check division later
 
-    # # Add ZKP token to the whitelist and bit mask on first position
-    token_mask_addresses.write(1, asset_addr)
-    whitelisted_tokens_mask.write(1)
+    # # Add ZKP token to the whitelist on first position
+    whitelisted_tokens_list.write(1, asset_addr)
+    whitelisted_tokens_len.write(1)
     whitelisted_tokens.write(asset_addr, WhitelistedToken(1, 0, FALSE))
 
     # Initialize Rewards params
@@ -510,51 +536,101 @@ func upgrade{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
     return ()
 end
 
+# returns the position of the token in the whitelist
 @external
-func addWhitelistedToken{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(lp_token : felt, mint_calculator_address : felt, is_NFT : felt) -> (token_mask : felt):
+func addWhitelistedToken{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_token : felt, mint_calculator_address : felt, is_NFT : felt
+) -> (token_index : felt):
     alloc_locals
     AstralyAccessControl.assert_only_owner()
-    with_attr error_message("invalid token address"):
-        assert_not_zero(lp_token)
-    end
-    with_attr error_message("invalid oracle address"):
-        assert_not_zero(mint_calculator_address)
+    let (tokens_len : felt) = whitelisted_tokens_len.read()
+    whitelist_token(lp_token, mint_calculator_address, is_NFT, tokens_len + 1)
+    whitelisted_tokens_len.write(tokens_len + 1)
+    return (tokens_len + 1)
+end
+
+# whitelists several LP tokens in one transaction, the whitelist length is read and written once
+@external
+func addWhitelistedTokens{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_tokens_len : felt,
+    lp_tokens : felt*,
+    mint_calculator_addresses_len : felt,
+    mint_calculator_addresses : felt*,
+    is_NFT_len : felt,
+    is_NFT : felt*,
+) -> (token_indexes_len : felt, token_indexes : felt*):
+    alloc_locals
+    AstralyAccessControl.assert_only_owner()
+    with_attr error_message("tokens, calculators and NFT flags length mismatch"):
+        assert lp_tokens_len = mint_calculator_addresses_len
+        assert lp_tokens_len = is_NFT_len
     end
 
-    different_than_underlying(lp_token)
-    let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(lp_token)
+    let (token_indexes : felt*) = alloc()
+    let (tokens_len : felt) = whitelisted_tokens_len.read()
+    whitelist_tokens_loop(
+        lp_tokens_len, lp_tokens, mint_calculator_addresses, is_NFT, tokens_len + 1, token_indexes
+    )
+    whitelisted_tokens_len.write(tokens_len + lp_tokens_len)
+    return (lp_tokens_len, token_indexes)
+end
 
-    with_attr error_message("already whitelisted"):
-        assert whitelisted_token.bit_mask = 0
-        assert whitelisted_token.mint_calculator_address = 0
+# the last whitelisted token takes the position of the removed one
+@external
+func removeWhitelistedToken{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_token : felt
+):
+    alloc_locals
+    AstralyAccessControl.assert_only_owner()
+    let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(lp_token)
+    if whitelisted_token.index == 0:
+        return ()
     end
 
-    let (tokens_masks : felt) = whitelisted_tokens_mask.read()
-
-    let (token_mask : felt) = get_next_available_bit_in_mask(0, tokens_masks)
+    let (tokens_len : felt) = whitelisted_tokens_len.read()
+    let (listed_token : felt) = whitelisted_tokens_list.read(whitelisted_token.index)
+    with_attr error_message("whitelist not migrated"):
+        assert_le(whitelisted_token.index, tokens_len)
+        assert listed_token = lp_token
+    end
+    let (last_token : felt) = whitelisted_tokens_list.read(tokens_len)
+    let (last_token_details : WhitelistedToken) = whitelisted_tokens.read(last_token)
+    let mint_calculator_address = last_token_details.mint_calculator_address
+    let is_NFT = last_token_details.is_NFT
     whitelisted_tokens.write(
-        lp_token, WhitelistedToken(token_mask, mint_calculator_address, is_NFT)
+        last_token, WhitelistedToken(whitelisted_token.index, mint_calculator_address, is_NFT)
     )
-    token_mask_addresses.write(token_mask, lp_token)
-    let (new_tokens_masks : felt) = bitwise_or(tokens_masks, token_mask)
-    whitelisted_tokens_mask.write(new_tokens_masks)
-    return (token_mask)
+    whitelisted_tokens_list.write(whitelisted_token.index, last_token)
+    whitelisted_tokens_list.write(tokens_len, 0)
+    whitelisted_tokens_len.write(tokens_len - 1)
+
+    whitelisted_tokens.write(lp_token, WhitelistedToken(0, 0, FALSE))
+    return ()
 end
 
+# moves the tokens whitelisted in the bit masks of the previous implementation
+# after the ones of whitelisted_tokens_list, once per upgraded proxy
 @external
-func removeWhitelistedToken{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(lp_token : felt):
+func migrateWhitelistedTokens{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    ) -> (tokens_len : felt):
+    alloc_locals
     AstralyAccessControl.assert_only_owner()
-    let (all_token_masks : felt) = whitelisted_tokens_mask.read()
-    let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(lp_token)
-    let (new_tokens_masks : felt) = bitwise_xor(whitelisted_token.bit_mask, all_token_masks)
-    whitelisted_tokens_mask.write(new_tokens_masks)
+    let (tokens_mask : felt) = whitelisted_tokens_mask.read()
+    let (tokens_len : felt) = whitelisted_tokens_len.read()
+    let (new_tokens_len : felt) = migrate_tokens_mask(1, tokens_mask, tokens_len)
+    whitelisted_tokens_len.write(new_tokens_len)
+    whitelisted_tokens_mask.write(0)
+    return (new_tokens_len)
+end
 
-    whitelisted_tokens.write(lp_token, WhitelistedToken(0, 0, FALSE))
-    token_mask_addresses.write(whitelisted_token.bit_mask, 0)
+# moves the tokens in the bit masks of `users` from the previous implementation to their
+# user_staked_tokens, the bits are decoded with token_mask_addresses
+@external
+func migrateUserStakedTokens{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    users_len : felt, users : felt*
+):
+    AstralyAccessControl.assert_only_owner()
+    migrate_users_tokens_masks(users_len, users)
     return ()
 end
 
@@ -568,9 +644,9 @@ func setEmergencyBreaker{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range
 end
 
 @external
-func deposit{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(assets : Uint256, receiver : felt) -> (shares : Uint256):
+func deposit{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    assets : Uint256, receiver : felt
+) -> (shares : Uint256):
     alloc_locals
     ReentrancyGuard._start()
     Pausable.assert_not_paused()
@@ -599,9 +675,9 @@ end
 
 # `lock_time_days` number of days
 @external
-func depositForTime{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(assets : Uint256, receiver : felt, lock_time_days : felt) -> (shares : Uint256):
+func depositForTime{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    assets : Uint256, receiver : felt, lock_time_days : felt
+) -> (shares : Uint256):
     alloc_locals
     ReentrancyGuard._start()
     Pausable.assert_not_paused()
@@ -629,9 +705,9 @@ end
 
 # `lock_time_days` number of days
 @external
-func depositLP{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(lp_token : felt, assets : Uint256, receiver : felt, lock_time_days : felt) -> (shares : Uint256):
+func depositLP{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_token : felt, assets : Uint256, receiver : felt, lock_time_days : felt
+) -> (shares : Uint256):
     alloc_locals
     Pausable.assert_not_paused()
     ReentrancyGuard._start()
@@ -677,9 +753,9 @@ func depositLP{
 end
 
 @external
-func mint{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(shares : Uint256, receiver : felt) -> (assets : Uint256):
+func mint{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    shares : Uint256, receiver : felt
+) -> (assets : Uint256):
     alloc_locals
     ReentrancyGuard._start()
     Pausable.assert_not_paused()
@@ -704,9 +780,9 @@ func mint{
 end
 
 @external
-func mintForTime{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(shares : Uint256, receiver : felt, lock_time_days : felt) -> (assets : Uint256):
+func mintForTime{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    shares : Uint256, receiver : felt, lock_time_days : felt
+) -> (assets : Uint256):
     alloc_locals
     ReentrancyGuard._start()
     Pausable.assert_not_paused()
@@ -731,9 +807,9 @@ func mintForTime{
 end
 
 @external
-func redeem{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(shares : Uint256, receiver : felt, owner : felt) -> (assets : Uint256):
+func redeem{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    shares : Uint256, receiver : felt, owner : felt
+) -> (assets : Uint256):
     alloc_locals
     Pausable.assert_not_paused()
     ReentrancyGuard._start()
@@ -758,9 +834,9 @@ func redeem{
 end
 
 @external
-func withdraw{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(assets : Uint256, receiver : felt, owner : felt) -> (shares : Uint256):
+func withdraw{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    assets : Uint256, receiver : felt, owner : felt
+) -> (shares : Uint256):
     alloc_locals
     Pausable.assert_not_paused()
     ReentrancyGuard._start()
@@ -784,9 +860,9 @@ func withdraw{
 end
 
 @external
-func withdrawLP{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(lp_token : felt, assets : Uint256, receiver : felt, owner : felt) -> (shares : Uint256):
+func withdrawLP{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_token : felt, assets : Uint256, receiver : felt, owner : felt
+) -> (shares : Uint256):
     alloc_locals
     Pausable.assert_not_paused()
     assert_not_before_unlock_time(owner)
@@ -1196,7 +1272,7 @@ func only_whitelisted_token{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, ra
     let (res : WhitelistedToken) = whitelisted_tokens.read(address)
     with_attr error_message("token not whitelisted"):
         assert_not_zero(res.mint_calculator_address)
-        assert_not_zero(res.bit_mask)
+        assert_not_zero(res.index)
     end
     return ()
 end
@@ -1211,52 +1287,179 @@ func different_than_underlying{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,
     return ()
 end
 
-# return the first available bit in the mask
-func get_next_available_bit_in_mask{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(index : felt, bit_mask : felt) -> (res : felt):
-    let (value : felt) = pow(2, index)
-    let (and_result : felt) = bitwise_and(value, bit_mask)
-    if and_result == 0:
-        return (value)
+func whitelist_token{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_token : felt, mint_calculator_address : felt, is_NFT : felt, index : felt
+):
+    alloc_locals
+    with_attr error_message("invalid token address"):
+        assert_not_zero(lp_token)
+    end
+    with_attr error_message("invalid oracle address"):
+        assert_not_zero(mint_calculator_address)
+    end
+
+    different_than_underlying(lp_token)
+    let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(lp_token)
+
+    with_attr error_message("already whitelisted"):
+        assert whitelisted_token.index = 0
+        assert whitelisted_token.mint_calculator_address = 0
     end
 
-    return get_next_available_bit_in_mask(index + 1, bit_mask)
+    whitelisted_tokens.write(lp_token, WhitelistedToken(index, mint_calculator_address, is_NFT))
+    whitelisted_tokens_list.write(index, lp_token)
+    return ()
 end
 
-func get_tokens_addresses_from_mask{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(position : felt, bit_mask : felt, tokens_allocation_index : felt, array : felt*) -> (
-    length : felt
+func whitelist_tokens_loop{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    lp_tokens_len : felt,
+    lp_tokens : felt*,
+    mint_calculator_addresses : felt*,
+    is_NFT : felt*,
+    index : felt,
+    token_indexes : felt*,
 ):
+    if lp_tokens_len == 0:
+        return ()
+    end
+
+    whitelist_token([lp_tokens], [mint_calculator_addresses], [is_NFT], index)
+    assert [token_indexes] = index
+    return whitelist_tokens_loop(
+        lp_tokens_len - 1,
+        lp_tokens + 1,
+        mint_calculator_addresses + 1,
+        is_NFT + 1,
+        index + 1,
+        token_indexes + 1,
+    )
+end
+
+# appends the tokens of `tokens_mask` to the whitelist, `bit_mask` is the mask of its lowest bit
+func migrate_tokens_mask{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    bit_mask : felt, tokens_mask : felt, tokens_len : felt
+) -> (tokens_len : felt):
     alloc_locals
-    if bit_mask == 0:
-        return (tokens_allocation_index)
+    if tokens_mask == 0:
+        return (tokens_len)
     end
 
-    let (bit_mask_left : felt, remainder : felt) = unsigned_div_rem(bit_mask, 2)
-    if remainder == 1:
-        let (token_mask : felt) = pow(2, position)
-        let (token_address : felt) = token_mask_addresses.read(token_mask)
-        assert [array + tokens_allocation_index] = token_address
-        return get_tokens_addresses_from_mask(
-            position + 1, bit_mask_left, tokens_allocation_index + 1, array
-        )
+    let (tokens_mask_left : felt, bit : felt) = unsigned_div_rem(tokens_mask, 2)
+    if bit == 0:
+        return migrate_tokens_mask(bit_mask * 2, tokens_mask_left, tokens_len)
+    end
+
+    let (lp_token : felt) = token_mask_addresses.read(bit_mask)
+    let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(lp_token)
+    # the index of a token whitelisted before the upgrade is still its bit mask
+    if whitelisted_token.index != bit_mask:
+        return migrate_tokens_mask(bit_mask * 2, tokens_mask_left, tokens_len)
     end
-    return get_tokens_addresses_from_mask(
-        position + 1, bit_mask_left, tokens_allocation_index, array
+
+    let mint_calculator_address = whitelisted_token.mint_calculator_address
+    let is_NFT = whitelisted_token.is_NFT
+    whitelisted_tokens.write(
+        lp_token, WhitelistedToken(tokens_len + 1, mint_calculator_address, is_NFT)
     )
+    whitelisted_tokens_list.write(tokens_len + 1, lp_token)
+    return migrate_tokens_mask(bit_mask * 2, tokens_mask_left, tokens_len + 1)
+end
+
+func migrate_users_tokens_masks{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    users_len : felt, users : felt*
+):
+    alloc_locals
+    if users_len == 0:
+        return ()
+    end
+
+    let user = [users]
+    # address of the storage var user_staked_tokens(user) of the previous implementation
+    let (mask_hash : felt) = hash2{hash_ptr=pedersen_ptr}(USER_TOKENS_MASK_BASE, user)
+    let (local mask_address : felt) = normalize_address(addr=mask_hash)
+    let (tokens_mask : felt) = storage_read(address=mask_address)
+    migrate_user_tokens_mask(user, 1, tokens_mask)
+    storage_write(address=mask_address, value=0)
+    return migrate_users_tokens_masks(users_len - 1, users + 1)
+end
+
+# adds the tokens of `tokens_mask` to the staked tokens of `user`, `bit_mask` is the mask of
+# its lowest bit
+func migrate_user_tokens_mask{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    user : felt, bit_mask : felt, tokens_mask : felt
+):
+    alloc_locals
+    if tokens_mask == 0:
+        return ()
+    end
+
+    let (local tokens_mask_left : felt, bit : felt) = unsigned_div_rem(tokens_mask, 2)
+    if bit == 0:
+        return migrate_user_tokens_mask(user, bit_mask * 2, tokens_mask_left)
+    end
+
+    let (token : felt) = token_mask_addresses.read(bit_mask)
+    if token == 0:
+        return migrate_user_tokens_mask(user, bit_mask * 2, tokens_mask_left)
+    end
+    add_token_to_user_staked_tokens(user, token)
+    return migrate_user_tokens_mask(user, bit_mask * 2, tokens_mask_left)
+end
+
+# writes the whitelisted tokens at positions 1 to `index` in `tokens`
+func read_whitelisted_tokens{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    index : felt, tokens : felt*
+):
+    if index == 0:
+        return ()
+    end
+    let (token : felt) = whitelisted_tokens_list.read(index)
+    assert [tokens + index - 1] = token
+    return read_whitelisted_tokens(index - 1, tokens)
+end
+
+# writes the tokens staked by `user` at positions 1 to `index` in `tokens`
+func read_user_staked_tokens{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    user : felt, index : felt, tokens : felt*
+):
+    if index == 0:
+        return ()
+    end
+    let (token : felt) = user_staked_tokens.read(user, index)
+    assert [tokens + index - 1] = token
+    return read_user_staked_tokens(user, index - 1, tokens)
 end
 
-func add_token_to_user_mask{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
+func add_token_to_user_staked_tokens{
+    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr
 }(user : felt, token : felt):
-    let (user_current_tokens_mask : felt) = user_staked_tokens.read(user)
-    let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(token)
-    let (new_user_tokens_mask : felt) = bitwise_or(
-        user_current_tokens_mask, whitelisted_token.bit_mask
-    )
-    user_staked_tokens.write(user, new_user_tokens_mask)
+    let (index : felt) = user_staked_token_index.read(user, token)
+    if index != 0:
+        return ()
+    end
+    let (tokens_len : felt) = user_staked_tokens_len.read(user)
+    user_staked_tokens.write(user, tokens_len + 1, token)
+    user_staked_token_index.write(user, token, tokens_len + 1)
+    user_staked_tokens_len.write(user, tokens_len + 1)
+    return ()
+end
+
+# the last token staked by the user takes the position of the removed one
+func remove_token_from_user_staked_tokens{
+    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr
+}(user : felt, token : felt):
+    alloc_locals
+    let (index : felt) = user_staked_token_index.read(user, token)
+    if index == 0:
+        return ()
+    end
+    let (tokens_len : felt) = user_staked_tokens_len.read(user)
+    let (last_token : felt) = user_staked_tokens.read(user, tokens_len)
+    user_staked_tokens.write(user, index, last_token)
+    user_staked_token_index.write(user, last_token, index)
+    user_staked_tokens.write(user, tokens_len, 0)
+    user_staked_token_index.write(user, token, 0)
+    user_staked_tokens_len.write(user, tokens_len - 1)
     return ()
 end
 
@@ -1295,38 +1498,34 @@ func set_new_deposit_unlock_time{syscall_ptr : felt*, pedersen_ptr : HashBuiltin
     return ()
 end
 
-# update user deposit info and staked tokens bit mask
-func update_user_after_deposit{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(user : felt, token : felt, new_amount : Uint256):
+# update user deposit info and staked tokens
+func update_user_after_deposit{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    user : felt, token : felt, new_amount : Uint256
+):
     alloc_locals
     let (current_deposit_amount : Uint256) = deposits.read(user, token)
     let (new_deposit_amount : Uint256) = SafeUint256.add(current_deposit_amount, new_amount)
     deposits.write(user, token, new_deposit_amount)
 
-    let (is_first_deposit : felt) = uint256_is_zero(current_deposit_amount)
-    if is_first_deposit == TRUE:
-        add_token_to_user_mask(user, token)
+    let (is_empty_deposit : felt) = uint256_is_zero(new_deposit_amount)
+    if is_empty_deposit == TRUE:
         return ()
     end
+    # no-op when already staked, also adds the tokens of deposits made before the upgrade
+    add_token_to_user_staked_tokens(user, token)
     return ()
 end
 
-# remove user staked tokens from the bit mask if new balance is 0
-func remove_from_deposit{
-    syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr, bitwise_ptr : BitwiseBuiltin*
-}(user : felt, token : felt, withdrawned_amount : Uint256):
+# remove the token from the user staked tokens if new balance is 0
+func remove_from_deposit{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
+    user : felt, token : felt, withdrawned_amount : Uint256
+):
     alloc_locals
     let (current_user_deposit_amount : Uint256) = deposits.read(user, token)
     let (withdraw_all : felt) = uint256_le(current_user_deposit_amount, withdrawned_amount)  # can withdraw more than deposit
     if withdraw_all == TRUE:
         deposits.write(user, token, Uint256(0, 0))
-        let (user_current_tokens_mask : felt) = user_staked_tokens.read(user)
-        let (whitelisted_token : WhitelistedToken) = whitelisted_tokens.read(token)
-        let (new_user_tokens_mask : felt) = bitwise_xor(
-            user_current_tokens_mask, whitelisted_token.bit_mask
-        )
-        user_staked_tokens.write(user, new_user_tokens_mask)
+        remove_token_from_user_staked_tokens(user, token)
         return ()
     else:
         let (new_user_deposit_amount : Uint256) = SafeUint256.sub_lt(
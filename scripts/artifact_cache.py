@@ -0,0 +1,189 @@
+"""Skips compiling and declaring contracts whose Cairo sources did not change."""
+import asyncio
+import hashlib
+import importlib.metadata
+import json
+import os
+import re
+import subprocess
+import threading
+from pathlib import Path
+
+from nile import deployments
+from nile.common import ABIS_DIRECTORY, BUILD_DIRECTORY, CONTRACTS_DIRECTORY
+from services.external_api.client import BadRequest, RetryConfig
+from starkware.starknet.services.api.feeder_gateway.feeder_gateway_client import FeederGatewayClient
+
+from receipt_tracker import feeder_gateway_url
+
+_root = Path(__file__).parent.parent
+
+CAIRO_PATH = [str(_root), str(_root / "lib/cairo_contracts/src")]
+# where contracts are looked up by name, e.g. Proxy comes from the OpenZeppelin presets
+CONTRACT_DIRECTORIES = [str(_root / CONTRACTS_DIRECTORY), str(_root / "lib/cairo_contracts/src")]
+MANIFEST = f"{BUILD_DIRECTORY}/cache.json"
+
+_IMPORT = re.compile(rb"^\s*from\s+([\w.]+)\s+import", re.MULTILINE)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_declared(network, class_hash):
+    """Whether the node of `network` knows `class_hash`, a restarted devnet or local
+    node has forgotten the classes declared before."""
+    client = FeederGatewayClient(feeder_gateway_url(network), retry_config=RetryConfig(n_retries=1))
+    if not isinstance(class_hash, str):
+        class_hash = hex(class_hash)
+    try:
+        asyncio.run(client.get_class_by_hash(class_hash))
+    except BadRequest as error:
+        if "UNDECLARED_CLASS" in error.text:
+            return False
+        raise
+    return True
+
+
+class ArtifactCache:
+    """
+    Maps the hash of a contract's Cairo sources to its compiled artifact and to
+    the class hash it was declared with on each network.
+
+    The key covers the contract file, every file it imports from the include
+    paths (transitively), the include paths themselves and the cairo-lang version.
+    `starkware.*` imports come with cairo-lang and are covered by its version.
+
+    Parameters
+    ----------
+    path : str
+        JSON manifest, `artifacts/cache.json` by default
+    cairo_path : list
+        Include paths passed to `starknet-compile`
+
+    Examples
+    ---------
+    >>> cache = ArtifactCache()
+    >>> cache.compile("AstralyStaking")  # only runs starknet-compile when a source changed
+    >>> class_hash = cache.declare(nre, "AstralyStaking")  # only declares unknown classes
+    """
+
+    def __init__(self, path=MANIFEST, cairo_path=None):
+        self.path = path
+        self.cairo_path = CAIRO_PATH if cairo_path is None else cairo_path
+        self.compiler = importlib.metadata.version("cairo-lang")
+        self.entries = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+        self._contract_locks = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def source(self, contract):
+        """Returns the Cairo file of `contract`, looked up by name."""
+        for directory in CONTRACT_DIRECTORIES:
+            matches = sorted(Path(directory).rglob(f"{contract}.cairo"))
+            if matches:
+                return matches[0]
+        raise FileNotFoundError(f"ArtifactCache: no {contract}.cairo in {CONTRACT_DIRECTORIES}")
+
+    def _resolve(self, module):
+        relative = Path(*module.split(".")).with_suffix(".cairo")
+        for directory in self.cairo_path:
+            path = Path(directory) / relative
+            if path.exists():
+                return path
+        return None
+
+    def _digest(self, path):
+        """Hashes of `path` and of every file it imports, keyed by path."""
+        # not resolved: lib/ may be a symlink and keys must not depend on where it points
+        digests, queue = {}, [Path(os.path.abspath(path))]
+        while queue:
+            path = queue.pop()
+            if str(path) in digests:
+                continue
+            data = path.read_bytes()
+            digests[str(path)] = self._digests.setdefault(str(path), _sha256(data))
+            for module in _IMPORT.findall(data):
+                imported = self._resolve(module.decode())
+                if imported is not None:
+                    queue.append(Path(os.path.abspath(imported)))
+        return digests
+
+    def key(self, contract):
+        """Content hash of `contract`'s sources, include paths and compiler version."""
+        digests = self._digest(self.source(contract))
+        h = hashlib.sha256()
+        h.update(f"cairo-lang {self.compiler}\n".encode())
+        for directory in self.cairo_path:
+            h.update(f"path {os.path.relpath(directory, _root)}\n".encode())
+        for path, digest in sorted(digests.items()):
+            h.update(f"{os.path.relpath(path, _root)} {digest}\n".encode())
+        return h.hexdigest()
+
+    def _entry(self, key):
+        with self._lock:
+            return dict(self.entries.get(key, {}))
+
+    def _update(self, key, **values):
+        with self._lock:
+            entry = self.entries.setdefault(key, {})
+            for name, value in values.items():
+                if isinstance(value, dict):
+                    entry.setdefault(name, {}).update(value)
+                else:
+                    entry[name] = value
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def compile(self, contract):
+        """Compiles `contract` to nile's artifact paths unless the cached artifact is
+        still there, returns the cache key."""
+        with self._lock:
+            lock = self._contract_locks.setdefault(contract, threading.Lock())
+        with lock:
+            key = self.key(contract)
+            output = f"{BUILD_DIRECTORY}/{contract}.json"
+            abi = f"{ABIS_DIRECTORY}/{contract}.json"
+            entry = self._entry(key)
+            if (os.path.exists(output) and os.path.exists(abi)
+                    and entry.get("artifact") == _sha256(Path(output).read_bytes())):
+                print(f"{contract} is up to date, skipping compilation")
+                return key
+
+            os.makedirs(ABIS_DIRECTORY, exist_ok=True)
+            command = ["starknet-compile", str(self.source(contract)),
+                       "--cairo_path", ":".join(self.cairo_path),
+                       "--output", output, "--abi", abi]
+            if contract.endswith("Account"):
+                command.append("--account_contract")
+            print(f"Compiling {contract} 🔨")
+            subprocess.run(command, check=True)
+            self._update(key, contract=contract,
+                         artifact=_sha256(Path(output).read_bytes()))
+            return key
+
+    def declare(self, nre, contract, alias=None):
+        """Returns the class hash of `contract` on `nre.network`, declaring it only
+        when these sources were never declared there. The cached class hash is
+        looked up on the node first, the network alias may point to a new chain."""
+        key = self.compile(contract)
+        class_hash = self._entry(key).get("class_hashes", {}).get(nre.network)
+        if class_hash is not None and not is_declared(nre.network, class_hash):
+            print(f"{contract} class {class_hash} unknown to {nre.network}, declaring it again")
+            class_hash = None
+        if class_hash is None:
+            kwargs = {"alias": alias} if alias else {}
+            class_hash = nre.declare(contract, **kwargs)
+            self._update(key, class_hashes={nre.network: class_hash})
+            return class_hash
+
+        print(f"{contract} already declared at {class_hash} ✨")
+        if alias and next(deployments.load_class(alias, nre.network), None) is None:
+            deployments.register_class_hash(class_hash, nre.network, alias)
+        return class_hash
@@ -0,0 +1,186 @@
+"""Selectors, Uint256 and calldata encoding shared by the scripts and the tests."""
+import json
+from functools import lru_cache, reduce
+from pathlib import Path
+
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+from starkware.starknet.public.abi import get_selector_from_name
+
+UINT128_MASK = (1 << 128) - 1
+TRANSACTION_VERSION = 0
+
+# ABIs written by `nile compile`
+ABIS_DIR = Path(__file__).parent.parent / "artifacts" / "abis"
+
+# Calls whose hash is kept by `hash_multicall`, e.g. the same call sent with
+# another nonce
+CALL_HASH_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=4096)
+def get_selector(name):
+    """`get_selector_from_name`, a keccak, computed once per name."""
+    return get_selector_from_name(name)
+
+
+def str_to_felt(text):
+    b_text = bytes(text, "ascii")
+    return int.from_bytes(b_text, "big")
+
+
+def to_uint(a):
+    """Takes in value, returns uint256-ish tuple."""
+    return (a & UINT128_MASK, a >> 128)
+
+
+def from_uint(uint):
+    """Takes in uint256-ish tuple, returns value."""
+    return uint[0] + (uint[1] << 128)
+
+
+def uint_array(l):
+    return [(a & UINT128_MASK, a >> 128) for a in l]
+
+
+def uarr2cd(arr):
+    """Calldata of an array of uint256-ish tuples: its length, then every low and high."""
+    acc = [len(arr)]
+    for lo, hi in arr:
+        acc.append(lo)
+        acc.append(hi)
+    return acc
+
+
+def encode_uint_array(values):
+    """`uarr2cd(uint_array(values))` in a single pass."""
+    acc = [0] * (2 * len(values) + 1)
+    acc[0] = len(values)
+    acc[1::2] = [a & UINT128_MASK for a in values]
+    acc[2::2] = [a >> 128 for a in values]
+    return acc
+
+
+def compute_hash_on_elements(data):
+    """`compute_hash_on_elements` of cairo-lang, with the C pedersen hash."""
+    return pedersen_hash(reduce(pedersen_hash, data, 0), len(data))
+
+
+def from_call_to_call_array(calls):
+    call_array = []
+    calldata = []
+    for call in calls:
+        assert len(call) == 3, "Invalid call parameters"
+        call_array.append((call[0], get_selector(call[1]), len(calldata), len(call[2])))
+        calldata.extend(call[2])
+    return (call_array, calldata)
+
+
+@lru_cache(maxsize=CALL_HASH_CACHE_SIZE)
+def _call_hash(to, selector, calldata):
+    return compute_hash_on_elements([to, selector, compute_hash_on_elements(calldata)])
+
+
+@lru_cache(maxsize=CALL_HASH_CACHE_SIZE)
+def _multicall_hash_chain(sender, call_hashes):
+    """Hash chain of the message fields before the nonce, the same for every nonce."""
+    return reduce(pedersen_hash, [
+        str_to_felt('StarkNet Transaction'), sender, compute_hash_on_elements(call_hashes)], 0)
+
+
+def hash_multicall(sender, calls, nonce, max_fee):
+    """Hash signed by the accounts for `(to, selector, calldata)` calls, selectors as felts."""
+    call_hashes = tuple(_call_hash(to, selector, tuple(calldata)) for to, selector, calldata in calls)
+
+    # compute_hash_on_elements of [prefix, sender, calls hash, nonce, max_fee, version]
+    h = _multicall_hash_chain(sender, call_hashes)
+    for x in (nonce, max_fee, TRANSACTION_VERSION, 6):
+        h = pedersen_hash(h, x)
+    return h
+
+
+class CalldataEncoder:
+    """
+    Encodes the arguments of the functions of a compiled contract from its ABI.
+
+    felts are ints, Uint256 are ints (or uint256-ish tuples), structs are tuples
+    or dicts of their members and arrays are lists: their `_len` argument is
+    filled in and must not be passed. The layout of each function is parsed once.
+
+    Parameters
+    ----------
+
+    abi : list
+        ABI of the contract, e.g. `contract_class.abi` or the JSON written by
+        `nile compile`.
+
+    Examples
+    ---------
+    >>> encoder = CalldataEncoder(abi)
+    >>> encoder.encode("constructor", name, symbol, 10 ** 18, [owner], owner)
+    >>> encoder.encode("batch_mint", to=owner, ids=[1, 2], amounts=[10, 20])
+    """
+
+    def __init__(self, abi):
+        self._abi = {entry["name"]: entry for entry in abi if "name" in entry}
+        self._structs = {name: entry for name, entry in self._abi.items()
+                         if entry["type"] == "struct"}
+        self._inputs = {}
+
+    def inputs(self, name):
+        """Names and types of the arguments of `name`, without the array lengths."""
+        inputs = self._inputs.get(name)
+        if inputs is None:
+            entry = self._abi[name]
+            arrays = {member["name"] + "_len" for member in entry["inputs"]
+                      if member["type"].endswith("*")}
+            inputs = self._inputs[name] = [(member["name"], member["type"])
+                                           for member in entry["inputs"]
+                                           if member["name"] not in arrays]
+        return inputs
+
+    def encode(self, name, *args, **kwargs):
+        inputs = self.inputs(name)
+        if len(args) + len(kwargs) != len(inputs):
+            raise TypeError(f"{name} takes {len(inputs)} arguments, got {len(args) + len(kwargs)}")
+        values = args + tuple(kwargs[member] for member, _ in inputs[len(args):]) if kwargs else args
+        calldata = []
+        for (_, type_), value in zip(inputs, values):
+            if type_ == "felt":
+                calldata.append(value)
+            elif type_ == "felt*":
+                calldata.append(len(value))
+                calldata.extend(value)
+            elif type_ == "Uint256*" and (not value or isinstance(value[0], int)):
+                calldata.extend(encode_uint_array(value))
+            elif type_.endswith("*"):
+                calldata.append(len(value))
+                for item in value:
+                    self._encode_value(type_[:-1], item, calldata)
+            else:
+                self._encode_value(type_, value, calldata)
+        return calldata
+
+    def _encode_value(self, type_, value, calldata):
+        if type_ == "felt":
+            calldata.append(value)
+        elif type_ == "Uint256" and isinstance(value, int):
+            calldata.append(value & UINT128_MASK)
+            calldata.append(value >> 128)
+        else:
+            members = self._structs[type_]["members"]
+            if isinstance(value, dict):
+                value = [value[member["name"]] for member in members]
+            for member, item in zip(members, value):
+                self._encode_value(member["type"], item, calldata)
+
+
+@lru_cache(maxsize=None)
+def encoder_from_file(path):
+    """CalldataEncoder of the ABI file at `path`, e.g. `artifacts/abis/AstralyIDO.json`."""
+    with open(path) as file:
+        return CalldataEncoder(json.load(file))
+
+
+def get_encoder(contract_name):
+    """CalldataEncoder of the compiled contract `contract_name`, e.g. `AstralyIDOContract`."""
+    return encoder_from_file(str(ABIS_DIR / f"{contract_name}.json"))
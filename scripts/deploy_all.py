@@ -1,4 +1,6 @@
-from utils import deploy_try_catch
+from calldata import to_uint, uint_array, str_to_felt
+from artifact_cache import ArtifactCache
+from deploy_graph import DeploymentGraph, Ref
 import os
 import sys
 from nile.nre import NileRuntimeEnvironment
@@ -10,32 +12,10 @@ import time
 sys.path.append(os.path.dirname(__file__))
 
 
-def to_uint(a):
-    """Takes in value, returns uint256-ish tuple."""
-    return (a & ((1 << 128) - 1), a >> 128)
-
-
-def uint_array(l):
-    return list(map(to_uint, l))
-
-
-def uarr2cd(arr):
-    acc = [len(arr)]
-    for lo, hi in arr:
-        acc.append(lo)
-        acc.append(hi)
-    return acc
-
-
 def parse_ether(value: int):
     return int(value * 1e18)
 
 
-def str_to_felt(text):
-    b_text = bytes(text, "ascii")
-    return int.from_bytes(b_text, "big")
-
-
 # dotenv.load_dotenv()
 # Dummy values, should be replaced by env variables
 # os.environ["SIGNER"] = "123456"
@@ -61,6 +41,9 @@ REWARDS_PER_BLOCK = to_uint(parse_ether(10))
 START_BLOCK = 0
 END_BLOCK = START_BLOCK + 10000
 
+# Number of deployments and declarations run at once
+DEPLOY_CONCURRENCY = int(os.getenv("DEPLOY_CONCURRENCY", "8"))
+
 # LOTTERY TOKEN PARAMS
 lottery_uri = [str(str_to_felt("ipfs://")), str(str_to_felt("dfsffds"))]
 
@@ -102,8 +85,11 @@ def run(nre: NileRuntimeEnvironment):
     print(f"Admin1 account: {admin_1.address}")
     print(f"Admin2 account: {admin_2.address}")
 
+    # unchanged contracts are neither compiled nor declared again
+    graph = DeploymentGraph(DEPLOY_CONCURRENCY, cache=ArtifactCache())
+
     # Deploy ZKP token
-    zkp_token = deploy_try_catch(nre, "AstralyToken", [
+    graph.deploy("zkp_token", "AstralyToken", [
         str(NAME),
         str(SYMBOL),
         DECIMALS,
@@ -113,43 +99,41 @@ def run(nre: NileRuntimeEnvironment):
         signer.address,
         MAX_SUPPLY,
         "0"
-    ], "zkp_token")
-    # xzkp_token_implementation = deploy_try_catch(
-    #     nre, "AstralyStaking", [], "xzkp_token_implementation")
-    xzkp_class_hash = nre.declare("AstralyStaking")
-    xzkp_token = deploy_try_catch(
-        nre, "Proxy", [xzkp_class_hash], "xzkp_token_proxy")
+    ])
+    # graph.deploy("xzkp_token_implementation", "AstralyStaking", [])
+    graph.declare("xzkp_class_hash", "AstralyStaking")
+    graph.deploy("xzkp_token_proxy", "Proxy", [Ref("xzkp_class_hash")])
 
     # deploy harvest task
-    harvest_task = deploy_try_catch(
-        nre, "AstralyVaultHarvestTask", [xzkp_token], "harvest_task")
+    graph.deploy("harvest_task", "AstralyVaultHarvestTask",
+                 [Ref("xzkp_token_proxy")])
 
     # deploy admin contract
-    admin_contract = deploy_try_catch(nre, "AstralyAdmin", [
+    graph.deploy("admin_contract", "AstralyAdmin", [
         os.environ.get("NUMBER_OF_ADMINS"),
         *[admin_1.address, admin_2.address]
-    ], "admin_contract")
+    ])
 
     # deploy random number generator contract
-    xoroshiro_contract = deploy_try_catch(
-        nre, "xoroshiro128_starstar", [
-            os.environ.get("XOROSHIRO_RNG_SEED")
-        ], "xoroshiro_contract")
+    graph.deploy("xoroshiro_contract", "xoroshiro128_starstar", [
+        os.environ.get("XOROSHIRO_RNG_SEED")
+    ])
 
     # Deploy IDO Factory
-    ido_class_hash = nre.declare(
-        "AstralyIDOContract", alias="AstralyIDOContract")
-    factory_contract = deploy_try_catch(
-        nre, "AstralyIDOFactory", [ido_class_hash, signer.address], "factory_contract")
+    graph.declare("ido_class_hash", "AstralyIDOContract",
+                  alias="AstralyIDOContract")
+    graph.deploy("factory_contract", "AstralyIDOFactory",
+                 [Ref("ido_class_hash"), signer.address])
 
     # Deploy Lottery token
-    lottery_token = deploy_try_catch(nre, "AstralyLotteryToken", [
-        str(len(lottery_uri)), *lottery_uri, signer.address, factory_contract
-    ], "lottery_token")
+    graph.deploy("lottery_token", "AstralyLotteryToken", [
+        str(len(lottery_uri)), *lottery_uri, signer.address, Ref("factory_contract")
+    ])
 
     # Deploy IDO Task
-    task_contract = deploy_try_catch(nre, "AstralyTask", [
-        factory_contract
-    ], "task_contract")
+    graph.deploy("task_contract", "AstralyTask", [Ref("factory_contract")])
+
+    graph.run(nre)
+    graph.report()
 
     print("CONTRACTS DEPLOYMENT DONE 🚀")
@@ -0,0 +1,167 @@
+"""Runs independent deployment steps concurrently, each as soon as its inputs are known."""
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import deploy_try_catch
+
+MAX_WORKERS = 8
+
+
+class Ref(namedtuple("Ref", "name")):
+    """Placeholder for the output (address or class hash) of the step `name`."""
+
+
+Step = namedtuple("Step", "name kind contract arguments options")
+Timing = namedtuple("Timing", "name kind depends ready start end status")
+
+
+def _refs(value):
+    if isinstance(value, Ref):
+        return [value.name]
+    if isinstance(value, (list, tuple)):
+        return [name for item in value for name in _refs(item)]
+    return []
+
+
+def _resolve(value, outputs):
+    if isinstance(value, Ref):
+        return outputs[value.name]
+    if isinstance(value, list):
+        return [_resolve(item, outputs) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_resolve(item, outputs) for item in value)
+    return value
+
+
+class DeploymentGraph:
+    """
+    Declarative deployment DAG.
+
+    Steps are `nre.deploy` (through `deploy_try_catch`) or `nre.declare` calls whose
+    arguments may contain `Ref`s to other steps. A step runs on a worker thread as
+    soon as every step it references is done, independent steps run concurrently.
+
+    Examples
+    ---------
+    >>> graph = DeploymentGraph(cache=ArtifactCache())
+    >>> graph.declare("xzkp_class_hash", "AstralyStaking")
+    >>> graph.deploy("xzkp_token_proxy", "Proxy", [Ref("xzkp_class_hash")])
+    >>> graph.deploy("harvest_task", "AstralyVaultHarvestTask", [Ref("xzkp_token_proxy")])
+    >>> outputs = graph.run(nre)
+    >>> graph.report()
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, cache=None):
+        self.max_workers = max_workers
+        # optional `ArtifactCache`, skips compiling and declaring unchanged contracts
+        self.cache = cache
+        self.steps = {}
+        self.timings = {}
+
+    def deploy(self, alias, contract, arguments):
+        """Deploys `contract` under `alias`, the step output is its address."""
+        self._add(Step(alias, "deploy", contract, arguments, {}))
+
+    def declare(self, name, contract, alias=None):
+        """Declares `contract`, the step output is its class hash."""
+        self._add(Step(name, "declare", contract, [], {"alias": alias}))
+
+    def _add(self, step):
+        if step.name in self.steps:
+            raise ValueError(f"DeploymentGraph: duplicated step {step.name}")
+        self.steps[step.name] = step
+
+    def depends(self, name):
+        return sorted(set(_refs(self.steps[name].arguments)))
+
+    def _check(self):
+        for name in self.steps:
+            for dependency in self.depends(name):
+                if dependency not in self.steps:
+                    raise ValueError(
+                        f"DeploymentGraph: {name} references unknown step {dependency}")
+        # every step must eventually become ready
+        done, remaining = set(), set(self.steps)
+        while remaining:
+            ready = {name for name in remaining if set(
+                self.depends(name)) <= done}
+            if not ready:
+                raise ValueError(
+                    f"DeploymentGraph: dependency cycle between {sorted(remaining)}")
+            done |= ready
+            remaining -= ready
+
+    def _execute(self, nre, step, arguments):
+        if step.kind == "declare":
+            if self.cache is not None:
+                return self.cache.declare(nre, step.contract, **step.options)
+            return nre.declare(step.contract, **{k: v for k, v in step.options.items() if v})
+        return deploy_try_catch(nre, step.contract, arguments, step.name, self.cache)
+
+    def run(self, nre):
+        """Runs every step and returns the `name -> output` map. Steps depending on a
+        failed step are skipped."""
+        self._check()
+        outputs, failed = {}, set()
+        waiting = dict(self.steps)
+        running = {}
+        origin = time.perf_counter()
+        ready_at = {}
+
+        def clock():
+            return time.perf_counter() - origin
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while waiting or running:
+                for name, step in list(waiting.items()):
+                    depends = self.depends(name)
+                    if any(d in failed for d in depends):
+                        del waiting[name]
+                        failed.add(name)
+                        self.timings[name] = Timing(
+                            name, step.kind, depends, None, None, None, "skipped")
+                    elif all(d in outputs for d in depends):
+                        del waiting[name]
+                        ready_at[name] = clock()
+                        arguments = _resolve(step.arguments, outputs)
+                        future = executor.submit(
+                            lambda s=step, a=arguments: (clock(), self._execute(nre, s, a)))
+                        running[future] = step
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    end = clock()
+                    try:
+                        start, output = future.result()
+                    except Exception as error:
+                        print(f"{step.name} FAILED: {error}")
+                        start, output = ready_at[step.name], None
+                    if output is None:
+                        failed.add(step.name)
+                    else:
+                        outputs[step.name] = output
+                    self.timings[step.name] = Timing(
+                        step.name, step.kind, self.depends(step.name), ready_at[step.name],
+                        start, end, "failed" if output is None else "done")
+        return outputs
+
+    def report(self):
+        """Prints when each step was ready, started and ended, relative to the start of `run`."""
+        print(f"{'step':<28} {'kind':<8} {'ready':>8} {'start':>8} {'end':>8} {'took':>8}  depends on")
+        timings = sorted(self.timings.values(),
+                         key=lambda t: (t.start is None, t.start or 0))
+        for t in timings:
+            if t.start is None:
+                print(f"{t.name:<28} {t.kind:<8} {t.status:>35}  {', '.join(t.depends)}")
+                continue
+            print(f"{t.name:<28} {t.kind:<8} {t.ready:>7.1f}s {t.start:>7.1f}s {t.end:>7.1f}s "
+                  f"{t.end - t.start:>7.1f}s  {', '.join(t.depends)}"
+                  + ("" if t.status == "done" else f"  [{t.status}]"))
+        ended = [t.end for t in timings if t.end is not None]
+        if ended:
+            sequential = sum(t.end - t.start for t in timings if t.end is not None)
+            print(f"total {max(ended):.1f}s, {sequential:.1f}s if run one after another")
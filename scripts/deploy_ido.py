@@ -1,3 +1,4 @@
+from calldata import get_encoder
 from utils import deploy_try_catch, run_tx
 import os
 import sys
@@ -8,23 +9,6 @@ from nile.nre import NileRuntimeEnvironment
 sys.path.append(os.path.dirname(__file__))
 
 
-def to_uint(a):
-    """Takes in value, returns uint256-ish tuple."""
-    return (a & ((1 << 128) - 1), a >> 128)
-
-
-def uint_array(l):
-    return list(map(to_uint, l))
-
-
-def uarr2cd(arr):
-    acc = [len(arr)]
-    for lo, hi in arr:
-        acc.append(lo)
-        acc.append(hi)
-    return acc
-
-
 IDO_TOKEN_PRICE = "10000000000000000"  # 0.01 ETH
 IDO_TOKENS_TO_SELL = "100000000000000000000000"  # 100,000 TOKENS
 # vestion portion percentages must add up to 1000
@@ -41,7 +25,7 @@ REGISTRATION_START = day + timedelta(days=1)
 IDO_TOKEN_UNLOCK = IDO_SALE_END + timeDeltaWeeks
 
 # VESTING_PERCENTAGES & VESTING_TIMES_UNLOCKED arrays must match in length
-VESTING_PERCENTAGES = uint_array([100, 200, 300, 400])
+VESTING_PERCENTAGES = [100, 200, 300, 400]
 VESTING_TIMES_UNLOCKED = [
     int(IDO_TOKEN_UNLOCK.timestamp()) + (1 * 24 *
                                          60 * 60),  # 1 day after tokens unlock time
@@ -88,36 +72,28 @@ def run(nre: NileRuntimeEnvironment):
     run_tx(signer, factory_contract, "create_ido",
            [])
 
+    # calldata of the IDO contract functions, from its ABI
+    ido = get_encoder("AstralyIDOContract")
+
     # set IDO contract sale parameters
-    run_tx(admin_1, ido_contract_full, "set_sale_params", [
-        # _token_address : felt
-        int(zkp_token, 16),
-        # _sale_owner_address : felt
-        int(signer.address, 16),
-        # _token_price : Uint256
-        *to_uint(int(IDO_TOKEN_PRICE)),
-        # _amount_of_tokens_to_sell : Uint256
-        *to_uint(int(IDO_TOKENS_TO_SELL)),
-        # _sale_end_time : felt
-        int(IDO_SALE_END.timestamp()),
-        # _tokens_unlock_time : felt
-        int(IDO_TOKEN_UNLOCK.timestamp()),
-        # _portion_vesting_precision : Uint256
-        *to_uint(int(IDO_PORTION_VESTING_PRECISION)),
-        # _lottery_tickets_burn_cap : Uint256
-        *to_uint(int(IDO_LOTTERY_TOKENS_BURN_CAP))
-    ])
+    run_tx(admin_1, ido_contract_full, "set_sale_params", ido.encode(
+        "set_sale_params",
+        _token_address=int(zkp_token, 16),
+        _sale_owner_address=int(signer.address, 16),
+        _token_price=int(IDO_TOKEN_PRICE),
+        _amount_of_tokens_to_sell=int(IDO_TOKENS_TO_SELL),
+        _sale_end_time=int(IDO_SALE_END.timestamp()),
+        _tokens_unlock_time=int(IDO_TOKEN_UNLOCK.timestamp()),
+        _portion_vesting_precision=int(IDO_PORTION_VESTING_PRECISION),
+        _lottery_tickets_burn_cap=int(IDO_LOTTERY_TOKENS_BURN_CAP)
+    ))
 
     # set IDO vesting parameters
-    run_tx(admin_1, ido_contract_full, "set_vesting_params", [
-        4,
-        *VESTING_TIMES_UNLOCKED,
-        *uarr2cd(VESTING_PERCENTAGES),
-        0
-    ])
+    run_tx(admin_1, ido_contract_full, "set_vesting_params", ido.encode(
+        "set_vesting_params", VESTING_TIMES_UNLOCKED, VESTING_PERCENTAGES, 0))
 
     # set IDO registration time
-    run_tx(admin_1, ido_contract_full, "set_registration_time", [
-        int(REGISTRATION_START.timestamp()), int(REGISTRATION_END.timestamp())])
+    run_tx(admin_1, ido_contract_full, "set_registration_time", ido.encode(
+        "set_registration_time", int(REGISTRATION_START.timestamp()), int(REGISTRATION_END.timestamp())))
 
     print("IDO SUCESSFULLY DEPLOYED 🚀")
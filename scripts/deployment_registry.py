@@ -0,0 +1,156 @@
+"""Indexed view of `{network}.deployments.txt`, loaded once instead of scanned per lookup."""
+import json
+import os
+import pickle
+
+from nile.common import DEPLOYMENTS_FILENAME
+
+CACHE_VERSION = 1
+
+
+def _stamp(path):
+    """Changes whenever `path` is rewritten or appended to."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_abi(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class DeploymentRegistry:
+    """
+    Alias and address indexes of the deployments of a network, with their ABIs parsed.
+
+    The indexes are pickled next to the deployments file and only rebuilt when
+    the deployments file or one of the ABI files changed, so scripts touching
+    many aliases do not read and split the text file on every lookup.
+    Lookups follow `nre.get_deployment`: the first line matching an alias or an
+    address wins.
+
+    Parameters
+    ----------
+    network : str
+    path : str
+        Deployments file, `{network}.deployments.txt` by default
+    cache_path : str
+        Binary cache, `{network}.deployments.cache` by default
+
+    Examples
+    ---------
+    >>> registry = DeploymentRegistry(nre.network)
+    >>> zkp_token, zkp_token_abi = registry.get("zkp_token")
+    >>> registry.abi("zkp_token")[0]["name"]
+    """
+
+    def __init__(self, network, path=None, cache_path=None):
+        self.network = network
+        self.path = path or f"{network}.{DEPLOYMENTS_FILENAME}"
+        self.cache_path = cache_path or f"{network}.deployments.cache"
+        self.stamp = None
+        self.aliases = {}
+        self.addresses = {}
+        self.abis = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the indexes if the deployments file changed since they were built."""
+        stamp = _stamp(self.path)
+        if stamp == self.stamp and self._abis_fresh():
+            return
+        if not self._load_cache(stamp):
+            self._build(stamp)
+            self._save_cache()
+
+    def _abis_fresh(self):
+        return all(_stamp(path) == abi_stamp for path, (abi_stamp, _) in self.abis.items())
+
+    def _load_cache(self, stamp):
+        try:
+            with open(self.cache_path, "rb") as f:
+                version, cached_stamp, aliases, addresses, abis = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return False
+        if version != CACHE_VERSION or cached_stamp != stamp:
+            return False
+        self.stamp, self.aliases, self.addresses, self.abis = stamp, aliases, addresses, abis
+        if not self._abis_fresh():
+            self.abis = {path: (_stamp(path), _parse_abi(path)) for path in self.abis}
+            self._save_cache()
+        return True
+
+    def _build(self, stamp):
+        self.stamp, self.aliases, self.addresses, self.abis = stamp, {}, {}, {}
+        if stamp is None:
+            return
+        with open(self.path) as fp:
+            for line in fp:
+                if not line.strip():
+                    continue
+                [address, abi, *alias] = line.strip().split(":")
+                deployment = (address, abi)
+                self.addresses.setdefault(int(address, 16), deployment)
+                for name in alias:
+                    self.aliases.setdefault(name, deployment)
+                if abi not in self.abis:
+                    self.abis[abi] = (_stamp(abi), _parse_abi(abi))
+
+    def _save_cache(self):
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((CACHE_VERSION, self.stamp, self.aliases, self.addresses, self.abis),
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_path)
+
+    def find(self, identifier):
+        """Returns `(address, abi path)` of an alias or an address, None if unknown."""
+        deployment = self.aliases.get(identifier)
+        # addresses are indexed by value, "0x04e9..." and "0x4e9..." are the same
+        if deployment is None and isinstance(identifier, int):
+            deployment = self.addresses.get(identifier)
+        elif deployment is None and identifier.startswith("0x"):
+            try:
+                deployment = self.addresses.get(int(identifier, 16))
+            except ValueError:
+                pass
+        return deployment
+
+    def get(self, identifier):
+        """Like `nre.get_deployment`, raises KeyError for unknown identifiers."""
+        deployment = self.find(identifier)
+        if deployment is None:
+            raise KeyError(f"DeploymentRegistry: no deployment {identifier} in {self.path}")
+        return deployment
+
+    def address(self, identifier):
+        return self.get(identifier)[0]
+
+    def abi(self, identifier):
+        """Parsed ABI of a deployment, None if its ABI file is missing."""
+        return self.abis[self.get(identifier)[1]][1]
+
+    def __contains__(self, identifier):
+        return self.find(identifier) is not None
+
+    def __len__(self):
+        return len(self.aliases)
+
+
+_registries = {}
+
+
+def get_registry(network):
+    """Registry of `network` shared by the whole process, refreshed on each call."""
+    registry = _registries.get(network)
+    if registry is None:
+        registry = _registries[network] = DeploymentRegistry(network)
+    else:
+        registry.refresh()
+    return registry
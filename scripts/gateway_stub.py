@@ -0,0 +1,94 @@
+"""
+Local stand-in for the few StarkNet gateway endpoints used by the scripts.
+
+    python scripts/gateway_stub.py --port 5000 --block-time 2
+
+Listens where node.json points the local network (http://127.0.0.1:5000/).
+Transactions are RECEIVED when added, PENDING after half a block and accepted
+after a full block, a `--reject-rate` share of them is REJECTED instead.
+"""
+import argparse
+import itertools
+import random
+import time
+
+from aiohttp import web
+
+
+class GatewayStub:
+    def __init__(self, block_time=2.0, reject_rate=0.0, seed=None):
+        self.block_time = block_time
+        self.reject_rate = reject_rate
+        self.requests = 0
+        self.transactions = {}
+        self.nonces = {}
+        self._random = random.Random(seed)
+        self._hashes = itertools.count(1)
+
+    def add(self, sender=0, rejected=None):
+        """Registers a transaction and returns its hash."""
+        tx_hash = hex(next(self._hashes))
+        if rejected is None:
+            rejected = self._random.random() < self.reject_rate
+        self.transactions[tx_hash] = (time.monotonic(), rejected)
+        if not rejected:
+            self.nonces[sender] = self.nonces.get(sender, 0) + 1
+        return tx_hash
+
+    def status(self, tx_hash):
+        if tx_hash not in self.transactions:
+            return {"tx_status": "NOT_RECEIVED"}
+        added, rejected = self.transactions[tx_hash]
+        age = time.monotonic() - added
+        if age < self.block_time / 2:
+            return {"tx_status": "RECEIVED"}
+        if rejected:
+            return {"tx_status": "REJECTED", "tx_failure_reason": {
+                "code": "TRANSACTION_FAILED", "error_message": "rejected by gateway_stub"}}
+        if age < self.block_time:
+            return {"tx_status": "PENDING"}
+        return {"tx_status": "ACCEPTED_ON_L2", "block_hash": hex(int(added // self.block_time))}
+
+    async def handle_add_transaction(self, request):
+        self.requests += 1
+        tx = await request.json()
+        tx_hash = self.add(int(tx.get("contract_address", "0x0"), 16))
+        return web.json_response({"code": "TRANSACTION_RECEIVED", "transaction_hash": tx_hash})
+
+    async def handle_transaction_status(self, request):
+        self.requests += 1
+        return web.json_response(self.status(request.query.get("transactionHash")))
+
+    async def handle_call_contract(self, request):
+        # only `get_nonce` is answered, the nonce is the number of transactions sent
+        self.requests += 1
+        call = await request.json()
+        nonce = self.nonces.get(int(call.get("contract_address", "0x0"), 16), 0)
+        return web.json_response({"result": [hex(nonce)]})
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([
+            web.post("/gateway/add_transaction", self.handle_add_transaction),
+            web.get("/feeder_gateway/get_transaction_status",
+                    self.handle_transaction_status),
+            web.post("/feeder_gateway/call_contract", self.handle_call_contract),
+        ])
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--block-time", type=float, default=2.0)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = GatewayStub(args.block_time, args.reject_rate)
+    web.run_app(stub.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
-from utils import generate_merkle_proof, generate_merkle_root, get_leaves
+from merkle import MerkleTree, hash_leaves_stream
+from merkle_store import MerkleStore
+from node_cache import NodeCache
 from pymongo import MongoClient
+from concurrent.futures import ProcessPoolExecutor
 import os
 from pprint import pprint as pp
 import sys
@@ -12,38 +15,55 @@ HOST = os.getenv("DB_HOST")
 NAME = os.getenv("DB_NAME")
 
 IDO_ID = 3
+# Hashes of the previous round, most addresses keep their quest count between rounds
+NODE_CACHE_PATH = os.getenv("NODE_CACHE_PATH", "quests.nodes")
+# Number of aggregation results fetched per round-trip
+BATCH_SIZE = 10_000
 
 
-def generateQuestData():
-    client = MongoClient(HOST)
+def quest_counts(db, ido_id):
+    """
+    Yields `(address, nb_quest)` for every account that did quests for `ido_id`.
+
+    The counts are computed server-side by a single aggregation instead of one
+    `count_documents` per account, then streamed in batches.
+    """
+    pipeline = [
+        {"$match": {"idoId": ido_id}},
+        {"$group": {"_id": "$address", "nb_quest": {"$sum": 1}}},
+        # only keep addresses that still have an account
+        {"$lookup": {"from": "accounts", "localField": "_id",
+                     "foreignField": "address", "as": "account"}},
+        {"$match": {"account": {"$ne": []}}},
+        {"$project": {"nb_quest": 1}},
+        {"$sort": {"_id": 1}},
+    ]
+    for result in db.questsHistory.aggregate(pipeline, allowDiskUse=True, batchSize=BATCH_SIZE):
+        yield int(result["_id"], 16), result["nb_quest"]
+
+
+def generateQuestData(client=None):
+    if client is None:
+        client = MongoClient(HOST)
     db = client['zkpad-dev']
-    accounts = db.accounts
-    history = db.questsHistory
-    recipients = []
-    amounts = []
     print('Generating ...')
-    for account in accounts.find():
-        # pp(account)
-        address = account['address']
-        nb_Quest = history.count_documents(
-            {"address": address, "idoId": IDO_ID})
-        if nb_Quest > 0:
-            recipients.append(int(address, 16))
-            amounts.append(nb_Quest)
-    MERKLE_INFO = get_leaves(recipients, amounts)
-    leaves = list(map(lambda x: x[0], MERKLE_INFO))
-    root = generate_merkle_root(leaves)
-    print(root)
-    cached_level = {}
-    cached_level["1"] = []
-    cached_level["2"] = []
-    addressProofMap = dict(map(lambda x, i: [hex(x), generate_merkle_proof(
-        leaves, i, cached_level)], recipients, [k for k in range(len(recipients))]))
-    # merkle_proof = db.merkleProofs.find_one({"idoId":IDO_ID})
-    # if merkle_proof :
-    #     db.merkleProofs.find_one_and_update({})
-    db.merkleProofs.insert_one({"idoId": IDO_ID, "data": addressProofMap})
+    cache = NodeCache(NODE_CACHE_PATH)
+    with ProcessPoolExecutor() as executor:
+        recipients, amounts, leaves = hash_leaves_stream(
+            quest_counts(db, IDO_ID), executor, cache)
+        if len(leaves) % 2 != 0:
+            leaves.append(0)
+        tree = MerkleTree(leaves, executor, cache)
+    cache.save(NODE_CACHE_PATH)
+    print(cache.report())
+    print(tree.root)
+    # Proofs are served from this file by proof_server.py, new quest
+    # completions update it in place with update_merkle_root.py
+    MerkleStore.create(f"quests_{IDO_ID}.merkle",
+                       recipients, amounts, tree=tree).close()
+    db.merkleProofs.insert_one({"idoId": IDO_ID, "root": hex(tree.root)})
     print("done")
 
 
-generateQuestData()
+if __name__ == "__main__":
+    generateQuestData()
@@ -0,0 +1,157 @@
+"""In-memory stand-in for the few pymongo calls made by the scripts.
+
+Used to run and benchmark `generate_quest_data.py` offline. Every call that
+would be a round-trip to the server sleeps `latency` seconds.
+"""
+import time
+from collections import defaultdict
+
+
+def _get(document, field):
+    for key in field.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(key)
+    return document
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        value = _get(document, field)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$ne":
+                    if value == operand:
+                        return False
+                elif operator == "$in":
+                    if value not in operand:
+                        return False
+                elif operator == "$gt":
+                    if value is None or value <= operand:
+                        return False
+                else:
+                    raise NotImplementedError(
+                        f"MemoryCollection: unsupported operator {operator}")
+        elif value != condition:
+            return False
+    return True
+
+
+class MemoryCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.documents = []
+
+    def _round_trip(self):
+        self.database.round_trips += 1
+        if self.database.latency > 0:
+            time.sleep(self.database.latency)
+
+    def insert_one(self, document):
+        self._round_trip()
+        self.documents.append(document)
+
+    def insert_many(self, documents):
+        self._round_trip()
+        self.documents.extend(documents)
+
+    def find(self, query=None):
+        self._round_trip()
+        return iter([d for d in self.documents if _matches(d, query or {})])
+
+    def find_one(self, query=None):
+        self._round_trip()
+        return next((d for d in self.documents if _matches(d, query or {})), None)
+
+    def count_documents(self, query):
+        self._round_trip()
+        return sum(1 for d in self.documents if _matches(d, query))
+
+    def aggregate(self, pipeline, **kwargs):
+        """Supports the $match, $group ($sum), $lookup, $project and $sort stages."""
+        self._round_trip()
+        documents = self.documents
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            documents = getattr(self, "_" + operator[1:])(documents, spec)
+        return iter(documents)
+
+    def _match(self, documents, spec):
+        return [d for d in documents if _matches(d, spec)]
+
+    def _group(self, documents, spec):
+        groups = defaultdict(dict)
+        for document in documents:
+            key = _get(document, spec["_id"][1:])
+            group = groups[key]
+            for field, accumulator in spec.items():
+                if field == "_id":
+                    continue
+                (operator, operand), = accumulator.items()
+                if operator != "$sum":
+                    raise NotImplementedError(
+                        f"MemoryCollection: unsupported accumulator {operator}")
+                value = _get(document, operand[1:]) if isinstance(
+                    operand, str) else operand
+                group[field] = group.get(field, 0) + value
+        return [{"_id": key, **fields} for key, fields in groups.items()]
+
+    def _lookup(self, documents, spec):
+        foreign = defaultdict(list)
+        for document in self.database[spec["from"]].documents:
+            foreign[_get(document, spec["foreignField"])].append(document)
+        return [{**d, spec["as"]: foreign.get(_get(d, spec["localField"]), [])}
+                for d in documents]
+
+    def _project(self, documents, spec):
+        if any(spec.values()):
+            keep = {"_id", *[field for field, on in spec.items() if on]}
+            if spec.get("_id", 1) == 0:
+                keep.discard("_id")
+            return [{k: v for k, v in d.items() if k in keep} for d in documents]
+        return [{k: v for k, v in d.items() if k not in spec} for d in documents]
+
+    def _sort(self, documents, spec):
+        for field, direction in reversed(list(spec.items())):
+            documents = sorted(documents, key=lambda d: _get(
+                d, field), reverse=direction < 0)
+        return documents
+
+
+class MemoryDatabase:
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.round_trips = 0
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class MemoryClient:
+    """
+    Drop-in replacement for `MongoClient(HOST)`.
+
+    Examples
+    ---------
+    >>> client = MemoryClient(latency=0.001)
+    >>> client['zkpad-dev'].accounts.insert_many([{"address": "0x1"}])
+    >>> generateQuestData(client)
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self.latency)
+        return self._databases[name]
@@ -0,0 +1,216 @@
+"""Merkle tree used to whitelist quest completions in `burn_with_quest`."""
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+
+# Levels smaller than this are hashed in the current process, the pickling
+# overhead of a process pool is higher than the hashing itself.
+PARALLEL_THRESHOLD = 2 ** 13
+# Number of nodes sent to a worker at once, must be even so pairs are not split.
+CHUNK_SIZE = 2 ** 11
+
+
+def hash_pair(a, b):
+    """Hashes two nodes the same way `calc_merkle_root` does: smallest value first."""
+    if a <= b:
+        return pedersen_hash(a, b)
+    return pedersen_hash(b, a)
+
+
+def hash_level_chunk(chunk):
+    return [hash_pair(chunk[i], chunk[i + 1]) for i in range(0, len(chunk), 2)]
+
+
+def hash_leaves_chunk(chunk):
+    return [pedersen_hash(recipient, amount) for recipient, amount in chunk]
+
+
+def map_chunks(func, values, executor=None):
+    """
+    Applies `func` to `values` split in chunks of CHUNK_SIZE.
+
+    The chunks are dispatched on `executor` (e.g. a ProcessPoolExecutor) when one
+    is given and there are at least PARALLEL_THRESHOLD values, otherwise `func`
+    runs serially in the current process.
+    """
+    if executor is None or len(values) < PARALLEL_THRESHOLD:
+        return func(values)
+
+    chunks = [values[i:i + CHUNK_SIZE]
+              for i in range(0, len(values), CHUNK_SIZE)]
+    result = []
+    for hashes in executor.map(func, chunks):
+        result.extend(hashes)
+    return result
+
+
+def hash_leaves_stream(pairs, executor=None, cache=None):
+    """
+    Hashes the leaves of `(recipient, amount)` pairs coming from any iterable.
+
+    Full chunks are handed to `executor` as soon as they are read, so hashing
+    overlaps with the producer (e.g. a database cursor). Leaves found in `cache`
+    (a `NodeCache`) are not hashed again.
+    Returns the recipients, amounts and leaves lists.
+    """
+    recipients, amounts, leaves, pending = [], [], [], []
+    chunk, positions = [], []
+
+    def flush():
+        pending.append((positions, chunk if executor is None else executor.submit(
+            hash_leaves_chunk, chunk)))
+
+    for recipient, amount in pairs:
+        recipients.append(recipient)
+        amounts.append(amount)
+        leaf = None if cache is None else cache.get(recipient, amount)
+        leaves.append(leaf)
+        if leaf is None:
+            chunk.append((recipient, amount))
+            positions.append(len(leaves) - 1)
+            if len(chunk) == CHUNK_SIZE:
+                flush()
+                chunk, positions = [], []
+    if chunk:
+        flush()
+
+    for positions, item in pending:
+        hashes = hash_leaves_chunk(item) if executor is None else item.result()
+        for position, leaf in zip(positions, hashes):
+            leaves[position] = leaf
+            if cache is not None:
+                cache.add(recipients[position], amounts[position], leaf)
+    return recipients, amounts, leaves
+
+
+def next_level(level, executor=None, cache=None):
+    """Returns the parents of `level`, padding it with a zero node if its length is odd."""
+    if len(level) % 2 != 0:
+        level.append(0)
+    if cache is not None:
+        return cache.hash_pairs([(a, b) if a <= b else (b, a)
+                                 for a, b in zip(level[::2], level[1::2])], executor)
+    return map_chunks(hash_level_chunk, level, executor)
+
+
+class MerkleTree:
+    """
+    Merkle tree holding every level in memory.
+
+    Each level is hashed exactly once when the tree is built, proofs are then
+    simple lookups. Roots and proofs are identical to the ones produced by
+    `generate_merkle_root` / `generate_merkle_proof` and are accepted by
+    `calc_merkle_root` in AstralyLotteryToken.
+
+    Parameters
+    ----------
+    leaves : list of felts
+    executor : optional concurrent.futures executor used to hash wide levels
+    cache : optional `NodeCache` looked up before hashing a pair of nodes
+
+    Examples
+    ---------
+    >>> tree = MerkleTree([x[0] for x in get_leaves(recipients, amounts)])
+    >>> tree.root
+    >>> tree.get_proof(0)
+    >>> all_proofs = tree.get_all_proofs()
+
+    Hashing on every core
+
+    >>> with ProcessPoolExecutor() as executor:
+            tree = MerkleTree(leaves, executor)
+    """
+
+    def __init__(self, leaves, executor=None, cache=None):
+        if len(leaves) == 0:
+            raise ValueError("MerkleTree: cannot build a tree without leaves")
+
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            self.levels.append(next_level(self.levels[-1], executor, cache))
+
+    @property
+    def root(self):
+        return self.levels[-1][0]
+
+    @property
+    def leaves(self):
+        return self.levels[0]
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def get_proof(self, index):
+        """Returns the sibling path from the leaf at `index` up to (excluding) the root."""
+        proof = []
+        for level in self.levels[:-1]:
+            proof.append(level[index ^ 1])
+            index //= 2
+        return proof
+
+    def get_multi_proof(self, indices):
+        """
+        Returns the `(proof, proof_flags)` multiproof of the leaves at `indices`,
+        accepted by `merkle_multi_verify` in AstralyLotteryToken.
+
+        `indices` must be sorted. Nodes shared by the paths of several leaves are
+        neither part of the proof nor hashed twice when verifying, see
+        `process_multi_proof`.
+        """
+        if len(indices) == 0:
+            raise ValueError("MerkleTree: multiproof needs at least one leaf")
+        if any(a >= b for a, b in zip(indices, indices[1:])):
+            raise ValueError("MerkleTree: multiproof indices must be sorted and unique")
+        if indices[0] < 0 or indices[-1] >= len(self):
+            raise IndexError("MerkleTree: leaf index out of range")
+
+        proof, proof_flags = [], []
+        known = list(indices)
+        for level in self.levels[:-1]:
+            parents = []
+            i = 0
+            while i < len(known):
+                index = known[i]
+                if i + 1 < len(known) and known[i + 1] == index ^ 1:
+                    # both children are known, the second one comes from the queue
+                    proof_flags.append(1)
+                    i += 2
+                else:
+                    proof.append(level[index ^ 1])
+                    proof_flags.append(0)
+                    i += 1
+                parents.append(index // 2)
+            known = parents
+        return proof, proof_flags
+
+    def get_all_proofs(self):
+        """Returns the proofs of every leaf, walking each level only once."""
+        proofs = [[] for _ in range(len(self.levels[0]))]
+        for depth, level in enumerate(self.levels[:-1]):
+            for index, proof in enumerate(proofs):
+                proof.append(level[(index >> depth) ^ 1])
+        return proofs
+
+
+def process_multi_proof(leaves, proof, proof_flags):
+    """
+    Returns the root computed from a multiproof, as `calc_merkle_multi_root` does.
+
+    Leaves and computed nodes are read in order from a single queue: each hash
+    takes its first node from the queue, and its second one from the queue if
+    its flag is set, from `proof` otherwise.
+    """
+    if len(leaves) == 0 or len(leaves) + len(proof) - 1 != len(proof_flags):
+        raise ValueError("invalid merkle multiproof")
+
+    queue = list(leaves)
+    position = 0
+    proof = iter(proof)
+    for flag in proof_flags:
+        a = queue[position]
+        if flag:
+            b = queue[position + 1]
+            position += 2
+        else:
+            b = next(proof)
+            position += 1
+        queue.append(hash_pair(a, b))
+    return queue[-1]
@@ -0,0 +1,273 @@
+"""Memory-mapped, incrementally updatable quest Merkle tree."""
+import mmap
+import os
+import struct
+
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+
+from merkle import MerkleTree, hash_pair, hash_leaves_chunk, map_chunks
+
+MAGIC = b"AMKL"
+VERSION = 1
+# magic, version, capacity, number of leaves
+HEADER = struct.Struct("<4sHxxQQ")
+HEADER_SIZE = 32
+FELT_SIZE = 32
+# (address, nb_quest) stored for each leaf
+RECORD_SIZE = 2 * FELT_SIZE
+MIN_CAPACITY = 2
+
+
+def _capacity_for(size):
+    capacity = MIN_CAPACITY
+    while capacity < size:
+        capacity *= 2
+    return capacity
+
+
+def _file_size(capacity):
+    # records + (2 * capacity - 1) tree nodes
+    return HEADER_SIZE + capacity * RECORD_SIZE + (2 * capacity - 1) * FELT_SIZE
+
+
+def _level_lengths(size):
+    """Level lengths of a tree built from `get_leaves`: the leaves are padded to an even
+    count, then every odd level gets a zero node appended."""
+    length = size + size % 2
+    lengths = [length]
+    while length > 1:
+        length = (length + 1) // 2
+        lengths.append(length)
+    return lengths
+
+
+class MerkleStore:
+    """
+    Quest Merkle tree persisted as fixed-width 32 bytes felts in a memory-mapped file.
+
+    The file holds, after a small header, the `(address, nb_quest)` record of every
+    leaf followed by one felt array per level, each level sized for `capacity`
+    leaves. Updating or appending a leaf only rehashes its path to the root, so
+    a quest completion costs O(log n) hashes instead of a full rebuild.
+
+    Roots and proofs match `MerkleTree` built from `get_leaves(recipients, amounts)`.
+
+    Examples
+    ---------
+    Building the store once
+
+    >>> store = MerkleStore.create("quests_3.merkle", recipients, amounts)
+
+    Recording a new quest completion and reading the new root
+
+    >>> with MerkleStore("quests_3.merkle") as store:
+            store.set_leaf(address, nb_quest)
+            root = store.root
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+        magic, version, self.capacity, self.size = HEADER.unpack_from(
+            self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"MerkleStore: {path} is not a merkle store")
+
+        self._index = {}
+        for i in range(self.size):
+            self._index[self._read(self._record_offset(i))] = i
+
+    @classmethod
+    def create(cls, path, recipients, amounts, executor=None, tree=None):
+        """
+        Writes a new store for `recipients` / `amounts` at `path` and opens it.
+        `tree` can be given to reuse the levels of a `MerkleTree` already built
+        from the same leaves.
+        """
+        if len(recipients) != len(amounts):
+            raise ValueError(
+                "MerkleStore: recipients and amounts must have the same length")
+        if len(set(recipients)) != len(recipients):
+            raise ValueError("MerkleStore: duplicated recipient")
+
+        capacity = _capacity_for(len(recipients))
+        with open(path, "wb") as f:
+            f.truncate(_file_size(capacity))
+            f.write(HEADER.pack(MAGIC, VERSION, capacity, len(recipients)))
+
+        store = cls(path)
+        for i, (recipient, amount) in enumerate(zip(recipients, amounts)):
+            store._write_record(i, recipient, amount)
+            store._index[recipient] = i
+
+        if tree is None and len(recipients) > 0:
+            leaves = map_chunks(hash_leaves_chunk, list(
+                zip(recipients, amounts)), executor)
+            if len(leaves) % 2 != 0:
+                leaves.append(0)
+            tree = MerkleTree(leaves, executor)
+        if tree is not None:
+            for depth, level in enumerate(tree.levels):
+                store._write_level(depth, level)
+        store.flush()
+        return store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, address):
+        return address in self._index
+
+    @property
+    def root(self):
+        if self.size == 0:
+            raise ValueError("MerkleStore: empty tree has no root")
+        return self._read_node(len(_level_lengths(self.size)) - 1, 0)
+
+    def index_of(self, address):
+        return self._index[address]
+
+    def get_record(self, index):
+        """Returns the `(address, nb_quest)` stored at leaf `index`."""
+        offset = self._record_offset(index)
+        return self._read(offset), self._read(offset + FELT_SIZE)
+
+    def get_proof(self, index):
+        """Returns the sibling path of the leaf at `index`, as `MerkleTree.get_proof`."""
+        if not 0 <= index < self.size:
+            raise IndexError("MerkleStore: leaf index out of range")
+        proof = []
+        for depth in range(len(_level_lengths(self.size)) - 1):
+            proof.append(self._read_node(depth, index ^ 1))
+            index //= 2
+        return proof
+
+    def set_leaf(self, address, nb_quest):
+        """
+        Sets the number of quests done by `address`, appending a new leaf if the
+        address is not in the tree yet. Returns the leaf index.
+        """
+        index = self._index.get(address)
+        if index is None:
+            index = self.size
+            if index == self.capacity:
+                self._grow()
+            self.size += 1
+            self._index[address] = index
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION,
+                             self.capacity, self.size)
+
+        self._write_record(index, address, nb_quest)
+        self._write_node(0, index, pedersen_hash(address, nb_quest))
+        self._update_path(index)
+        return index
+
+    def refresh(self):
+        """
+        Picks up the leaves written to the file by another `MerkleStore`: reopens it
+        when it was replaced, e.g. grown, and indexes the leaves appended since.
+        Leaves updated in place are read through the shared mapping.
+        """
+        stat = os.stat(self.path)
+        if (stat.st_dev, stat.st_ino) != self._file_id:
+            self.close()
+            self._open()
+        _, _, self.capacity, size = HEADER.unpack_from(self._map, 0)
+        for i in range(self.size, size):
+            self._index[self._read(self._record_offset(i))] = i
+        self.size = size
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def _open(self):
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        stat = os.fstat(self._file.fileno())
+        self._file_id = (stat.st_dev, stat.st_ino)
+
+    def _update_path(self, index):
+        lengths = _level_lengths(self.size)
+        for depth in range(len(lengths) - 1):
+            left = index & ~1
+            node = hash_pair(self._read_node(depth, left),
+                             self._read_node(depth, left + 1))
+            index //= 2
+            self._write_node(depth + 1, index, node)
+
+    def _grow(self):
+        """Doubles the capacity, copying records and levels to their new offsets."""
+        old_map, old_capacity = self._map, self.capacity
+        new_capacity = old_capacity * 2
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.truncate(_file_size(new_capacity))
+        with open(tmp_path, "r+b") as f:
+            new_map = mmap.mmap(f.fileno(), 0)
+            HEADER.pack_into(new_map, 0, MAGIC, VERSION,
+                             new_capacity, self.size)
+            records = old_capacity * RECORD_SIZE
+            new_map[HEADER_SIZE:HEADER_SIZE + records] = \
+                old_map[HEADER_SIZE:HEADER_SIZE + records]
+            depth, length = 0, old_capacity
+            while length >= 1:
+                old = _level_offset(old_capacity, depth)
+                new = _level_offset(new_capacity, depth)
+                new_map[new:new + length * FELT_SIZE] = \
+                    old_map[old:old + length * FELT_SIZE]
+                depth, length = depth + 1, length // 2
+            new_map.flush()
+            new_map.close()
+
+        old_map.close()
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+        self.capacity = new_capacity
+
+    def _write_level(self, depth, level):
+        offset = _level_offset(self.capacity, depth)
+        self._map[offset:offset + len(level) * FELT_SIZE] = b"".join(
+            node.to_bytes(FELT_SIZE, "big") for node in level)
+
+    def _write_record(self, index, address, nb_quest):
+        offset = self._record_offset(index)
+        self._write(offset, address)
+        self._write(offset + FELT_SIZE, nb_quest)
+
+    def _record_offset(self, index):
+        return HEADER_SIZE + index * RECORD_SIZE
+
+    def _read_node(self, depth, index):
+        # nodes past the end of a level are the zero padding nodes
+        if index >= self.capacity >> depth:
+            return 0
+        return self._read(_level_offset(self.capacity, depth) + index * FELT_SIZE)
+
+    def _write_node(self, depth, index, node):
+        self._write(_level_offset(self.capacity, depth) +
+                    index * FELT_SIZE, node)
+
+    def _read(self, offset):
+        return int.from_bytes(self._map[offset:offset + FELT_SIZE], "big")
+
+    def _write(self, offset, value):
+        self._map[offset:offset + FELT_SIZE] = value.to_bytes(FELT_SIZE, "big")
+
+
+def _level_offset(capacity, depth):
+    # levels are stored one after the other, level `depth` holds capacity >> depth nodes
+    nodes_before = 2 * capacity - 2 * (capacity >> depth)
+    return HEADER_SIZE + capacity * RECORD_SIZE + nodes_before * FELT_SIZE
@@ -0,0 +1,94 @@
+"""Content-addressed cache of Pedersen hashes shared by consecutive quest trees."""
+import os
+
+from merkle import hash_leaves_chunk, map_chunks
+
+FELT_SIZE = 32
+# left, right, hash
+ENTRY_SIZE = 3 * FELT_SIZE
+
+
+class NodeCache:
+    """
+    Maps `(left, right)` felts to `pedersen_hash(left, right)`.
+
+    Both leaves `(address, nb_quest)` and interior nodes `(min, max)` are keyed
+    by the exact inputs of their hash, so an address keeping its quest count
+    between two rounds, or a whole subtree of them, is looked up instead of
+    rehashed. Only the entries used since the cache was opened are saved, the
+    file therefore holds the nodes of the last tree built with it.
+
+    Parameters
+    ----------
+    path : file the cache is loaded from when it exists
+
+    Examples
+    ---------
+    >>> cache = NodeCache("quests.nodes")
+    >>> recipients, amounts, leaves = hash_leaves_stream(pairs, executor, cache)
+    >>> tree = MerkleTree(leaves, executor, cache)
+    >>> cache.save("quests.nodes")
+    >>> cache.hit_rate
+    """
+
+    def __init__(self, path=None):
+        self.nodes = {}
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, left, right):
+        node = self.nodes.get((left, right))
+        if node is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.used[(left, right)] = node
+        return node
+
+    def add(self, left, right, node):
+        self.nodes[(left, right)] = node
+        self.used[(left, right)] = node
+
+    def hash_pairs(self, pairs, executor=None):
+        """Returns the hash of every `(left, right)` of `pairs`, only hashing the missing ones."""
+        result = [self.get(left, right) for left, right in pairs]
+        missing = [i for i, node in enumerate(result) if node is None]
+        hashes = map_chunks(hash_leaves_chunk, [pairs[i]
+                            for i in missing], executor)
+        for i, node in zip(missing, hashes):
+            result[i] = node
+            self.add(*pairs[i], node)
+        return result
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        for offset in range(0, len(data) - len(data) % ENTRY_SIZE, ENTRY_SIZE):
+            left, right, node = (int.from_bytes(data[i:i + FELT_SIZE], "big")
+                                 for i in range(offset, offset + ENTRY_SIZE, FELT_SIZE))
+            self.nodes[(left, right)] = node
+
+    def save(self, path):
+        """Writes the entries used since the cache was opened to `path`."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for (left, right), node in self.used.items():
+                f.write(left.to_bytes(FELT_SIZE, "big") +
+                        right.to_bytes(FELT_SIZE, "big") +
+                        node.to_bytes(FELT_SIZE, "big"))
+        os.replace(tmp_path, path)
+
+    def report(self):
+        return (f"node cache: {self.hits} hits, {self.misses} misses "
+                f"({self.hit_rate:.1%} hit rate), {len(self.used)} nodes saved")
@@ -0,0 +1,41 @@
+"""Locally cached account nonces, so transactions can be sent back to back."""
+import weakref
+
+
+class NonceManager:
+    """
+    Caches the next nonce of each account.
+
+    Only the first transaction of an account reads its nonce, the following ones
+    increment the cached value, so several transactions can be in flight at once.
+    A rejected transaction does not consume its nonce: `resync` drops the cached
+    value and the next transaction reads it from the account again.
+
+    Nonces are kept per scope (e.g. a `StarknetState` or a nile `Account`), scopes
+    are weakly referenced and dropped with them.
+
+    Examples
+    ---------
+    >>> nonces = NonceManager()
+    >>> nonce = await nonces.next(account.state, account.contract_address, fetch)
+    >>> nonces.resync(account.state, account.contract_address)
+    """
+
+    def __init__(self):
+        self._scopes = weakref.WeakKeyDictionary()
+
+    async def next(self, scope, address, fetch):
+        """Returns the nonce of the next transaction of `address`, `fetch()` reads it when unknown."""
+        nonces = self._scopes.setdefault(scope, {})
+        if address not in nonces:
+            nonce = await fetch()
+            # another transaction may have reserved a nonce while fetching
+            nonces.setdefault(address, nonce)
+        nonce = nonces[address]
+        nonces[address] = nonce + 1
+        return nonce
+
+    def resync(self, scope, address):
+        nonces = self._scopes.get(scope)
+        if nonces is not None:
+            nonces.pop(address, None)
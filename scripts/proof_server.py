@@ -0,0 +1,94 @@
+"""
+HTTP service serving `burn_with_quest` Merkle proofs from a `MerkleStore`.
+
+    python scripts/proof_server.py quests_3.merkle --port 8080
+
+GET /root                returns the tree root
+GET /proof/{address}     returns the number of quests and the proof of `address`
+"""
+import argparse
+import os
+import sys
+from functools import lru_cache
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(__file__))
+
+from merkle_store import MerkleStore  # noqa: E402
+
+PROOF_CACHE_SIZE = 100_000
+
+
+class ProofService:
+    """
+    Serves proofs on demand instead of storing the whole address -> proof map.
+
+    The store keeps an address -> leaf index hash index, proofs are read from the
+    memory-mapped levels and the most requested ones are kept in a bounded LRU cache,
+    keyed on the root so that proofs of a previous tree are never served. The store
+    is refreshed on every request to see the updates of `update_merkle_root.py`.
+    """
+
+    def __init__(self, store, cache_size=PROOF_CACHE_SIZE):
+        self.store = store
+        self._get_proof = lru_cache(maxsize=cache_size)(self._build_proof)
+
+    @property
+    def root(self):
+        return self.store.root
+
+    def get_proof(self, address):
+        return self._get_proof(address, self.store.root)
+
+    def cache_info(self):
+        return self._get_proof.cache_info()
+
+    def _build_proof(self, address, root):
+        index = self.store.index_of(address)
+        _, nb_quest = self.store.get_record(index)
+        return {
+            "address": hex(address),
+            "nb_quest": nb_quest,
+            "merkle_proof": [hex(x) for x in self.store.get_proof(index)],
+            "root": hex(root),
+        }
+
+    async def handle_root(self, request):
+        self.store.refresh()
+        return web.json_response({"root": hex(self.root)})
+
+    async def handle_proof(self, request):
+        try:
+            address = int(request.match_info["address"], 16)
+        except ValueError:
+            raise web.HTTPBadRequest(reason="invalid address")
+        self.store.refresh()
+        if address not in self.store:
+            raise web.HTTPNotFound(reason="address did not complete any quest")
+        return web.json_response(self.get_proof(address))
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([
+            web.get("/root", self.handle_root),
+            web.get("/proof/{address}", self.handle_proof),
+        ])
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("store", help="path of the quests merkle store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cache-size", type=int, default=PROOF_CACHE_SIZE)
+    args = parser.parse_args()
+
+    with MerkleStore(args.store) as store:
+        service = ProofService(store, args.cache_size)
+        web.run_app(service.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
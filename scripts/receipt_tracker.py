@@ -0,0 +1,224 @@
+"""Tracks transaction statuses over HTTP instead of one `nile debug` process per transaction."""
+import asyncio
+import re
+from functools import partial
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from nile.common import GATEWAYS
+from nile.core.call_or_invoke import call_or_invoke
+
+from nonce_manager import NonceManager
+
+FEEDER_GATEWAYS = {
+    "goerli": "https://alpha4.starknet.io/feeder_gateway",
+    "mainnet": "https://alpha-mainnet.starknet.io/feeder_gateway",
+}
+ACCEPTED = ("ACCEPTED_ON_L2", "ACCEPTED_ON_L1")
+REJECTED = "REJECTED"
+NOT_RECEIVED = "NOT_RECEIVED"
+
+POLL_INTERVAL = 2
+# Seconds after which a transaction still unknown to the gateway is given up
+NOT_RECEIVED_TIMEOUT = 300
+BATCH_SIZE = 50
+MAX_CONNECTIONS = 16
+
+
+class TransactionRejected(Exception):
+    def __init__(self, tx_hash, receipt):
+        self.tx_hash = tx_hash
+        self.receipt = receipt
+        reason = receipt.get("tx_failure_reason", {})
+        super().__init__(
+            f"{tx_hash} rejected: {reason.get('error_message', reason)}")
+
+
+class TransactionNotReceived(Exception):
+    def __init__(self, tx_hash, timeout):
+        self.tx_hash = tx_hash
+        super().__init__(f"{tx_hash} not received by the gateway after {timeout}s")
+
+
+def feeder_gateway_url(network):
+    """Returns the feeder gateway of `network`, local networks are read from node.json."""
+    if network in FEEDER_GATEWAYS:
+        return FEEDER_GATEWAYS[network]
+    if network not in GATEWAYS:
+        raise ValueError(
+            f"unknown network {network!r}: expected one of {sorted(FEEDER_GATEWAYS)} "
+            f"or a network of node.json ({sorted(GATEWAYS)})")
+    return GATEWAYS[network].rstrip("/") + "/feeder_gateway"
+
+
+def parse_tx_hash(output):
+    """Returns the transaction hash printed by `starknet invoke` / `Account.send`."""
+    match = re.search(r"Transaction hash: (0x[0-9a-fA-F]+)", output)
+    if match is None:
+        raise ValueError(f"no transaction hash in {output!r}")
+    return match.group(1)
+
+
+class ReceiptTracker:
+    """
+    Polls the status of every pending transaction in batches over one pooled session.
+
+    Each poll round sends at most `batch_size` concurrent `get_transaction_status`
+    requests, reusing the connections of the session, and resolves the future of
+    every transaction accepted or rejected since the previous round. Transactions
+    the gateway still does not know after `not_received_timeout` seconds fail with
+    `TransactionNotReceived`.
+
+    Examples
+    ---------
+    >>> async with ReceiptTracker(feeder_gateway_url("goerli")) as tracker:
+            receipts = await asyncio.gather(*[tracker.track(h) for h in hashes])
+
+    Submitting transactions without waiting for the previous ones to be accepted
+
+    >>> async with ReceiptTracker(feeder_gateway_url(signer.network)) as tracker:
+            await tracker.send(signer, lottery_token, "set_xzkp_contract_address", [xzkp])
+            await tracker.send(signer, factory, "set_lottery_ticket_contract_address", [lottery])
+            await tracker.wait_all()
+    """
+
+    def __init__(self, url, poll_interval=POLL_INTERVAL, batch_size=BATCH_SIZE,
+                 max_connections=MAX_CONNECTIONS, nonces=None, not_received_timeout=NOT_RECEIVED_TIMEOUT):
+        self.url = url
+        self.poll_interval = poll_interval
+        self.not_received_timeout = not_received_timeout
+        self.batch_size = batch_size
+        self.max_connections = max_connections
+        self.nonces = NonceManager() if nonces is None else nonces
+        self.requests = 0
+        self._pending = {}
+        self._deadlines = {}
+        self._futures = []
+        # tx hash -> account that sent it, resynced if the transaction is rejected
+        self._senders = {}
+        self._account_locks = {}
+        self._session = None
+        self._poller = None
+        self._wakeup = None
+
+    async def __aenter__(self):
+        self._session = ClientSession(
+            connector=TCPConnector(limit=self.max_connections),
+            timeout=ClientTimeout(total=30),
+        )
+        self._wakeup = asyncio.Event()
+        self._poller = asyncio.ensure_future(self._poll())
+        return self
+
+    async def __aexit__(self, *args):
+        self._poller.cancel()
+        try:
+            await self._poller
+        except asyncio.CancelledError:
+            pass
+        await self._session.close()
+
+    def track(self, tx_hash):
+        """Returns a future resolved with the receipt of `tx_hash` once it is accepted."""
+        future = self._pending.get(tx_hash)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = loop.create_future()
+            self._pending[tx_hash] = future
+            self._deadlines[tx_hash] = loop.time() + self.not_received_timeout
+            self._futures.append(future)
+            self._wakeup.set()
+        return future
+
+    async def send(self, account, contract, selector, calldata, max_fee=1):
+        """
+        Sends a transaction from a nile `Account` and starts tracking it.
+
+        Nonces come from `self.nonces`, so transactions of one account are sent
+        back to back without waiting for the previous ones to be accepted. They
+        are still sent in nonce order. Returns the future of the transaction receipt.
+        """
+        loop = asyncio.get_event_loop()
+        lock = self._account_locks.setdefault(account.address, asyncio.Lock())
+        async with lock:
+            nonce = await self.nonces.next(account, account.address, lambda: loop.run_in_executor(
+                None, get_account_nonce, account))
+            try:
+                output = await loop.run_in_executor(None, partial(
+                    account.send, contract, selector, calldata, max_fee=max_fee, nonce=nonce))
+                tx_hash = parse_tx_hash(output)
+            except Exception:
+                self.nonces.resync(account, account.address)
+                raise
+            print(f"Running {selector}. [hash]: {tx_hash} ♻️")
+            self._senders[tx_hash] = account
+            return self.track(tx_hash)
+
+    async def wait_all(self):
+        """Waits for every tracked transaction, raises the first `TransactionRejected`."""
+        return await asyncio.gather(*self._futures)
+
+    async def _status(self, tx_hash):
+        self.requests += 1
+        try:
+            async with self._session.get(f"{self.url}/get_transaction_status",
+                                         params={"transactionHash": tx_hash}) as response:
+                response.raise_for_status()
+                return tx_hash, await response.json(content_type=None)
+        except (ClientError, asyncio.TimeoutError):
+            # polled again next round
+            return tx_hash, {}
+
+    async def _poll(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            hashes = list(self._pending)
+            for i in range(0, len(hashes), self.batch_size):
+                batch = hashes[i:i + self.batch_size]
+                for tx_hash, receipt in await asyncio.gather(*[self._status(h) for h in batch]):
+                    self._update(tx_hash, receipt)
+
+            if self._pending:
+                await asyncio.sleep(self.poll_interval)
+
+    def _update(self, tx_hash, receipt):
+        status = receipt.get("tx_status")
+        future = self._pending[tx_hash]
+        if future.done():
+            # cancelled by the caller, e.g. asyncio.wait_for
+            self._forget(tx_hash)
+        elif status in ACCEPTED:
+            self._forget(tx_hash)
+            future.set_result(receipt)
+        elif status == REJECTED:
+            # the nonce was not consumed, the next transaction reads it again
+            self._resync_sender(tx_hash)
+            future.set_exception(TransactionRejected(tx_hash, receipt))
+        elif status in (NOT_RECEIVED, None) and \
+                asyncio.get_event_loop().time() > self._deadlines[tx_hash]:
+            self._resync_sender(tx_hash)
+            future.set_exception(TransactionNotReceived(tx_hash, self.not_received_timeout))
+
+    def _forget(self, tx_hash):
+        del self._pending[tx_hash]
+        del self._deadlines[tx_hash]
+        return self._senders.pop(tx_hash, None)
+
+    def _resync_sender(self, tx_hash):
+        account = self._forget(tx_hash)
+        if account is not None:
+            self.nonces.resync(account, account.address)
+
+
+def get_account_nonce(account):
+    return int(call_or_invoke(account.address, "call", "get_nonce", [], account.network))
+
+
+def wait_for_receipt(tx_hash, network, poll_interval=POLL_INTERVAL):
+    """Blocks until `tx_hash` is accepted, raises `TransactionRejected` otherwise."""
+    async def wait():
+        async with ReceiptTracker(feeder_gateway_url(network), poll_interval) as tracker:
+            return await tracker.track(tx_hash)
+    return asyncio.run(wait())
@@ -1,4 +1,6 @@
-from utils import run_tx
+from calldata import str_to_felt, get_encoder
+from utils import run_tx, run_multicall
+from deployment_registry import get_registry
 import os
 import sys
 import subprocess
@@ -11,28 +13,6 @@ from nile.nre import NileRuntimeEnvironment
 sys.path.append(os.path.dirname(__file__))
 
 
-def to_uint(a):
-    """Takes in value, returns uint256-ish tuple."""
-    return (a & ((1 << 128) - 1), a >> 128)
-
-
-def uint_array(l):
-    return list(map(to_uint, l))
-
-
-def uarr2cd(arr):
-    acc = [len(arr)]
-    for lo, hi in arr:
-        acc.append(lo)
-        acc.append(hi)
-    return acc
-
-
-def str_to_felt(text):
-    b_text = bytes(text, "ascii")
-    return int.from_bytes(b_text, "big")
-
-
 def parse_ether(value: int):
     return int(value * 1e18)
 
@@ -40,10 +20,14 @@ def parse_ether(value: int):
 XZKP_NAME = str_to_felt("xAstraly")
 XZKP_SYMBOL = str_to_felt("xZKP")
 
-REWARDS_PER_BLOCK = to_uint(parse_ether(10))
+REWARDS_PER_BLOCK = parse_ether(10)
 START_BLOCK = 0
 END_BLOCK = START_BLOCK + 10000
 
+# Sends the independent initialization calls as a single multicall transaction,
+# MULTICALL=0 sends them one by one
+MULTICALL = os.getenv("MULTICALL", "1") != "0"
+
 IDO_TOKEN_PRICE = "10000000000000000"  # 0.01 ETH
 IDO_TOKENS_TO_SELL = "100000000000000000000000"  # 100,000 TOKENS
 # vestion portion percentages must add up to 1000
@@ -60,7 +44,7 @@ REGISTRATION_START = day + timedelta(days=1)
 IDO_TOKEN_UNLOCK = IDO_SALE_END + timeDeltaWeeks
 
 # VESTING_PERCENTAGES & VESTING_TIMES_UNLOCKED arrays must match in length
-VESTING_PERCENTAGES = uint_array([100, 200, 300, 400])
+VESTING_PERCENTAGES = [100, 200, 300, 400]
 VESTING_TIMES_UNLOCKED = [
     int(IDO_TOKEN_UNLOCK.timestamp()) + (1 * 24 *
                                          60 * 60),  # 1 day after tokens unlock time
@@ -83,43 +67,45 @@ def run(nre: NileRuntimeEnvironment):
     # print(f"Admin1 account: {admin_1.address}")
     # print(f"Admin2 account: {admin_2.address}")
 
-    xzkp_token, _ = nre.get_deployment("xzkp_token_proxy")
-    zkp_token, zkp_token_abi = nre.get_deployment("zkp_token")
-    admin_contract, admin_contract_abi = nre.get_deployment("admin_contract")
-    zkp_token, zkp_token_abi = nre.get_deployment("zkp_token")
-    xoroshiro_contract, xoroshiro_contract_abi = nre.get_deployment(
+    # deployments file indexed once instead of scanned per alias
+    deployments = get_registry(nre.network)
+    xzkp_token, _ = deployments.get("xzkp_token_proxy")
+    zkp_token, zkp_token_abi = deployments.get("zkp_token")
+    admin_contract, admin_contract_abi = deployments.get("admin_contract")
+    xoroshiro_contract, xoroshiro_contract_abi = deployments.get(
         "xoroshiro_contract")
-    factory_contract, factory_contract_abi = nre.get_deployment(
+    factory_contract, factory_contract_abi = deployments.get(
         "factory_contract")
-    lottery_token, lottery_token_abi = nre.get_deployment("lottery_token")
-    zkp_token, zkp_token_abi = nre.get_deployment("zkp_token")
-    task_contract, task_contract_abi = nre.get_deployment("task_contract")
-    # ido_contract_full, ido_contract_full_abi = nre.get_deployment(
+    lottery_token, lottery_token_abi = deployments.get("lottery_token")
+    task_contract, task_contract_abi = deployments.get("task_contract")
+    # ido_contract_full, ido_contract_full_abi = deployments.get(
     #     "ido_contract_full")
 
-    # Initialize Lottery Token Params
-
-    run_tx(signer, lottery_token,
-           "set_xzkp_contract_address", [int(xzkp_token, 16)])
-
-    run_tx(signer, lottery_token, "set_ido_factory_address",
-           [int(factory_contract, 16)])
-
-    # # Initialize Proxy
-
-    run_tx(signer, xzkp_token, "initializer", [
-        str(XZKP_NAME),
-        str(XZKP_SYMBOL),
-        int(zkp_token, 16),
-        int(signer.address, 16),
-        *REWARDS_PER_BLOCK,
-        START_BLOCK,
-        END_BLOCK
-    ])
-
-    # # Initialize Factory
-
-    run_tx(signer, factory_contract,
-           "set_lottery_ticket_contract_address", [int(lottery_token, 16)])
+    setup_calls = [
+        # Initialize Lottery Token Params
+        (lottery_token, "set_xzkp_contract_address", [int(xzkp_token, 16)]),
+        (lottery_token, "set_ido_factory_address",
+         [int(factory_contract, 16)]),
+        # Initialize Proxy
+        (xzkp_token, "initializer", get_encoder("AstralyStaking").encode(
+            "initializer",
+            XZKP_NAME,
+            XZKP_SYMBOL,
+            int(zkp_token, 16),
+            int(signer.address, 16),
+            REWARDS_PER_BLOCK,
+            START_BLOCK,
+            END_BLOCK
+        )),
+        # Initialize Factory
+        (factory_contract, "set_lottery_ticket_contract_address",
+         [int(lottery_token, 16)]),
+    ]
+
+    if MULTICALL:
+        run_multicall(signer, setup_calls)
+    else:
+        for contract, selector, calldata in setup_calls:
+            run_tx(signer, contract, selector, calldata)
 
     print("CONTRACTS SUCCESSFULLY INITIALIZED 🚀")
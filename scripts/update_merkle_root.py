@@ -0,0 +1,32 @@
+from utils import run_tx
+from merkle_store import MerkleStore
+import os
+import sys
+from nile.nre import NileRuntimeEnvironment
+
+sys.path.append(os.path.dirname(__file__))
+
+# Dummy values, should be replaced by env variables
+# os.environ["SIGNER"] = "123456"
+# os.environ["QUEST_ADDRESS"] = "0x123"
+# os.environ["QUEST_COUNT"] = "2"
+
+IDO_ID = 3
+
+
+def run(nre: NileRuntimeEnvironment):
+    signer = nre.get_or_deploy_account("SIGNER")
+    print(f"Signer account: {signer.address}")
+
+    factory_contract, _ = nre.get_deployment("factory_contract")
+
+    # Store written by generate_quest_data.py
+    with MerkleStore(f"quests_{IDO_ID}.merkle") as store:
+        address = os.getenv("QUEST_ADDRESS")
+        if address is not None:
+            index = store.set_leaf(
+                int(address, 16), int(os.environ["QUEST_COUNT"]))
+            print(f"Updated leaf {index} for {address}")
+        root = store.root
+
+    run_tx(signer, factory_contract, "set_merkle_root", [root, IDO_ID])
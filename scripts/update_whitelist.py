@@ -9,6 +9,20 @@ sys.path.append(os.path.dirname(__file__))
 # os.environ["SIGNER"] = "123456"
 # os.environ["USER_1"] = "12345654321"
 
+# Whitelists every pool in one addWhitelistedTokens transaction,
+# BATCH_WHITELIST=0 sends one addWhitelistedToken transaction per pool
+BATCH_WHITELIST = os.getenv("BATCH_WHITELIST", "1") != "0"
+
+# (wrapper contract, alias, LP token, is NFT)
+POOLS = [
+    # AlphaRoad Wrapper
+    ("AlphaRoadWrapper", "alpha_road",
+     "0x68f02f0573d85b5d54942eea4c1bf97c38ca0e3e34fe3c974d1a3feef6c33be", False),
+    # JediSwap Wrapper
+    ("JediSwapWrapper", "jedi_swap",
+     "0x68f02f0573d85b2d54942eea4c1bf97c38ca0e3e34fe3c974d1a3feef6c33be", False),
+]
+
 
 def run(nre: NileRuntimeEnvironment):
     signer = nre.get_or_deploy_account("SIGNER")
@@ -16,18 +30,16 @@ def run(nre: NileRuntimeEnvironment):
 
     xzkp_token, _ = nre.get_deployment("xzkp_token_proxy")
 
-    # Deploy AlphaRoad Wrapper
-    alpha_road_pool = "0x68f02f0573d85b5d54942eea4c1bf97c38ca0e3e34fe3c974d1a3feef6c33be"
-    alpha_road = deploy_try_catch(nre, "AlphaRoadWrapper", [
-                                  alpha_road_pool], "alpha_road")
-
-    run_tx(signer, xzkp_token, "addWhitelistedToken", [
-           int(alpha_road_pool, 16), int(alpha_road, 16), False])
-
-    # Deploy JediSwap Wrapper
-    jedi_swap_pool = "0x68f02f0573d85b2d54942eea4c1bf97c38ca0e3e34fe3c974d1a3feef6c33be"
-    jedi_swap = deploy_try_catch(nre, "JediSwapWrapper", [
-                                 jedi_swap_pool], "jedi_swap")
-
-    run_tx(signer, xzkp_token, "addWhitelistedToken", [
-           int(jedi_swap_pool, 16), int(jedi_swap, 16), False])
+    whitelist = []
+    for wrapper, alias, pool, is_nft in POOLS:
+        address = deploy_try_catch(nre, wrapper, [pool], alias)
+        whitelist.append((int(pool, 16), int(address, 16), int(is_nft)))
+
+    if BATCH_WHITELIST:
+        lp_tokens, wrappers, is_nft = zip(*whitelist)
+        run_tx(signer, xzkp_token, "addWhitelistedTokens", [
+               len(lp_tokens), *lp_tokens, len(wrappers), *wrappers, len(is_nft), *is_nft])
+    else:
+        for lp_token, wrapper, is_nft in whitelist:
+            run_tx(signer, xzkp_token, "addWhitelistedToken",
+                   [lp_token, wrapper, is_nft])
@@ -1,27 +1,32 @@
 from collections import namedtuple
 from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
-from starkware.starknet.business_logic.execution.objects import Event
 from starkware.starknet.testing.starknet import StarknetContract
 from starkware.starkware_utils.error_handling import StarkException
 from starkware.starknet.compiler.compile import compile_starknet_files
-from starkware.starknet.public.abi import get_selector_from_name
 from starkware.starknet.business_logic.state.state import BlockInfo
 from starkware.crypto.signature.signature import private_to_stark_key, sign
-from starkware.cairo.common.hash_state import compute_hash_on_elements
 import site
 import asyncio
 import math
 from pathlib import Path
 from nile.nre import NileRuntimeEnvironment
 from nile.core.account import Account
+from nile.core.call_or_invoke import call_or_invoke
 
-import re
-import subprocess
+from calldata import get_selector, to_uint, from_uint, from_call_to_call_array, hash_multicall
+from merkle import MerkleTree, map_chunks, hash_level_chunk, hash_leaves_chunk, process_multi_proof
+from deployment_registry import get_registry
+from nonce_manager import NonceManager
+from receipt_tracker import parse_tx_hash, wait_for_receipt
 
 
-def deploy_try_catch(nre: NileRuntimeEnvironment, name: str, params, alias: str):
+def deploy_try_catch(nre: NileRuntimeEnvironment, name: str, params, alias: str, cache=None):
+    """Deploys `name` under `alias`, reusing the deployment when the alias already exists.
+    With an `ArtifactCache`, `name` is only compiled if its sources changed."""
     contract = None
     try:
+        if cache is not None:
+            cache.compile(name)
         contract, abi = nre.deploy(
             name, arguments=params, alias=alias)
 
@@ -38,9 +43,52 @@ def deploy_try_catch(nre: NileRuntimeEnvironment, name: str, params, alias: str)
 
 def run_tx(account: Account, contract, selector: str, calldata, max_fee=1):
     tx = account.send(contract, selector, calldata, max_fee=max_fee)
-    tx_hash = re.split("Transaction hash: ", tx)[-1]
+    tx_hash = parse_tx_hash(tx)
     print(f"Running {selector}. [hash]: {tx_hash} ♻️")
-    subprocess.check_output(['nile', 'debug', tx_hash])
+    return wait_for_receipt(tx_hash, account.network)
+
+
+def send_multicall(account: Account, calls, max_fee=1, nonce=None):
+    """
+    Sends `(contract, selector, calldata)` calls as a single `__execute__` transaction,
+    like `Account.send` does for one call. Contracts are addresses or deployment aliases.
+    """
+    registry = get_registry(account.network)
+    calls = [[(registry.find(contract) or (contract, None))[0],
+              selector, [int(x) for x in calldata]]
+             for contract, selector, calldata in calls]
+
+    if nonce is None:
+        nonce = int(call_or_invoke(account.address, "call",
+                    "get_nonce", [], account.network))
+
+    (call_array, calldata, sig_r, sig_s) = account.signer.sign_transaction(
+        sender=account.address, calls=calls, nonce=nonce, max_fee=max_fee)
+
+    params = [str(len(call_array))]
+    params.extend([str(elem) for entry in call_array for elem in entry])
+    params.append(str(len(calldata)))
+    params.extend([str(param) for param in calldata])
+    params.append(str(nonce))
+
+    return call_or_invoke(
+        contract=account.address,
+        type="invoke",
+        method="__execute__",
+        params=params,
+        network=account.network,
+        signature=[str(sig_r), str(sig_s)],
+        max_fee=str(max_fee),
+    )
+
+
+def run_multicall(account: Account, calls, max_fee=1):
+    """Runs independent calls in one transaction: one signature, one nonce and one fee."""
+    tx = send_multicall(account, calls, max_fee=max_fee)
+    tx_hash = parse_tx_hash(tx)
+    selectors = ", ".join(call[1] for call in calls)
+    print(f"Running {selectors}. [hash]: {tx_hash} ♻️")
+    return wait_for_receipt(tx_hash, account.network)
 
     """Utilities for testing Cairo contracts."""
 
@@ -51,8 +99,6 @@ ZERO_ADDRESS = 0
 TRUE = 1
 FALSE = 0
 
-TRANSACTION_VERSION = 0
-
 _root = Path(__file__).parent.parent
 
 
@@ -67,43 +113,20 @@ def contract_path(name):
         return str(_root / "contracts" / name)
 
 
-def str_to_felt(text):
-    b_text = bytes(text, "ascii")
-    return int.from_bytes(b_text, "big")
-
-
 def felt_to_str(felt):
     b_felt = felt.to_bytes(31, "big")
     return b_felt.decode()
 
 
-def assert_event_emitted(tx_exec_info, from_address, name, data):
-    assert Event(
-        from_address=from_address,
-        keys=[get_selector_from_name(name)],
-        data=data,
-    ) in tx_exec_info.raw_events
-
-
 def uint(a):
     return (a, 0)
 
 
-def to_uint(a):
-    """Takes in value, returns uint256-ish tuple."""
-    return (a & ((1 << 128) - 1), a >> 128)
-
-
 def to_uint_typed(a):
     Uint256 = namedtuple("Uint256", "low high")
     return Uint256(low=a & ((1 << 128) - 1), high=a >> 128)
 
 
-def from_uint(uint):
-    """Takes in uint256-ish tuple, returns value."""
-    return uint[0] + (uint[1] << 128)
-
-
 def add_uint(a, b):
     """Returns the sum of two uint256-ish tuples."""
     a = from_uint(a)
@@ -172,6 +195,10 @@ def cached_contract(state, definition, deployed):
     return contract
 
 
+# Shared by every Signer so they agree on the nonces of an account
+NONCES = NonceManager()
+
+
 class Signer:
     """
     Utility for sending signed transactions to an Account on Starknet.
@@ -190,9 +217,10 @@ class Signer:
                                      )
     """
 
-    def __init__(self, private_key):
+    def __init__(self, private_key, nonces=None):
         self.private_key = private_key
         self.public_key = private_to_stark_key(private_key)
+        self.nonces = NONCES if nonces is None else nonces
 
     def sign(self, message_hash):
         return sign(msg_hash=message_hash, priv_key=self.private_key)
@@ -202,47 +230,30 @@ class Signer:
 
     async def send_transactions(self, account, calls, nonce=None, max_fee=0):
         if nonce is None:
-            execution_info = await account.get_nonce().call()
-            nonce, = execution_info.result
+            nonce = await self.nonces.next(account.state, account.contract_address,
+                                           lambda: get_nonce(account))
+        else:
+            self.nonces.resync(account.state, account.contract_address)
 
         calls_with_selector = [
-            (call[0], get_selector_from_name(call[1]), call[2]) for call in calls]
+            (call[0], get_selector(call[1]), call[2]) for call in calls]
         (call_array, calldata) = from_call_to_call_array(calls)
 
         message_hash = hash_multicall(
             account.contract_address, calls_with_selector, nonce, max_fee)
         sig_r, sig_s = self.sign(message_hash)
 
-        return await account.__execute__(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
-
-
-def from_call_to_call_array(calls):
-    call_array = []
-    calldata = []
-    for i, call in enumerate(calls):
-        assert len(call) == 3, "Invalid call parameters"
-        entry = (call[0], get_selector_from_name(
-            call[1]), len(calldata), len(call[2]))
-        call_array.append(entry)
-        calldata.extend(call[2])
-    return (call_array, calldata)
+        try:
+            return await account.__execute__(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
+        except StarkException:
+            self.nonces.resync(account.state, account.contract_address)
+            raise
 
 
-def hash_multicall(sender, calls, nonce, max_fee):
-    hash_array = []
-    for call in calls:
-        call_elements = [call[0], call[1], compute_hash_on_elements(call[2])]
-        hash_array.append(compute_hash_on_elements(call_elements))
-
-    message = [
-        str_to_felt('StarkNet Transaction'),
-        sender,
-        compute_hash_on_elements(hash_array),
-        nonce,
-        max_fee,
-        TRANSACTION_VERSION
-    ]
-    return compute_hash_on_elements(message)
+async def get_nonce(account):
+    execution_info = await account.get_nonce().call()
+    nonce, = execution_info.result
+    return nonce
 
 
 def get_block_timestamp(starknet_state):
@@ -276,19 +287,9 @@ def assert_approx_eq(a: int, b: int, max_delta: int):
     assert True
 
 
-def get_next_level(level):
-    next_level = []
-
-    for i in range(0, len(level), 2):
-        node = 0
-        if level[i] < level[i + 1]:
-            node = pedersen_hash(level[i], level[i + 1])
-        else:
-            node = pedersen_hash(level[i + 1], level[i])
-
-        next_level.append(node)
-
-    return next_level
+def get_next_level(level, executor=None):
+    """Hashes `level` pair by pair, on `executor` workers when the level is wide enough."""
+    return map_chunks(hash_level_chunk, level, executor)
 
 
 def generate_proof_helper(level, index, proof, cached_level):
@@ -323,15 +324,15 @@ def generate_merkle_proof(values, index, cached_level):
     return [hex(x) for x in l]
 
 
-def generate_merkle_root(values):
+def generate_merkle_root(values, executor=None):
     if len(values) == 1:
         return values[0]
 
     if len(values) % 2 != 0:
         values.append(0)
 
-    next_level = get_next_level(values)
-    return generate_merkle_root(next_level)
+    next_level = get_next_level(values, executor)
+    return generate_merkle_root(next_level, executor)
 
 
 def verify_merkle_proof(leaf, proof):
@@ -348,6 +349,26 @@ def verify_merkle_proof(leaf, proof):
     return curr == root
 
 
+def generate_merkle_multi_proof(values, indices, executor=None):
+    """
+    Returns the `(proof, proof_flags)` multiproof of the leaves at the sorted `indices`,
+    to be sent to `batch_burn_with_quest` with the leaves in the same order.
+
+    Examples
+    ---------
+    >>> leaves = [x[0] for x in get_leaves(recipients, amounts)]
+    >>> proof, proof_flags = generate_merkle_multi_proof(leaves, [0, 3, 4])
+    """
+    return MerkleTree(values, executor).get_multi_proof(indices)
+
+
+def verify_merkle_multi_proof(leaves, root, proof, proof_flags):
+    try:
+        return process_multi_proof(leaves, proof, proof_flags) == root
+    except (ValueError, IndexError, StopIteration):
+        return False
+
+
 def get_leaf(recipient, amount):
     # amount_hash = pedersen_hash(amount, 0)
     leaf = pedersen_hash(recipient, amount)
@@ -357,12 +378,10 @@ def get_leaf(recipient, amount):
 # creates the inital merkle leaf values to use
 
 
-def get_leaves(recipients, amounts):
-    values = []
-    for i in range(0, len(recipients)):
-        leaf = get_leaf(recipients[i], amounts[i])
-        value = (leaf, recipients[i], amounts[i])
-        values.append(value)
+def get_leaves(recipients, amounts, executor=None):
+    leaves = map_chunks(hash_leaves_chunk, list(
+        zip(recipients, amounts)), executor)
+    values = list(zip(leaves, recipients, amounts))
 
     if len(values) % 2 != 0:
         last_value = (0, 0, 0)
@@ -1,8 +1,23 @@
 import pytest
 
-# A stub test that serves no other purpose than to use the ctx_factory
-# fixture which is defined in conftest.py in order to cache it.
-@pytest.mark.asyncio
-async def test_ctx_factory(ctx_factory):
-    ctx_factory = ctx_factory()
-    assert 1 == 1
+from utils import contract_path
+
+CONTRACTS = [
+    'openzeppelin/account/presets/Account.cairo',
+    'openzeppelin/upgrades/presets/Proxy.cairo',
+    'AstralyToken.cairo',
+    'AstralyStaking.cairo',
+    'AstralyIDOContract.cairo',
+    'AstralyIDOFactory.cairo',
+    'AstralyLotteryToken.cairo',
+    'AstralyTask.cairo',
+]
+
+
+# A stub test that serves no other purpose than to fill the contract_cache
+# fixture which is defined in conftest.py, run it once with
+# `pytest tests/build_cache.py` before the test suite.
+@pytest.mark.parametrize("name", CONTRACTS)
+def test_contract_cache(contract_cache, name):
+    contract_def = contract_cache.get(contract_path(name))
+    assert contract_def.abi
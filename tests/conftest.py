@@ -0,0 +1,51 @@
+import os
+import time
+
+import pytest
+
+from utils import CONTRACT_CACHE, referenced_contracts
+
+# --profile-resources
+pytest_plugins = ["resource_profiler"]
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--no-contract-cache", action="store_true",
+        help="compile every contract instead of reusing the definitions cached on disk")
+    parser.addoption(
+        "--precompile-workers", type=int, default=None,
+        help="processes compiling the contracts missing from the cache before the "
+             "first test, one per CPU by default, 0 compiles them in the tests")
+    parser.addoption(
+        "--staking-sequences", type=int, default=2,
+        help="random operation sequences replayed on both the staking contract and its "
+             "Python model by test_staking_model.py")
+    parser.addoption(
+        "--staking-seed", type=int, default=0,
+        help="seed of the first sequence replayed by test_staking_model.py")
+
+
+def pytest_configure(config):
+    if config.getoption("no_contract_cache"):
+        CONTRACT_CACHE.enabled = False
+
+
+def pytest_sessionstart(session):
+    config = session.config
+    workers = config.getoption("precompile_workers")
+    # under xdist the controller compiles once for every worker
+    if hasattr(config, "workerinput") or workers == 0:
+        return
+    start = time.perf_counter()
+    compiled = CONTRACT_CACHE.precompile(
+        referenced_contracts(os.path.dirname(__file__)), workers)
+    if compiled:
+        print(f"\nCompiled {len(compiled)} contracts in "
+              f"{time.perf_counter() - start:.1f}s")
+
+
+@pytest.fixture(scope='session')
+def contract_cache():
+    """Compiled contract definitions shared by every test module and xdist worker."""
+    return CONTRACT_CACHE
@@ -0,0 +1,162 @@
+"""
+Opt-in profiler of the Cairo execution resources used by the test suite.
+
+    pytest tests/ --profile-resources=resources
+
+records every call executed through `StarknetState.invoke_raw`, which backs
+`invoke()` / `call()` of the contract wrappers and `MockSigner` transactions,
+and writes the aggregates per contract and function to `resources.json` and
+`resources.csv`. Nested calls (e.g. the account `__execute__` calling
+`depositLP`) are recorded too, resources of a call include its nested calls.
+"""
+import csv
+import json
+from collections import defaultdict
+
+import pytest
+from starkware.starknet.testing.state import StarknetState
+
+from utils import CONTRACT_CACHE, entry_points_key, get_selector
+
+BUILTINS = ["pedersen_builtin", "range_check_builtin", "bitwise_builtin",
+            "ecdsa_builtin", "output_builtin"]
+
+
+class ResourceProfiler:
+    def __init__(self):
+        # (contract, function) -> [calls, steps, max steps, memory holes, {builtin: count}]
+        self.stats = defaultdict(lambda: [0, 0, 0, 0, defaultdict(int)])
+        self._functions = {}
+        self._invoke_raw = None
+
+    def install(self):
+        self._invoke_raw = invoke_raw = StarknetState.invoke_raw
+        profiler = self
+
+        async def profiled_invoke_raw(state, *args, **kwargs):
+            execution_info = await invoke_raw(state, *args, **kwargs)
+            profiler.record(state, execution_info.call_info)
+            return execution_info
+
+        StarknetState.invoke_raw = profiled_invoke_raw
+
+    def uninstall(self):
+        StarknetState.invoke_raw = self._invoke_raw
+
+    def _names(self, state, call):
+        contract_class = state.state.contract_definitions.get(call.class_hash)
+        if contract_class is None:
+            return hex(call.contract_address), hex(call.entry_point_selector)
+        functions = self._functions.get(call.class_hash)
+        if functions is None:
+            functions = self._functions[call.class_hash] = {
+                get_selector(entry["name"]): entry["name"]
+                for entry in contract_class.abi if entry["type"] in ("function", "l1_handler")}
+        contract = CONTRACT_CACHE.names.get(
+            entry_points_key(contract_class), call.class_hash.hex()[:8])
+        function = functions.get(call.entry_point_selector, hex(call.entry_point_selector))
+        return contract, function
+
+    def record(self, state, call_info):
+        calls = [call_info]
+        while calls:
+            call = calls.pop()
+            calls.extend(call.internal_calls)
+            resources = call.execution_resources
+            stats = self.stats[self._names(state, call)]
+            stats[0] += 1
+            stats[1] += resources.n_steps
+            stats[2] = max(stats[2], resources.n_steps)
+            stats[3] += resources.n_memory_holes
+            for builtin, count in resources.builtin_instance_counter.items():
+                stats[4][builtin] += count
+
+    def merge(self, rows):
+        for row in rows:
+            stats = self.stats[(row["contract"], row["function"])]
+            stats[0] += row["calls"]
+            stats[1] += row["total_steps"]
+            stats[2] = max(stats[2], row["max_steps"])
+            stats[3] += row["total_memory_holes"]
+            for builtin, count in row["builtins"].items():
+                stats[4][builtin] += count
+
+    def rows(self):
+        """Aggregates per contract and function, most steps first."""
+        rows = [{
+            "contract": contract,
+            "function": function,
+            "calls": calls,
+            "total_steps": steps,
+            "mean_steps": steps / calls,
+            "max_steps": max_steps,
+            "total_memory_holes": holes,
+            "mean_memory_holes": holes / calls,
+            "builtins": dict(builtins),
+        } for (contract, function), (calls, steps, max_steps, holes, builtins) in self.stats.items()]
+        return sorted(rows, key=lambda row: -row["total_steps"])
+
+    def write(self, path):
+        rows = self.rows()
+        with open(f"{path}.json", "w") as f:
+            json.dump(rows, f, indent=2)
+        builtins = sorted({b for row in rows for b in row["builtins"]},
+                          key=lambda b: (b not in BUILTINS, BUILTINS.index(b) if b in BUILTINS else b))
+        with open(f"{path}.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["contract", "function", "calls", "total_steps", "mean_steps",
+                             "max_steps", "total_memory_holes", "mean_memory_holes", *builtins])
+            for row in rows:
+                writer.writerow([row["contract"], row["function"], row["calls"], row["total_steps"],
+                                 round(row["mean_steps"], 1), row["max_steps"],
+                                 row["total_memory_holes"], round(row["mean_memory_holes"], 1),
+                                 *[row["builtins"].get(b, 0) for b in builtins]])
+        return rows
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--profile-resources", metavar="PATH", default=None,
+        help="write the execution resources of every contract function to PATH.json and PATH.csv")
+
+
+def pytest_configure(config):
+    if config.getoption("profile_resources"):
+        config._resource_profiler = ResourceProfiler()
+        config._resource_profiler.install()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # xdist controller: collect the rows profiled by the worker
+    profiler = getattr(node.config, "_resource_profiler", None)
+    if profiler is not None and "resource_profile" in node.workeroutput:
+        profiler.merge(json.loads(node.workeroutput["resource_profile"]))
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session):
+    config = session.config
+    profiler = getattr(config, "_resource_profiler", None)
+    if profiler is None:
+        return
+    profiler.uninstall()
+    if hasattr(config, "workerinput"):
+        config.workeroutput["resource_profile"] = json.dumps(profiler.rows())
+        return
+    rows = profiler.write(config.getoption("profile_resources"))
+    config._resource_profile_rows = rows
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    rows = getattr(config, "_resource_profile_rows", None)
+    if not rows:
+        return
+    terminalreporter.section("execution resources")
+    terminalreporter.write_line(f"{'contract':<28} {'function':<32} {'calls':>6} {'mean steps':>11} {'max steps':>10}")
+    for row in rows[:15]:
+        terminalreporter.write_line(
+            f"{row['contract']:<28} {row['function']:<32} {row['calls']:>6} "
+            f"{row['mean_steps']:>11.1f} {row['max_steps']:>10}")
+    path = config.getoption("profile_resources")
+    terminalreporter.write_line(f"full report in {path}.json and {path}.csv")
@@ -1,12 +1,207 @@
-from nile.signer import Signer, from_call_to_call_array, get_transaction_hash
-from utils import to_uint
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from nile.signer import Signer, TRANSACTION_VERSION
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+from starkware.crypto.signature.signature import sign
+from starkware.starknet.core.os.transaction_hash.transaction_hash import TransactionHashPrefix
+from starkware.starknet.definitions.general_config import StarknetChainId
+from starkware.starkware_utils.error_handling import StarkException
+from utils import get_selector, to_uint
+from nonce_manager import NonceManager
 import eth_keys
 
+# Transaction hashes and signatures kept in memory, the oldest are dropped first
+SIGNATURE_CACHE_SIZE = 2 ** 16
+# Transactions signed by each task of `sign_batch`
+SIGN_BATCH_CHUNK_SIZE = 64
+
+
+# Shared by every signer so they agree on the nonces of an account, nonces are
+# kept per StarknetState: the states copied by the fixtures each start from the
+# nonces of the state they were copied from
+NONCES = NonceManager()
+
+
+class _Cache(dict):
+    """Dict dropping its oldest entries past `size` entries."""
+
+    def __init__(self, size=SIGNATURE_CACHE_SIZE):
+        super().__init__()
+        self.size = size
+
+    def put(self, key, value):
+        if len(self) >= self.size:
+            del self[next(iter(self))]
+        self[key] = value
+        return value
+
+
+def to_call_array(calls):
+    """`from_call_to_call_array` of nile for `(to, selector_name, calldata)` calls with int
+    addresses, instead of their hex strings."""
+    call_array = []
+    calldata = []
+    for to, selector_name, data in calls:
+        call_array.append((to, get_selector(selector_name), len(calldata), len(data)))
+        calldata.extend(data)
+    return call_array, calldata
+
+
+def _freeze(calls):
+    return tuple((to, selector_name, tuple(data)) for to, selector_name, data in calls)
+
+
+@lru_cache(maxsize=1024)
+def _account_hash_chain(account):
+    """Hash chain of the fields leading a transaction hash, the same for every
+    transaction of `account`."""
+    h = 0
+    for x in (TransactionHashPrefix.INVOKE.value, TRANSACTION_VERSION, account, get_selector("__execute__")):
+        h = pedersen_hash(h, x)
+    return h
+
+
+@lru_cache(maxsize=SIGNATURE_CACHE_SIZE)
+def _calls_hash_chain(calls):
+    """Hash chain and length of the `__execute__` calldata of `calls` up to the nonce,
+    the same for every nonce."""
+    call_array, calldata = to_call_array(calls)
+    h = 0
+    for x in (len(call_array), *[x for call in call_array for x in call], len(calldata), *calldata):
+        h = pedersen_hash(h, x)
+    return h, 4 * len(call_array) + len(calldata) + 2
 
-class MockSigner():
+
+_transaction_hashes = _Cache()
+
+
+def get_transaction_hash(account, calls, nonce, max_fee=0):
+    """
+    Hash of the `__execute__` transaction of the account at address `account`,
+    memoized on `(account, calls, nonce, max_fee)`. The hash chains of the account
+    and of the calls are shared by the transactions with other nonces.
+    """
+    frozen = _freeze(calls)
+    key = (account, frozen, nonce, max_fee)
+    message_hash = _transaction_hashes.get(key)
+    if message_hash is None:
+        # compute_hash_on_elements of the calldata, then of the transaction fields
+        h, length = _calls_hash_chain(frozen)
+        calldata_hash = pedersen_hash(pedersen_hash(h, nonce), length + 1)
+        h = _account_hash_chain(account)
+        for x in (calldata_hash, max_fee, StarknetChainId.TESTNET.value, 7):
+            h = pedersen_hash(h, x)
+        message_hash = _transaction_hashes.put(key, h)
+    return message_hash
+
+
+@lru_cache(maxsize=None)
+def _stark_signer(private_key):
+    # the public key is an EC multiplication, computed once per key
+    return Signer(private_key)
+
+
+@lru_cache(maxsize=None)
+def _eth_private_key(private_key):
+    return eth_keys.keys.PrivateKey(private_key)
+
+
+def _stark_signature(private_key, message_hash):
+    return list(sign(msg_hash=message_hash, priv_key=private_key))
+
+
+def _eth_signature(private_key, message_hash):
+    signature = _eth_private_key(private_key).sign_msg_hash(message_hash.to_bytes(32, byteorder="big"))
+    return [signature.v, *to_uint(signature.r), *to_uint(signature.s)]
+
+
+def _sign_chunk(signature, private_key, transactions):
+    """Runs in a worker process of `sign_batch`."""
+    signed = []
+    for account, calls, nonce, max_fee in transactions:
+        message_hash = get_transaction_hash(account, calls, nonce, max_fee)
+        signed.append((message_hash, signature(private_key, message_hash)))
+    return signed
+
+
+class _CachedSigner():
+    """Signs `__execute__` transactions, memoizing the hashes and signatures."""
+
+    # signature(private_key, message_hash) -> signature felts
+    _signature = None
+
+    def __init__(self, private_key, nonces):
+        self.private_key = private_key
+        self.nonces = nonces
+        self._signatures = _Cache()
+
+    def sign_hash(self, message_hash):
+        signature = self._signatures.get(message_hash)
+        if signature is None:
+            signature = self._signatures.put(message_hash, self._signature(self.private_key, message_hash))
+        return signature
+
+    def sign_transaction(self, account, calls, nonce, max_fee=0):
+        """Returns the call array, calldata, hash and signature of a transaction of
+        the account at address `account`."""
+        call_array, calldata = to_call_array(calls)
+        message_hash = get_transaction_hash(account, calls, nonce, max_fee)
+        return call_array, calldata, message_hash, self.sign_hash(message_hash)
+
+    def sign_batch(self, transactions, max_workers=None):
+        """
+        Signs `(account, calls, nonce[, max_fee])` transactions in a process pool,
+        returns their signatures. The hashes and signatures are cached, sending
+        one of these transactions afterwards only runs it.
+        """
+        transactions = [(getattr(account, "contract_address", account), _freeze(calls), nonce, *(max_fee or (0,)))
+                        for account, calls, nonce, *max_fee in transactions]
+        chunks = [transactions[i:i + SIGN_BATCH_CHUNK_SIZE]
+                  for i in range(0, len(transactions), SIGN_BATCH_CHUNK_SIZE)]
+        if len(chunks) > 1 and max_workers != 1:
+            with ProcessPoolExecutor(max_workers) as executor:
+                signed = [x for chunk in executor.map(
+                    _sign_chunk, [self._signature] * len(chunks), [self.private_key] * len(chunks), chunks)
+                    for x in chunk]
+        else:
+            signed = _sign_chunk(self._signature, self.private_key, transactions)
+
+        for transaction, (message_hash, signature) in zip(transactions, signed):
+            account, calls, nonce, max_fee = transaction
+            _transaction_hashes.put((account, calls, nonce, max_fee), message_hash)
+            self._signatures.put(message_hash, signature)
+        return [signature for _, signature in signed]
+
+    async def _send(self, account, calls, nonce, max_fee):
+        """Sends the transaction with the next cached nonce of `account` when `nonce` is None,
+        the nonce is read again after an explicit or rejected one."""
+        scope, address = account.state, account.contract_address
+        if nonce is None:
+            nonce = await self.nonces.next(scope, address, lambda: _get_nonce(account))
+        else:
+            self.nonces.resync(scope, address)
+
+        call_array, calldata, message_hash, signature = self.sign_transaction(address, calls, nonce, max_fee)
+        try:
+            execution_info = await account.__execute__(call_array, calldata, nonce).invoke(signature=signature)
+        except StarkException:
+            self.nonces.resync(scope, address)
+            raise
+        return execution_info, message_hash, signature
+
+
+async def _get_nonce(account):
+    return (await account.get_nonce().call()).result[0]
+
+
+class MockSigner(_CachedSigner):
     """
     Utility for sending signed transactions to an Account on Starknet.
 
+    Selectors, transaction hashes and signatures are cached, and transactions
+    known in advance can be signed in a process pool with `sign_batch`.
+
     Parameters
     ----------
 
@@ -33,32 +228,28 @@ class MockSigner():
             ]
         )
 
+    Signing the next transactions of an account ahead of time
+
+    >>> signer.sign_batch([(account, [(contract_address, 'burn', [i])], nonce + i) for i in range(1000)])
+
     """
 
-    def __init__(self, private_key):
-        self.signer = Signer(private_key)
+    _signature = staticmethod(_stark_signature)
+
+    def __init__(self, private_key, nonces=NONCES):
+        super().__init__(private_key, nonces)
+        self.signer = _stark_signer(private_key)
         self.public_key = self.signer.public_key
 
     async def send_transaction(self, account, to, selector_name, calldata, nonce=None, max_fee=0):
         return await self.send_transactions(account, [(to, selector_name, calldata)], nonce, max_fee)
 
     async def send_transactions(self, account, calls, nonce=None, max_fee=0):
-        if nonce is None:
-            execution_info = await account.get_nonce().call()
-            nonce, = execution_info.result
+        execution_info, _, _ = await self._send(account, calls, nonce, max_fee)
+        return execution_info
 
-        build_calls = []
-        for call in calls:
-            build_call = list(call)
-            build_call[0] = hex(build_call[0])
-            build_calls.append(build_call)
 
-        (call_array, calldata, sig_r, sig_s) = self.signer.sign_transaction(
-            hex(account.contract_address), build_calls, nonce, max_fee)
-        return await account.__execute__(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
-
-
-class MockEthSigner():
+class MockEthSigner(_CachedSigner):
     """
     Utility for sending signed transactions to an Account on Starknet, like MockSigner, but using a secp256k1 signature.
     Parameters
@@ -67,35 +258,16 @@ class MockEthSigner():
 
     """
 
-    def __init__(self, private_key):
-        self.signer = eth_keys.keys.PrivateKey(private_key)
+    _signature = staticmethod(_eth_signature)
+
+    def __init__(self, private_key, nonces=NONCES):
+        super().__init__(private_key, nonces)
+        self.signer = _eth_private_key(private_key)
         self.eth_address = int(self.signer.public_key.to_checksum_address(), 0)
 
     async def send_transaction(self, account, to, selector_name, calldata, nonce=None, max_fee=0):
         return await self.send_transactions(account, [(to, selector_name, calldata)], nonce, max_fee)
 
     async def send_transactions(self, account, calls, nonce=None, max_fee=0):
-        if nonce is None:
-            execution_info = await account.get_nonce().call()
-            nonce, = execution_info.result
-
-        build_calls = []
-        for call in calls:
-            build_call = list(call)
-            build_call[0] = hex(build_call[0])
-            build_calls.append(build_call)
-
-        (call_array, calldata) = from_call_to_call_array(build_calls)
-        message_hash = get_transaction_hash(
-            account.contract_address, call_array, calldata, nonce, max_fee
-        )
-
-        signature = self.signer.sign_msg_hash(
-            (message_hash).to_bytes(32, byteorder="big"))
-        sig_r = to_uint(signature.r)
-        sig_s = to_uint(signature.s)
-
         # the hash and signature are returned for other tests to use
-        return await account.__execute__(call_array, calldata, nonce).invoke(
-            signature=[signature.v, *sig_r, *sig_s]
-        ), message_hash, [signature.v, *sig_r, *sig_s]
\ No newline at end of file
+        return await self._send(account, calls, nonce, max_fee)
@@ -0,0 +1,386 @@
+"""
+Integer-exact Python model of the reward accounting of `AstralyStaking`.
+
+Mirrors `update_pool`, `getMultiplier`, `calculatePendingRewards`,
+`update_user_info_on_deposit` / `update_user_info_on_withdraw` and the ZKP
+entry points calling them (`deposit`, `depositForTime`, `withdraw`, `redeem`,
+`transfer`, `harvestRewards`, `updateRewardPerBlockAndEndBlock`), including
+their quirks: e.g. the reward debt written on withdraw is computed from the
+amount *before* the withdrawal. The vault is modelled without strategies nor
+LP tokens, so `totalAssets` is the ZKP float.
+
+A transaction the contract would revert raises `Revert` and leaves the model
+untouched, the same way `apply` returns the error message of the operation.
+
+    model = StakingModel()
+    ops, errors = random_sequence(random.Random(0), 20, model=model)
+"""
+PRECISION_FACTOR = 10 ** 12
+UINT256_MAX = 2 ** 256 - 1
+SECONDS_PER_DAY = 24 * 60 * 60
+MAX_LOCK_DAYS = 730
+
+# Same parameters as the staking tests
+REWARD_PER_BLOCK = 10 * 10 ** 18
+END_BLOCK = 10_000
+DEFAULT_LOCK_TIME = 365
+INITIAL_BALANCE = 10 ** 24
+
+# Fields of a user entry
+AMOUNT, REWARD_DEBT, SHARES, UNLOCK_TIME, WALLET = range(5)
+# Leading arguments of an operation that are users
+USER_ARGS = {"deposit": 1, "withdraw": 1, "redeem": 1, "transfer": 2, "harvest_rewards": 1,
+             "update_reward_per_block_and_end_block": 0}
+LOCK_DAYS = (None, None, None, 0, 1, 30, 365, 730, 731)
+ADVANCE_SECONDS = (0, SECONDS_PER_DAY, 366 * SECONDS_PER_DAY, 731 * SECONDS_PER_DAY, 731 * SECONDS_PER_DAY)
+
+
+class Revert(Exception):
+    """A transaction the contract reverts, with its error message."""
+
+
+def _add(a, b):
+    c = a + b
+    if c > UINT256_MAX:
+        raise Revert("SafeUint256: addition overflow")
+    return c
+
+
+def _sub_le(a, b):
+    if b > a:
+        raise Revert("SafeUint256: subtraction overflow")
+    return a - b
+
+
+def _mul(a, b):
+    c = a * b
+    if c > UINT256_MAX:
+        raise Revert("SafeUint256: multiplication overflow")
+    return c
+
+
+def _div(a, b):
+    if b == 0:
+        raise Revert("SafeUint256: divisor cannot be zero")
+    return a // b
+
+
+def add_lock_time_bonus(shares, lock_days):
+    return _mul(shares, 100 + lock_days * 100 // MAX_LOCK_DAYS) // 100
+
+
+class StakingModel:
+    """
+    Reward state of the vault (`acc_token_per_share`, `reward_per_block`,
+    `end_block`, `last_reward_block`) and one entry per user: the `UserInfo`
+    amount and reward debt, the xZKP shares, the deposit unlock time and the
+    ZKP balance of the user's wallet.
+
+    Parameters
+    ----------
+    reward_per_block : int
+    start_block : int
+    end_block : int
+    timestamp : int
+        Block timestamp, the block number starts at `start_block`
+    initial_balance : int
+        ZKP balance of every user before its first operation
+
+    Examples
+    ---------
+    >>> model = StakingModel()
+    >>> model.deposit(0, 100 * 10 ** 18)
+    >>> model.advance(blocks=10)
+    >>> model.calculate_pending_rewards(0)
+    100000000000000000000
+    """
+
+    __slots__ = ("reward_per_block", "start_block", "end_block", "last_reward_block",
+                 "acc_token_per_share", "block_number", "timestamp", "default_lock_time",
+                 "total_assets", "total_supply", "initial_balance", "users")
+
+    def __init__(self, reward_per_block=REWARD_PER_BLOCK, start_block=0, end_block=END_BLOCK,
+                 timestamp=0, default_lock_time=DEFAULT_LOCK_TIME, initial_balance=INITIAL_BALANCE):
+        self.reward_per_block = reward_per_block
+        self.start_block = start_block
+        self.end_block = end_block
+        self.last_reward_block = start_block
+        self.acc_token_per_share = 0
+        self.block_number = start_block
+        self.timestamp = timestamp
+        self.default_lock_time = default_lock_time
+        self.total_assets = 0
+        self.total_supply = 0
+        self.initial_balance = initial_balance
+        self.users = {}
+
+    def user(self, user):
+        """`[amount, reward_debt, shares, unlock_time, wallet]` of `user`."""
+        info = self.users.get(user)
+        if info is None:
+            info = self.users[user] = [0, 0, 0, 0, self.initial_balance]
+        return info
+
+    def advance(self, blocks=0, seconds=0):
+        self.block_number += blocks
+        self.timestamp += seconds
+
+    #
+    # Reward accounting
+    #
+
+    def get_multiplier(self, _from, _to):
+        if _to <= self.end_block:
+            return _to - _from
+        if self.end_block <= _from:
+            return 0
+        return self.end_block - _from
+
+    def update_pool(self):
+        block_number = self.block_number
+        last_reward_block = self.last_reward_block
+        if block_number <= last_reward_block:
+            return
+        if self.total_assets == 0:
+            self.last_reward_block = block_number
+            return
+        token_reward = _mul(self.get_multiplier(last_reward_block, block_number), self.reward_per_block)
+        if token_reward:
+            self.acc_token_per_share = _add(
+                self.acc_token_per_share, _mul(token_reward, PRECISION_FACTOR) // self.total_assets)
+        # only if it wasn't updated after the end block
+        if last_reward_block <= self.end_block:
+            self.last_reward_block = block_number
+
+    def pending_rewards(self, info, acc_token_per_share=None):
+        """`get_pending_rewards`, reverts when the reward debt exceeds the accrued rewards."""
+        if acc_token_per_share is None:
+            acc_token_per_share = self.acc_token_per_share
+        return _sub_le(_mul(info[AMOUNT], acc_token_per_share) // PRECISION_FACTOR, info[REWARD_DEBT])
+
+    def calculate_pending_rewards(self, user):
+        """`calculatePendingRewards` view, rewards accrued since the last pool update included."""
+        acc_token_per_share = self.acc_token_per_share
+        if self.last_reward_block < self.block_number and self.total_assets != 0:
+            token_reward = _mul(self.get_multiplier(self.last_reward_block, self.block_number),
+                                self.reward_per_block)
+            acc_token_per_share = _add(
+                acc_token_per_share, _mul(token_reward, PRECISION_FACTOR) // self.total_assets)
+        return self.pending_rewards(self.user(user), acc_token_per_share)
+
+    def _on_deposit(self, info, assets):
+        amount = _add(info[AMOUNT], assets)
+        info[AMOUNT] = amount
+        info[REWARD_DEBT] = _mul(amount, self.acc_token_per_share) // PRECISION_FACTOR
+
+    def _on_withdraw(self, info, assets):
+        # the debt is computed from the amount before the withdrawal, as the contract does
+        info[REWARD_DEBT] = _mul(info[AMOUNT], self.acc_token_per_share) // PRECISION_FACTOR
+        info[AMOUNT] = _sub_le(info[AMOUNT], assets)
+
+    def _send_rewards(self, info, rewards):
+        info[WALLET] += rewards
+
+    #
+    # Vault
+    #
+
+    def _assert_unlocked(self, info):
+        if info[UNLOCK_TIME] > self.timestamp:
+            raise Revert(f"timestamp {self.timestamp} lower than deposit unlock time {info[UNLOCK_TIME]}")
+
+    def _check_enough_underlying_balance(self, assets):
+        # no strategy to pull from, the float must cover the withdrawal
+        if assets > self.total_assets:
+            raise Revert("SafeUint256: subtraction overflow or the difference equals zero")
+
+    def _burn(self, info, shares):
+        if shares > info[SHARES]:
+            raise Revert("ERC20: burn amount exceeds balance")
+        info[SHARES] -= shares
+        self.total_supply -= shares
+
+    def deposit(self, user, assets, lock_days=None):
+        """`deposit` when `lock_days` is None, `depositForTime` otherwise."""
+        if assets == 0:
+            raise Revert("assets must not be zero")
+        if lock_days is None:
+            lock_days = self.default_lock_time
+        info = self.user(user)
+        self.update_pool()
+
+        shares = assets if self.total_supply == 0 else \
+            _div(_mul(assets, self.total_supply), self.total_assets)
+        shares = add_lock_time_bonus(shares, lock_days)
+        if shares == 0:
+            raise Revert("zero shares")
+        if assets > info[WALLET]:
+            raise Revert("ERC20: transfer amount exceeds balance")
+        info[WALLET] -= assets
+        self.total_assets += assets
+        info[SHARES] += shares
+        self.total_supply += shares
+
+        unlock_time = self.timestamp + lock_days * SECONDS_PER_DAY
+        if info[UNLOCK_TIME] > unlock_time:
+            raise Revert("new deadline should be higher or equal to the old deposit")
+        if lock_days > MAX_LOCK_DAYS:
+            raise Revert("lock time cannot exceed 2 years")
+        info[UNLOCK_TIME] = unlock_time
+
+        self._send_rewards(info, self.pending_rewards(info))
+        self._on_deposit(info, assets)
+
+    def withdraw(self, user, assets):
+        info = self.user(user)
+        self._assert_unlocked(info)
+        self._check_enough_underlying_balance(assets)
+        self.update_pool()
+        rewards = self.pending_rewards(info)
+
+        shares = assets if self.total_supply == 0 else \
+            _div(_mul(assets, self.total_supply), self.total_assets)
+        self._burn(info, shares)
+        self.total_assets -= assets
+        info[WALLET] += assets
+
+        self._on_withdraw(info, assets)
+        self._send_rewards(info, rewards)
+
+    def redeem(self, user, shares):
+        info = self.user(user)
+        self._assert_unlocked(info)
+        assets = shares if self.total_supply == 0 else \
+            _div(_mul(shares, self.total_assets), self.total_supply)
+        self._check_enough_underlying_balance(assets)
+        self.update_pool()
+        rewards = self.pending_rewards(info)
+
+        if assets == 0:
+            raise Revert("zero assets")
+        self._burn(info, shares)
+        self.total_assets -= assets
+        info[WALLET] += assets
+
+        self._on_withdraw(info, assets)
+        self._send_rewards(info, rewards)
+
+    def transfer(self, sender, recipient, shares):
+        """xZKP transfer, the shares are withdrawn from and deposited to the `UserInfo` amounts."""
+        info = self.user(sender)
+        self._assert_unlocked(info)
+        self.update_pool()
+        if shares > info[SHARES]:
+            raise Revert("ERC20: transfer amount exceeds balance")
+        info[SHARES] -= shares
+        recipient_info = self.user(recipient)
+        recipient_info[SHARES] += shares
+        self._on_withdraw(info, shares)
+        self._on_deposit(recipient_info, shares)
+
+    def harvest_rewards(self, user):
+        self.update_pool()
+        info = self.user(user)
+        accrued = _mul(info[AMOUNT], self.acc_token_per_share) // PRECISION_FACTOR
+        rewards = _sub_le(accrued, info[REWARD_DEBT])
+        if rewards == 0:
+            raise Revert("Harvest: Pending rewards must be > 0")
+        info[REWARD_DEBT] = accrued
+        self._send_rewards(info, rewards)
+
+    def update_reward_per_block_and_end_block(self, reward_per_block, end_block):
+        if self.start_block <= self.block_number:
+            self.update_pool()
+        if end_block <= self.block_number:
+            raise Revert("Owner: New endBlock must be after current block")
+        if end_block <= self.start_block:
+            raise Revert("Owner: New endBlock must be after start block")
+        self.end_block = end_block
+        self.reward_per_block = reward_per_block
+
+    #
+    # Sequences
+    #
+
+    def apply(self, op):
+        """Runs `(name, *args)`, returns None or the error message of a reverted operation."""
+        name = op[0]
+        if name == "advance":
+            self.block_number += op[1]
+            self.timestamp += op[2]
+            return None
+        saved = (self.acc_token_per_share, self.last_reward_block, self.reward_per_block,
+                 self.end_block, self.total_assets, self.total_supply)
+        # only the entries of the users passed to the operation can change
+        user = self.user
+        touched = [(info, info[:]) for info in map(user, op[1:1 + USER_ARGS[name]])]
+        try:
+            getattr(self, name)(*op[1:])
+        except Revert as e:
+            (self.acc_token_per_share, self.last_reward_block, self.reward_per_block,
+             self.end_block, self.total_assets, self.total_supply) = saved
+            for info, copy in touched:
+                info[:] = copy
+            return str(e)
+        return None
+
+    def run(self, ops):
+        return [self.apply(op) for op in ops]
+
+
+def _amount(random, balance):
+    """Mostly valid amounts, with edge cases around `balance`."""
+    r = random()
+    if balance and r < 0.5:
+        return 1 + int(r * 2 * balance) if balance < 2 ** 53 else 1 + (balance * int(r * 2 ** 54) >> 53)
+    if balance and r < 0.65:
+        return balance
+    if r < 0.75:
+        return balance + 1
+    if r < 0.8:
+        return 0
+    return 1 + int(random() * 10 ** int((r - 0.8) * 115))
+
+
+def random_operation(rng, model, users=3):
+    """An operation picked from the current state of `model`, mostly one that goes through."""
+    random = rng.random
+    r = random()
+    if not model.total_assets:
+        # mostly deposits into an empty vault
+        r *= 0.4
+    user = int(random() * users)
+    if r >= 0.25 and random() < 0.8:
+        # withdrawals and harvests mostly from users who staked
+        stakers = [u for u, info in model.users.items() if info[AMOUNT] and u < users]
+        if stakers:
+            user = stakers[int(random() * len(stakers))]
+    info = model.user(user)
+    if r < 0.25:
+        lock_days = LOCK_DAYS[int(random() * len(LOCK_DAYS))]
+        return ("deposit", user, _amount(random, info[WALLET] // 100), lock_days)
+    if r < 0.4:
+        return ("withdraw", user, _amount(random, min(info[AMOUNT], model.total_assets)))
+    if r < 0.5:
+        return ("redeem", user, _amount(random, info[SHARES]))
+    if r < 0.55:
+        return ("transfer", user, int(random() * users), _amount(random, min(info[SHARES], info[AMOUNT])))
+    if r < 0.7:
+        return ("harvest_rewards", user)
+    if r < 0.75:
+        end_block = model.block_number + int(random() * 206) - 5
+        return ("update_reward_per_block_and_end_block", int(random() * 100 * 10 ** 18), end_block)
+    return ("advance", int(random() * 51), ADVANCE_SECONDS[int(random() * len(ADVANCE_SECONDS))])
+
+
+def random_sequence(rng, length, users=3, model=None):
+    """Generates and runs `length` operations on `model` (a fresh one by default),
+    returns the operations and their results."""
+    if model is None:
+        model = StakingModel()
+    ops, errors = [], []
+    for _ in range(length):
+        op = random_operation(rng, model, users)
+        ops.append(op)
+        errors.append(model.apply(op))
+    return ops, errors
@@ -0,0 +1,72 @@
+import pytest
+
+from utils import (
+    MAX_UINT256, to_uint, uint_array, uarr2cd, encode_uint_array, get_contract_def, CalldataEncoder
+)
+
+ABI = [
+    {"type": "struct", "name": "Purchase", "size": 4, "members": [
+        {"name": "buyer", "type": "felt", "offset": 0},
+        {"name": "amount", "type": "Uint256", "offset": 1},
+        {"name": "quest", "type": "felt", "offset": 3},
+    ]},
+    {"type": "struct", "name": "Uint256", "size": 2, "members": [
+        {"name": "low", "type": "felt", "offset": 0},
+        {"name": "high", "type": "felt", "offset": 1},
+    ]},
+    {"type": "function", "name": "batch_mint", "outputs": [], "inputs": [
+        {"name": "to", "type": "felt"},
+        {"name": "ids_len", "type": "felt"},
+        {"name": "ids", "type": "Uint256*"},
+        {"name": "amounts_len", "type": "felt"},
+        {"name": "amounts", "type": "Uint256*"},
+        {"name": "data_len", "type": "felt"},
+        {"name": "data", "type": "felt*"},
+    ]},
+    {"type": "function", "name": "purchase", "outputs": [], "inputs": [
+        {"name": "purchase", "type": "Purchase"},
+        {"name": "purchases_len", "type": "felt"},
+        {"name": "purchases", "type": "Purchase*"},
+    ]},
+]
+
+
+def test_array_lengths():
+    encoder = CalldataEncoder(ABI)
+    assert [name for name, _ in encoder.inputs("batch_mint")] == ["to", "ids", "amounts", "data"]
+    assert encoder.encode("batch_mint", 0x123, [1, 2], [10, 20], [7, 8, 9]) == [
+        0x123, 2, 1, 0, 2, 0, 2, 10, 0, 20, 0, 3, 7, 8, 9]
+    assert encoder.encode("batch_mint", 0x123, [], [], []) == [0x123, 0, 0, 0]
+
+
+def test_uint256():
+    encoder = CalldataEncoder(ABI)
+    values = [0, 1, MAX_UINT256[0], MAX_UINT256[0] + 1, 2 ** 256 - 1]
+    expected = uarr2cd(uint_array(values))
+    assert encode_uint_array(values) == expected
+    assert encoder.encode("batch_mint", 0, values, [], []) == [0, *expected, 0, 0]
+    # uint256-ish tuples are taken as they are
+    assert encoder.encode("batch_mint", 0, [to_uint(2 ** 128)], [(5, 6)], []) == [0, 1, 0, 1, 1, 5, 6, 0]
+
+
+def test_structs():
+    encoder = CalldataEncoder(ABI)
+    purchase = (0xabc, 2 ** 128 + 3, 7)
+    assert encoder.encode("purchase", purchase, []) == [0xabc, 3, 1, 7, 0]
+    assert encoder.encode("purchase", purchase, [
+        {"buyer": 1, "amount": 2, "quest": 3}, (4, (5, 6), 7)]) == [0xabc, 3, 1, 7, 2, 1, 2, 0, 3, 4, 5, 6, 7]
+
+
+def test_arguments():
+    encoder = CalldataEncoder(ABI)
+    assert encoder.encode("batch_mint", 0x123, [1], amounts=[10], data=[]) == \
+        encoder.encode("batch_mint", to=0x123, ids=[1], amounts=[10], data=[])
+    with pytest.raises(TypeError):
+        encoder.encode("batch_mint", 0x123, [1], [10])
+
+
+def test_compiled_abi():
+    encoder = CalldataEncoder(get_contract_def("AstralyIDOContract.cairo").abi)
+    times = [1_700_000_000, 1_700_086_400]
+    assert encoder.encode("set_vesting_params", times, [400, 600], 0) == [
+        2, *times, *uarr2cd(uint_array([400, 600])), 0]
@@ -38,18 +38,6 @@ zkp_recipient = MockSigner(123456789987654321)
 zkp_owner = MockSigner(123456789876543210)
 
 
-def uint_array(l):
-    return list(map(uint, l))
-
-
-def uarr2cd(arr):
-    acc = [len(arr)]
-    for lo, hi in arr:
-        acc.append(lo)
-        acc.append(hi)
-    return acc
-
-
 def advance_clock(starknet_state, num_seconds):
     set_block_timestamp(
         starknet_state, get_block_timestamp(
@@ -238,7 +226,7 @@ async def contacts_init(contract_defs, get_starknet):
 def contracts_factory(contract_defs, contacts_init, get_starknet):
     account_def, zk_pad_ido_factory_def, rnd_nbr_gen_def, erc1155_def, zk_pad_ido_def, zk_pad_token_def, task_def, erc20_eth_def = contract_defs
     deployer_account, admin1_account, staking_account, sale_owner_account, sale_participant_account, sale_participant_2_account, _, _, rnd_nbr_gen, zk_pad_ido_factory, ido, erc1155, zk_pad_token, erc20_eth_token = contacts_init
-    _state = get_starknet.state.copy()
+    _state = snapshot_state(get_starknet.state)
     deployer_cached = cached_contract(_state, account_def, deployer_account)
     admin1_cached = cached_contract(_state, account_def, admin1_account)
     staking_cached = cached_contract(_state, account_def, staking_account)
@@ -460,10 +448,9 @@ async def test_setup_sale_success_with_events(contracts_factory):
     )
     pp(tx.raw_events)
 
-    my_event = next((x for x in tx.raw_events if get_selector_from_name(
-        "user_registered") in x.keys), None)
+    my_event = event_index(tx).get("user_registered")
     pp(my_event)
-    assert my_event is not None
+    assert my_event
 
     await deployer.send_transaction(
         deployer_account,
@@ -488,10 +475,9 @@ async def test_setup_sale_success_with_events(contracts_factory):
         ]
     )
 
-    user_registered_event = next((x for x in tx.raw_events if get_selector_from_name(
-        "user_registered") in x.keys), None)
+    user_registered_event = event_index(tx).get("user_registered")
     pp(user_registered_event)
-    assert user_registered_event is not None
+    assert user_registered_event
 
     # advance block timestamp to be inside the purchase round
     set_block_timestamp(starknet_state, int(
@@ -546,10 +532,9 @@ async def test_setup_sale_success_with_events(contracts_factory):
         ]
     )
 
-    tokens_sold_event = next((x for x in tx.raw_events if get_selector_from_name(
-        "tokens_sold") in x.keys), None)
+    tokens_sold_event = event_index(tx).get("tokens_sold")
     pp(tokens_sold_event)
-    assert tokens_sold_event is not None
+    assert tokens_sold_event
 
     participant_1_info = await ido.get_user_info(participant.contract_address).invoke()
     pp(participant_1_info)
@@ -575,10 +560,9 @@ async def test_setup_sale_success_with_events(contracts_factory):
         ]
     )
 
-    tokens_withdrawn_event = next((x for x in tx.raw_events if get_selector_from_name(
-        "tokens_withdrawn") in x.keys), None)
+    tokens_withdrawn_event = event_index(tx).get("tokens_withdrawn")
     pp(tokens_withdrawn_event)
-    assert tokens_withdrawn_event is not None
+    assert tokens_withdrawn_event
 
     participant_1_zkp_bal = await zkp_token.balanceOf(participant.contract_address).invoke()
     assert from_uint(participant_1_zkp_bal.result.balance) > 0
@@ -596,10 +580,9 @@ async def test_setup_sale_success_with_events(contracts_factory):
         ]
     )
 
-    tokens_withdrawn_event = next((x for x in tx.raw_events if get_selector_from_name(
-        "tokens_withdrawn") in x.keys), None)
+    tokens_withdrawn_event = event_index(tx).get("tokens_withdrawn")
     pp(tokens_withdrawn_event)
-    assert tokens_withdrawn_event is not None
+    assert tokens_withdrawn_event
 
     participant_1_zkp_bal_multiple = await zkp_token.balanceOf(participant.contract_address).invoke()
     assert from_uint(participant_1_zkp_bal_multiple.result.balance) > from_uint(
@@ -14,16 +14,6 @@ receiver_path = 'mocks/ERC1155_receiver_mock.cairo'
 rnd_nbr_gen_path = 'utils/xoroshiro128_starstar.cairo'
 
 
-def uint_array(l):
-    return list(map(uint, l))
-
-
-def uarr2cd(arr):
-    acc = [len(arr)]
-    for lo, hi in arr:
-        acc.append(lo)
-        acc.append(hi)
-    return acc
 # Constants
 
 
@@ -48,8 +38,9 @@ BURN_AMOUNTS = uint_array([500, 1000, 1500])
 TRANSFER_AMOUNTS = uint_array([500, 1000, 1500])
 TRANSFER_DIFFERENCE = [uint(m[0]-t[0])
                        for m, t in zip(MINT_AMOUNTS, TRANSFER_AMOUNTS)]
-INVALID_AMOUNTS = uint_array([1, MAX_UINT256[0]+1, 1])
-INVALID_IDS = uint_array([0, MAX_UINT256[0]+1, 1])
+# uint_array would split MAX_UINT256[0]+1 into a valid Uint256
+INVALID_AMOUNTS = [uint(1), INVALID_UINT, uint(1)]
+INVALID_IDS = [uint(0), INVALID_UINT, uint(1)]
 
 MAX_UINT_AMOUNTS = [uint(1), MAX_UINT256, uint(1)]
 
@@ -77,6 +68,13 @@ TOKEN_URI = [1862946994419801281893806961034143748618288271254499549582295376332
              43198068668795004939573357158436613902855023868408433]
 
 
+def batch_quests(owner, account, receiver):
+    """Quests tree of the second IDO, owner and account are the leaves 0 and 3."""
+    recipients = [owner.contract_address, 1111,
+                  receiver.contract_address, account.contract_address, 2222]
+    return recipients, [NB_QUEST, 1, 4, 3, 5]
+
+
 # Fixtures
 
 @pytest.fixture(scope='module')
@@ -191,7 +189,7 @@ async def erc1155_init(contract_defs):
 def erc1155_factory(contract_defs, erc1155_init):
     account_def, erc1155_def, receiver_def, ido_def, _, _, _, _ = contract_defs
     state, account1, account2, erc1155, receiver, ido, _, _, _, _ = erc1155_init
-    _state = state.copy()
+    _state = snapshot_state(state)
     account1 = cached_contract(_state, account_def, account1)
     account2 = cached_contract(_state, account_def, account2)
     erc1155 = cached_contract(_state, erc1155_def, erc1155)
@@ -204,7 +202,7 @@ def erc1155_factory(contract_defs, erc1155_init):
 async def erc1155_minted_init(contract_defs, erc1155_init):
     account_def, erc1155_def, receiver_def, ido_def, _, _, factory_def, _ = contract_defs
     state, owner, account, erc1155, receiver, ido, _, _, factory, _ = erc1155_init
-    _state = state.copy()
+    _state = snapshot_state(state)
     owner = cached_contract(_state, account_def, owner)
     account = cached_contract(_state, account_def, account)
     erc1155 = cached_contract(_state, erc1155_def, erc1155)
@@ -231,7 +229,7 @@ async def erc1155_minted_init(contract_defs, erc1155_init):
 def erc1155_minted_factory(contract_defs, erc1155_minted_init):
     account_def, erc1155_def, receiver_def, ido_def, _, _, _, _ = contract_defs
     state, erc1155, owner, account, receiver, ido = erc1155_minted_init
-    _state = state.copy()
+    _state = snapshot_state(state)
     owner = cached_contract(_state, account_def, owner)
     account = cached_contract(_state, account_def, account)
     erc1155 = cached_contract(_state, erc1155_def, erc1155)
@@ -245,7 +243,7 @@ def erc1155_minted_factory(contract_defs, erc1155_minted_init):
 async def full_init(contract_defs, erc1155_init):
     account_def, erc1155_def, receiver_def, ido_def, zk_pad_token_def, zk_pad_stake_def, factory_def, _ = contract_defs
     state, owner, account, erc1155, receiver, ido, zk_pad_token, zk_pad_stake, factory, ido2 = erc1155_init
-    _state = state.copy()
+    _state = snapshot_state(state)
     owner = cached_contract(_state, account_def, owner)
     account = cached_contract(_state, account_def, account)
     erc1155 = cached_contract(_state, erc1155_def, erc1155)
@@ -299,6 +297,10 @@ async def full_init(contract_defs, erc1155_init):
 
     root = generate_merkle_root(list(map(lambda x: x[0], MERKLE_INFO)))
     await mock_signer.send_transaction(owner, factory.contract_address, "set_merkle_root", [root, 0])
+    recipients, nb_quests = batch_quests(owner, account, receiver)
+    batch_root = generate_merkle_root(
+        [x[0] for x in get_leaves(recipients, nb_quests)])
+    await mock_signer.send_transaction(owner, factory.contract_address, "set_merkle_root", [batch_root, 1])
     # print("ROOT", root)
     # print("INFO", MERKLE_INFO)
 
@@ -309,7 +311,7 @@ async def full_init(contract_defs, erc1155_init):
 def full_factory(contract_defs, full_init):
     account_def, erc1155_def, receiver_def, ido_def, zk_pad_token_def, zk_pad_stake_def, _, _ = contract_defs
     state, erc1155, owner, account, receiver, ido, zk_pad_token, zk_pad_stake = full_init
-    _state = state.copy()
+    _state = snapshot_state(state)
     owner = cached_contract(_state, account_def, owner)
     account = cached_contract(_state, account_def, account)
     erc1155 = cached_contract(_state, erc1155_def, erc1155)
@@ -648,6 +650,67 @@ async def test_burn_with_quest(full_factory):
         [subject, *token_id, *burn_amount, NB_QUEST, len(proof), *proof])
 
 
+@pytest.mark.asyncio
+async def test_batch_burn_with_quest(full_factory):
+    erc1155, owner, account, receiver, ido, zk_pad_token, zk_pad_stake = full_factory
+    token_id = uint(1)
+    burn_amount = BURN_AMOUNT
+    await mock_signer.send_transaction(
+        owner, erc1155.contract_address, 'mint',
+        [account.contract_address, *token_id, *MINT_AMOUNT, 0])
+    await mock_signer.send_transaction(
+        account, erc1155.contract_address, 'setApprovalForAll',
+        [owner.contract_address, TRUE])
+
+    recipients, nb_quests = batch_quests(owner, account, receiver)
+    leaves = [x[0] for x in get_leaves(recipients, nb_quests)]
+    root = generate_merkle_root(list(leaves))
+    indices = [0, 3]
+    proof, proof_flags = generate_merkle_multi_proof(leaves, indices)
+    assert verify_merkle_multi_proof(
+        [leaves[i] for i in indices], root, proof, proof_flags)
+
+    await mock_signer.send_transaction(
+        owner, erc1155.contract_address, 'batch_burn_with_quest',
+        [
+            *token_id,
+            2, owner.contract_address, account.contract_address,
+            *uarr2cd([burn_amount, burn_amount]),
+            2, nb_quests[0], nb_quests[3],
+            len(proof), *proof,
+            len(proof_flags), *proof_flags
+        ])
+
+    execution_info = await erc1155.balanceOf(owner.contract_address, token_id).call()
+    assert execution_info.result.balance == sub_uint(MINT_AMOUNTS[1], burn_amount)
+    execution_info = await erc1155.balanceOf(account.contract_address, token_id).call()
+    assert execution_info.result.balance == sub_uint(MINT_AMOUNT, burn_amount)
+
+
+@pytest.mark.asyncio
+async def test_batch_burn_with_quest_invalid_proof(full_factory):
+    erc1155, owner, account, receiver, ido, zk_pad_token, zk_pad_stake = full_factory
+    token_id = uint(1)
+    recipients, nb_quests = batch_quests(owner, account, receiver)
+    leaves = [x[0] for x in get_leaves(recipients, nb_quests)]
+    proof, proof_flags = generate_merkle_multi_proof(leaves, [0, 3])
+
+    # account did not complete 4 quests
+    await assert_revert(
+        mock_signer.send_transaction(
+            owner, erc1155.contract_address, 'batch_burn_with_quest',
+            [
+                *token_id,
+                2, owner.contract_address, account.contract_address,
+                *uarr2cd([BURN_AMOUNT, BURN_AMOUNT]),
+                2, nb_quests[0], 4,
+                len(proof), *proof,
+                len(proof_flags), *proof_flags
+            ]),
+        reverted_with="AstralyLotteryToken::Error in the number of quests done"
+    )
+
+
 # batch minting
 
 
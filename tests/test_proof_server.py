@@ -0,0 +1,57 @@
+from functools import reduce
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
+
+import utils  # noqa: F401, puts scripts/ on sys.path
+from merkle import hash_pair
+from merkle_store import MerkleStore
+from proof_server import ProofService
+
+RECIPIENTS = [0x111, 0x222, 0x333]
+AMOUNTS = [1, 2, 3]
+
+
+async def get_proof(client, address):
+    response = await client.get(f"/proof/{hex(address)}")
+    assert response.status == 200
+    proof = await response.json()
+    leaf = pedersen_hash(address, proof["nb_quest"])
+    assert reduce(hash_pair, [int(x, 16) for x in proof["merkle_proof"]], leaf) == int(proof["root"], 16)
+    return proof
+
+
+@pytest.mark.asyncio
+async def test_proofs_follow_store_updates(tmp_path):
+    path = str(tmp_path / "quests.merkle")
+    MerkleStore.create(path, RECIPIENTS, AMOUNTS).close()
+
+    with MerkleStore(path) as store:
+        async with TestClient(TestServer(ProofService(store).app())) as client:
+            proof = await get_proof(client, 0x222)
+            assert proof["nb_quest"] == 2
+
+            # update_merkle_root.py writes the file from another store
+            with MerkleStore(path) as writer:
+                writer.set_leaf(0x222, 5)
+                root = writer.root
+            proof = await get_proof(client, 0x222)
+            assert proof["nb_quest"] == 5
+            assert int(proof["root"], 16) == root
+
+            # appending past the capacity replaces the file
+            with MerkleStore(path) as writer:
+                writer.set_leaf(0x444, 4)
+                writer.set_leaf(0x555, 1)
+                assert writer.capacity == 8
+                root = writer.root
+            response = await client.get("/root")
+            assert int((await response.json())["root"], 16) == root
+            for address, nb_quest in ((0x111, 1), (0x222, 5), (0x555, 1)):
+                proof = await get_proof(client, address)
+                assert proof["nb_quest"] == nb_quest
+                assert int(proof["root"], 16) == root
+
+            response = await client.get("/proof/0x666")
+            assert response.status == 404
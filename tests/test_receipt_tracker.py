@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+import utils  # noqa: F401, puts scripts/ on sys.path
+from gateway_stub import GatewayStub
+from receipt_tracker import ReceiptTracker, TransactionNotReceived, feeder_gateway_url
+
+BLOCK_TIME = 0.2
+POLL_INTERVAL = 0.02
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter():
+    stub = GatewayStub(BLOCK_TIME)
+    async with TestServer(stub.app()) as server:
+        async with ReceiptTracker(str(server.make_url("/feeder_gateway")), POLL_INTERVAL) as tracker:
+            cancelled, accepted = stub.add(), stub.add()
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(tracker.track(cancelled), BLOCK_TIME / 4)
+            # the poller survives the cancelled future and resolves the others
+            receipt = await asyncio.wait_for(tracker.track(accepted), 10 * BLOCK_TIME)
+            assert receipt["tx_status"] == "ACCEPTED_ON_L2"
+
+
+@pytest.mark.asyncio
+async def test_not_received_deadline():
+    stub = GatewayStub(BLOCK_TIME)
+    async with TestServer(stub.app()) as server:
+        async with ReceiptTracker(str(server.make_url("/feeder_gateway")), POLL_INTERVAL,
+                                  not_received_timeout=BLOCK_TIME) as tracker:
+            accepted = tracker.track(stub.add())
+            with pytest.raises(TransactionNotReceived):
+                await asyncio.wait_for(tracker.track("0xdead"), 10 * BLOCK_TIME)
+            assert (await accepted)["tx_status"] == "ACCEPTED_ON_L2"
+
+
+def test_unknown_network():
+    with pytest.raises(ValueError, match="unknown network"):
+        feeder_gateway_url("not_a_network")
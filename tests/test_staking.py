@@ -3,14 +3,15 @@ import asyncio
 from decimal import Decimal
 import pytest
 import pytest_asyncio
-from starkware.starknet.public.abi import get_selector_from_name
 from starkware.starknet.definitions.error_codes import StarknetErrorCode
 from starkware.starknet.testing.starknet import Starknet
+from starkware.starknet.public.abi import get_storage_var_address
 
 from signers import MockSigner
 from utils import (
-    to_uint, from_uint, str_to_felt, MAX_UINT256, get_contract_def, cached_contract, assert_revert,
-    assert_event_emitted, get_block_timestamp, set_block_timestamp, get_block_number, set_block_number, assert_approx_eq
+    to_uint, from_uint, str_to_felt, MAX_UINT256, get_contract_def, cached_contract, snapshot_state, assert_revert,
+    assert_event_emitted, event_index, get_block_timestamp, set_block_timestamp, get_block_number, set_block_number,
+    set_storage, assert_approx_eq
 )
 
 
@@ -141,7 +142,7 @@ async def contacts_init(contract_defs, get_starknet):
 async def contracts_factory(contract_defs, contacts_init, get_starknet):
     account_def, proxy_def, zk_pad_token_def, zk_pad_stake_def = contract_defs
     owner_account, zk_pad_token, zk_pad_stake = contacts_init
-    _state = get_starknet.state.copy()
+    _state = snapshot_state(get_starknet.state)
     token = cached_contract(_state, zk_pad_token_def, zk_pad_token)
     stake = cached_contract(_state, zk_pad_stake_def, zk_pad_stake)
     owner_cached = cached_contract(_state, account_def, owner_account)
@@ -316,6 +317,9 @@ async def test_deposit_redeem_flow(contracts_factory):
     assert (
         await zk_pad_token.balanceOf(user1_account.contract_address).invoke()
     ).result.balance == to_uint(90_000)
+    assert (
+        await zk_pad_staking.getUserStakeInfo(user1_account.contract_address).call()
+    ).result.tokens == [zk_pad_token.contract_address]
 
     advance_clock(starknet_state, days_to_seconds(365) + 1)
     # redeem vault shares, get back assets
@@ -340,6 +344,9 @@ async def test_deposit_redeem_flow(contracts_factory):
     assert (
         await zk_pad_token.balanceOf(user1_account.contract_address).invoke()
     ).result.balance == to_uint(100_000)
+    assert (
+        await zk_pad_staking.getUserStakeInfo(user1_account.contract_address).call()
+    ).result.tokens == []
 
 
 @pytest.mark.asyncio
@@ -644,6 +651,121 @@ async def test_permissions(contracts_factory):
     await assert_revert(user1.send_transaction(user1_account, zk_pad_staking.contract_address, "setStakeBoost", [25]))
 
 
+@pytest.mark.asyncio
+async def test_add_whitelisted_tokens(contracts_factory):
+    zk_pad_token, zk_pad_staking, owner_account, deploy_account_func, _, _ = contracts_factory
+    user1 = MockSigner(2345)
+    user1_account = await deploy_account_func(user1.public_key)
+    lp_tokens = [123, 456, 789]
+    calculators = [321, 654, 987]
+
+    await assert_revert(
+        user1.send_transaction(
+            user1_account, zk_pad_staking.contract_address, "addWhitelistedTokens",
+            [3, *lp_tokens, 3, *calculators, 3, False, False, True]),
+        "AccessControl: caller is missing role {}".format(str_to_felt("OWNER")))
+
+    await assert_revert(
+        owner.send_transaction(
+            owner_account, zk_pad_staking.contract_address, "addWhitelistedTokens",
+            [3, *lp_tokens, 2, *calculators[:2], 3, False, False, True]),
+        "tokens, calculators and NFT flags length mismatch")
+
+    await assert_revert(
+        owner.send_transaction(
+            owner_account, zk_pad_staking.contract_address, "addWhitelistedTokens",
+            [2, 123, 123, 2, 321, 321, 2, False, False]),
+        "already whitelisted")
+
+    tx = await owner.send_transaction(
+        owner_account, zk_pad_staking.contract_address, "addWhitelistedTokens",
+        [3, *lp_tokens, 3, *calculators, 3, False, False, True])
+    # position 1 is the underlying token
+    assert tx.result.response == [3, 2, 3, 4]
+
+    for lp_token in lp_tokens:
+        assert (await zk_pad_staking.isTokenWhitelisted(lp_token).call()).result.res == 1
+
+    # the last token takes the position of the removed one
+    await owner.send_transaction(owner_account, zk_pad_staking.contract_address, "removeWhitelistedToken", [456])
+    assert (await zk_pad_staking.isTokenWhitelisted(456).call()).result.res == 0
+    assert (await zk_pad_staking.getWhitelistedTokens().call()).result.tokens == [
+        zk_pad_token.contract_address, 123, 789]
+
+    tx = await owner.send_transaction(owner_account, zk_pad_staking.contract_address, "addWhitelistedToken",
+                                      [111, 222, False])
+    assert tx.result.response == [4]
+    assert (await zk_pad_staking.getWhitelistedTokens().call()).result.tokens == [
+        zk_pad_token.contract_address, 123, 789, 111]
+
+
+@pytest.mark.asyncio
+async def test_migrate_whitelisted_tokens(contracts_factory):
+    zk_pad_token, zk_pad_staking, owner_account, deploy_account_func, _, starknet_state = contracts_factory
+    user1 = MockSigner(2345)
+    user1_account = await deploy_account_func(user1.public_key)
+    staking = zk_pad_staking.contract_address
+    asset = zk_pad_token.contract_address
+
+    # storage of the bit masks implementation: the underlying token on bit 0, 123 and 789 on bits 1 and 3
+    set_storage(starknet_state, staking, "whitelisted_tokens_len", values=[0])
+    set_storage(starknet_state, staking, "whitelisted_tokens_list", 1, values=[0])
+    set_storage(starknet_state, staking, "whitelisted_tokens_mask", values=[0b1011])
+    for bit_mask, lp_token, calculator in ((1, asset, 0), (2, 123, 321), (8, 789, 987)):
+        set_storage(starknet_state, staking, "token_mask_addresses", bit_mask, values=[lp_token])
+        set_storage(starknet_state, staking, "whitelisted_tokens", lp_token, values=[bit_mask, calculator, False])
+    # and the tokens staked by two users, user_staked_tokens(user) -> (tokens_mask)
+    stakers = {user1_account.contract_address: (0b1010, [123, 789]),
+               owner_account.contract_address: (0b1001, [asset, 789])}
+    for user, (tokens_mask, _) in stakers.items():
+        set_storage(starknet_state, staking, "user_staked_tokens", user, values=[tokens_mask])
+    implementation = (await zk_pad_staking.getImplementationHash().call()).result.address
+    await owner.send_transaction(owner_account, staking, "upgrade", [implementation])
+
+    assert (await zk_pad_staking.getWhitelistedTokens().call()).result.tokens == []
+    assert (await zk_pad_staking.isTokenWhitelisted(123).call()).result.res == 1
+    await assert_revert(
+        owner.send_transaction(owner_account, staking, "removeWhitelistedToken", [123]),
+        "whitelist not migrated")
+    await assert_revert(
+        owner.send_transaction(owner_account, staking, "addWhitelistedToken", [123, 321, False]),
+        "already whitelisted")
+    await assert_revert(
+        user1.send_transaction(user1_account, staking, "migrateWhitelistedTokens", []),
+        "AccessControl: caller is missing role {}".format(str_to_felt("OWNER")))
+
+    tx = await owner.send_transaction(owner_account, staking, "migrateWhitelistedTokens", [])
+    assert tx.result.response == [3]
+    assert (await zk_pad_staking.getWhitelistedTokens().call()).result.tokens == [asset, 123, 789]
+    # the masks are cleared, migrating again does nothing
+    tx = await owner.send_transaction(owner_account, staking, "migrateWhitelistedTokens", [])
+    assert tx.result.response == [3]
+
+    assert (await zk_pad_staking.getUserStakeInfo(user1_account.contract_address).call()).result.tokens == []
+    await assert_revert(
+        user1.send_transaction(user1_account, staking, "migrateUserStakedTokens", [1, user1_account.contract_address]),
+        "AccessControl: caller is missing role {}".format(str_to_felt("OWNER")))
+    await owner.send_transaction(owner_account, staking, "migrateUserStakedTokens", [len(stakers), *stakers])
+    storage = starknet_state.state.contract_states[staking].storage_updates
+    for user, (_, tokens) in stakers.items():
+        assert (await zk_pad_staking.getUserStakeInfo(user).call()).result.tokens == tokens
+        # the old mask is cleared, migrating the user again does nothing
+        assert storage[get_storage_var_address("user_staked_tokens", user)].value == 0
+    await owner.send_transaction(owner_account, staking, "migrateUserStakedTokens", [len(stakers), *stakers])
+    for user, (_, tokens) in stakers.items():
+        assert (await zk_pad_staking.getUserStakeInfo(user).call()).result.tokens == tokens
+
+    await owner.send_transaction(owner_account, staking, "removeWhitelistedToken", [123])
+    assert (await zk_pad_staking.isTokenWhitelisted(123).call()).result.res == 0
+    assert (await zk_pad_staking.getWhitelistedTokens().call()).result.tokens == [asset, 789]
+
+    tx = await owner.send_transaction(owner_account, staking, "addWhitelistedToken", [456, 654, False])
+    assert tx.result.response == [3]
+    tx = await owner.send_transaction(owner_account, staking, "addWhitelistedToken", [123, 321, False])
+    assert tx.result.response == [4]
+    assert (await zk_pad_staking.getWhitelistedTokens().call()).result.tokens == [asset, 789, 456, 123]
+
+
 @pytest.mark.asyncio
 async def test_deposit_lp(contracts_factory):
     zk_pad_token, zk_pad_staking, owner_account, deploy_account_func, deploy_contract_func, starknet_state = contracts_factory
@@ -1469,9 +1591,7 @@ async def test_reward_system(contracts_factory):
     print("ACC_TOKEN_PER_SHARE", ACC_TOKEN_PER_SHARE)
     tx = await user1.send_transaction(user1_account, zk_pad_staking.contract_address, "harvestRewards", [])
     user_balance = (await zk_pad_token.balanceOf(user1_account.contract_address).call()).result.balance
-    event_signature = get_selector_from_name("HarvestRewards")
-    assert next(
-        (x for x in tx.raw_events if event_signature in x.keys), None) is not None
+    assert event_index(tx).get("HarvestRewards", zk_pad_staking.contract_address)
 
     assert from_uint(user_balance) > from_uint(
         user_balance_after_initial_deposit)
@@ -0,0 +1,191 @@
+import asyncio
+import random
+
+import pytest
+import pytest_asyncio
+from starkware.starknet.testing.starknet import Starknet
+from starkware.starkware_utils.error_handling import StarkException
+
+from signers import MockSigner
+from staking_model import (
+    AMOUNT, REWARD_DEBT, SHARES, WALLET, END_BLOCK, INITIAL_BALANCE, REWARD_PER_BLOCK, USER_ARGS,
+    StakingModel, random_sequence
+)
+from utils import (
+    to_uint, from_uint, str_to_felt, MAX_UINT256, get_contract_def, cached_contract, snapshot_state,
+    set_block_number, set_block_timestamp
+)
+
+NOW = 1_660_000_000
+USERS = 3
+SEQUENCE_LENGTH = 15
+
+owner = MockSigner(1234)
+signers = [MockSigner(2345 + i) for i in range(USERS)]
+
+
+def pytest_generate_tests(metafunc):
+    if "sequence_seed" in metafunc.fixturenames:
+        seed = metafunc.config.getoption("staking_seed")
+        count = metafunc.config.getoption("staking_sequences")
+        metafunc.parametrize("sequence_seed", range(seed, seed + count))
+
+
+@pytest.fixture(scope='module')
+def event_loop():
+    return asyncio.new_event_loop()
+
+
+@pytest.fixture(scope='module')
+def contract_defs():
+    account_def = get_contract_def('openzeppelin/account/presets/Account.cairo')
+    proxy_def = get_contract_def('openzeppelin/upgrades/presets/Proxy.cairo')
+    token_def = get_contract_def('mocks/test_AstralyToken.cairo')
+    staking_def = get_contract_def('AstralyStaking.cairo')
+    return account_def, proxy_def, token_def, staking_def
+
+
+@pytest_asyncio.fixture(scope='module')
+async def contracts_init(contract_defs):
+    account_def, proxy_def, token_def, staking_def = contract_defs
+    starknet = await Starknet.empty()
+    set_block_timestamp(starknet.state, NOW)
+    set_block_number(starknet.state, 0)
+
+    owner_account = await starknet.deploy(contract_class=account_def, constructor_calldata=[owner.public_key])
+    accounts = [await starknet.deploy(contract_class=account_def, constructor_calldata=[signer.public_key])
+                for signer in signers]
+    token = await starknet.deploy(contract_class=token_def, constructor_calldata=[
+        str_to_felt("Astraly"),
+        str_to_felt("ZKP"),
+        18,
+        *to_uint(0),
+        owner_account.contract_address,  # recipient
+        owner_account.contract_address,  # owner
+        *to_uint(10 ** 30),
+    ])
+    staking_class = await starknet.declare(contract_class=staking_def)
+    staking = await starknet.deploy(contract_class=proxy_def, constructor_calldata=[staking_class.class_hash])
+
+    await owner.send_transactions(owner_account, [
+        (staking.contract_address, "initializer", [
+            str_to_felt("xAstraly"),
+            str_to_felt("xZKP"),
+            token.contract_address,
+            owner_account.contract_address,
+            *to_uint(REWARD_PER_BLOCK),
+            0,
+            END_BLOCK
+        ]),
+        (token.contract_address, "set_vault_address", [staking.contract_address]),
+        *[(token.contract_address, "mint", [account.contract_address, *to_uint(INITIAL_BALANCE)])
+          for account in accounts],
+    ])
+    for signer, account in zip(signers, accounts):
+        await signer.send_transaction(account, token.contract_address, "approve",
+                                      [staking.contract_address, *MAX_UINT256])
+    return starknet.state, owner_account, accounts, token, staking
+
+
+@pytest.fixture
+def contracts_factory(contract_defs, contracts_init):
+    account_def, _, token_def, staking_def = contract_defs
+    state, owner_account, accounts, token, staking = contracts_init
+    _state = snapshot_state(state)
+    return (
+        _state,
+        cached_contract(_state, account_def, owner_account),
+        [cached_contract(_state, account_def, account) for account in accounts],
+        cached_contract(_state, token_def, token),
+        cached_contract(_state, staking_def, staking),
+    )
+
+
+async def send(state, owner_account, accounts, staking, model, op):
+    """Runs the contract counterpart of the model operation `op`."""
+    name, *args = op
+    if name == "advance":
+        set_block_number(state, model.block_number)
+        set_block_timestamp(state, NOW + model.timestamp)
+        return
+    if name == "update_reward_per_block_and_end_block":
+        reward_per_block, end_block = args
+        await owner.send_transaction(owner_account, staking.contract_address, "updateRewardPerBlockAndEndBlock",
+                                     [*to_uint(reward_per_block), end_block])
+        return
+
+    user, *args = args
+    account = accounts[user].contract_address
+    if name == "deposit":
+        assets, lock_days = args
+        if lock_days is None:
+            calldata = ["deposit", [*to_uint(assets), account]]
+        else:
+            calldata = ["depositForTime", [*to_uint(assets), account, lock_days]]
+    elif name == "withdraw":
+        calldata = ["withdraw", [*to_uint(args[0]), account, account]]
+    elif name == "redeem":
+        calldata = ["redeem", [*to_uint(args[0]), account, account]]
+    elif name == "transfer":
+        recipient, shares = args
+        calldata = ["transfer", [accounts[recipient].contract_address, *to_uint(shares)]]
+    else:
+        calldata = ["harvestRewards", []]
+    await signers[user].send_transaction(accounts[user], staking.contract_address, *calldata)
+
+
+async def assert_same_state(accounts, token, staking, model, step, users=None):
+    assert (await staking.lastRewardBlock().call()).result.block == model.last_reward_block, step
+    assert from_uint((await staking.accTokenPerShare().call()).result.res) == model.acc_token_per_share, step
+    assert from_uint((await staking.rewardPerBlock().call()).result.reward) == model.reward_per_block, step
+    assert (await staking.endBlock().call()).result.block == model.end_block, step
+    assert from_uint((await staking.totalAssets().call()).result.totalManagedAssets) == model.total_assets, step
+    assert from_uint((await staking.totalSupply().call()).result.totalSupply) == model.total_supply, step
+
+    for user in range(len(accounts)) if users is None else set(users):
+        address = accounts[user].contract_address
+        info = model.user(user)
+        user_info = (await staking.userInfo(address).call()).result.info
+        assert (from_uint(user_info.amount), from_uint(user_info.reward_debt)) == \
+            (info[AMOUNT], info[REWARD_DEBT]), f"{step}, user {user}"
+        assert from_uint((await staking.balanceOf(address).call()).result.balance) == info[SHARES], \
+            f"{step}, user {user}"
+        assert from_uint((await token.balanceOf(address).call()).result.balance) == info[WALLET], \
+            f"{step}, user {user}"
+
+
+def test_model_invariants():
+    rng = random.Random(0)
+    for _ in range(2_000):
+        model = StakingModel()
+        random_sequence(rng, SEQUENCE_LENGTH, USERS, model)
+        users = model.users.values()
+        assert model.last_reward_block <= max(model.block_number, model.start_block)
+        assert model.total_supply == sum(info[SHARES] for info in users)
+        # rewards are minted on top of the deposits
+        assert sum(info[WALLET] for info in users) + model.total_assets >= len(users) * INITIAL_BALANCE
+        assert all(info[AMOUNT] >= 0 and info[WALLET] >= 0 for info in users)
+
+
+@pytest.mark.asyncio
+async def test_model_matches_contract(contracts_factory, sequence_seed):
+    state, owner_account, accounts, token, staking = contracts_factory
+    ops, _ = random_sequence(random.Random(sequence_seed), SEQUENCE_LENGTH, USERS)
+    # timestamps of the model are relative to NOW
+    model = StakingModel()
+
+    for step, op in enumerate(ops):
+        error = model.apply(op)
+        try:
+            await send(state, owner_account, accounts, staking, model, op)
+            reverted = None
+        except StarkException as err:
+            reverted = err.args[1]["message"]
+        assert (reverted is None) == (error is None), \
+            f"step {step} {op}: model {'reverted with ' + error if error else 'passed'}, " \
+            f"contract {'reverted with ' + reverted if reverted else 'passed'}"
+        if op[0] != "advance":
+            # only the users of the operation can change
+            await assert_same_state(accounts, token, staking, model, f"step {step} {op}",
+                                    op[1:1 + USER_ARGS[op[0]]])
+    await assert_same_state(accounts, token, staking, model, "end")
@@ -6,8 +6,9 @@ from starkware.starknet.testing.starknet import Starknet
 
 from signers import MockSigner
 from utils import (
-    to_uint, add_uint, sub_uint, str_to_felt, MAX_UINT256, ZERO_ADDRESS, INVALID_UINT256,
-    TRUE, get_contract_def, cached_contract, assert_revert, assert_event_emitted, contract_path
+    to_uint, from_uint, add_uint, sub_uint, str_to_felt, MAX_UINT256, ZERO_ADDRESS, INVALID_UINT256,
+    TRUE, get_contract_def, cached_contract, snapshot_state, assert_revert, assert_event_emitted, event_index,
+    contract_path
 )
 
 recipient = MockSigner(123456789987654321)
@@ -75,7 +76,7 @@ async def contracts_init(contract_defs):
 async def contracts_factory(contract_defs, contracts_init):
     account_def, zk_pad_token_def = contract_defs
     state, account1, account2, erc20 = contracts_init
-    _state = state.copy()
+    _state = snapshot_state(state)
     account1 = cached_contract(_state, account_def, account1)
     account2 = cached_contract(_state, account_def, account2)
     erc20 = cached_contract(_state, zk_pad_token_def, erc20)
@@ -100,6 +101,32 @@ async def test_constructor(contracts_factory):
     assert execution_info.result.totalSupply == INIT_SUPPLY
 
 
+@pytest.mark.asyncio
+async def test_snapshots_are_isolated(contract_defs, contracts_init):
+    account_def, zk_pad_token_def = contract_defs
+    state, recipient_account, owner_account, erc20 = contracts_init
+    state_a, state_b = snapshot_state(state), snapshot_state(state)
+    account_a = cached_contract(state_a, account_def, recipient_account)
+    erc20_a = cached_contract(state_a, zk_pad_token_def, erc20)
+
+    await recipient.send_transaction(
+        account_a, erc20.contract_address, 'transfer', [owner_account.contract_address, *AMOUNT])
+    new_token_address, _ = await state_a.deploy(
+        contract_class=zk_pad_token_def,
+        constructor_calldata=[NAME, SYMBOL, DECIMALS, *INIT_SUPPLY,
+                              recipient_account.contract_address, owner_account.contract_address, *CAP]
+    )
+    execution_info = await erc20_a.balanceOf(owner_account.contract_address).invoke()
+    assert execution_info.result.balance == AMOUNT
+
+    # neither the sibling nor the base state see the transfer or the deployment
+    for _state in (state_b, state):
+        execution_info = await cached_contract(_state, zk_pad_token_def, erc20).balanceOf(
+            owner_account.contract_address).invoke()
+        assert execution_info.result.balance == UINT_ZERO
+        assert not _state.state.contract_states[new_token_address].state.initialized
+
+
 @pytest.mark.asyncio
 async def test_constructor_exceed_max_decimals(contracts_factory):
     _, recipient_account, owner_account = contracts_factory
@@ -193,6 +220,11 @@ async def test_approve_emits_event(contracts_factory):
         ]
     )
 
+    approval, = event_index(tx_exec_info).decoded(erc20, 'Approval')
+    assert approval.owner == account.contract_address
+    assert approval.spender == spender.contract_address
+    assert approval.value == from_uint(AMOUNT)
+
 
 @pytest.mark.asyncio
 async def test_approve_from_zero_address(contracts_factory):
@@ -307,6 +339,33 @@ async def test_transfer_not_enough_balance(contracts_factory):
     )
 
 
+@pytest.mark.asyncio
+async def test_transfer_after_rejected_transfer(contracts_factory):
+    erc20, recipient_account, owner_account = contracts_factory
+
+    await assert_revert(recipient.send_transaction(
+        recipient_account, erc20.contract_address, 'transfer', [
+            owner_account.contract_address,
+            *add_uint(INIT_SUPPLY, UINT_ONE)
+        ]),
+        reverted_with="ERC20: transfer amount exceeds balance"
+    )
+
+    # the rejected transaction did not consume its nonce, the cached one is resynced
+    for _ in range(2):
+        await recipient.send_transaction(
+            recipient_account, erc20.contract_address, 'transfer', [
+                owner_account.contract_address,
+                *AMOUNT
+            ]
+        )
+
+    execution_info = await recipient_account.get_nonce().call()
+    assert execution_info.result.res == 2
+    execution_info = await erc20.balanceOf(owner_account.contract_address).invoke()
+    assert execution_info.result.balance == add_uint(AMOUNT, AMOUNT)
+
+
 @pytest.mark.asyncio
 async def test_transfer_to_zero_address(contracts_factory):
     erc20, account, _ = contracts_factory
@@ -1,19 +1,38 @@
 """Utilities for testing Cairo contracts."""
 from collections import namedtuple
 from pathlib import Path
+import fcntl
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib.metadata
 import math
 import asyncio
-from starkware.cairo.common.hash_state import compute_hash_on_elements
+import os
+import pickle
+import re
+import sys
+import weakref
 from starkware.crypto.signature.signature import private_to_stark_key, sign
 from starkware.starknet.business_logic.state.state import BlockInfo
-from starkware.starknet.public.abi import get_selector_from_name
 from starkware.starknet.compiler.compile import compile_starknet_files
 from starkware.starkware_utils.error_handling import StarkException
 from starkware.starknet.testing.starknet import StarknetContract, Starknet
-from starkware.starknet.business_logic.execution.objects import Event
+from starkware.starknet.testing.state import StarknetState
+from starkware.starknet.services.api.contract_class import EntryPointType
+from starkware.starknet.public.abi import get_storage_var_address
+from starkware.starknet.storage.starknet_storage import StorageLeaf
 from starkware.crypto.signature.fast_pedersen_hash import pedersen_hash
 
-from nile.signer import Signer, from_call_to_call_array, get_transaction_hash
+from nile.signer import Signer, get_transaction_hash
+
+# selectors and calldata encoding, shared with the scripts
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+from calldata import (  # noqa: E402
+    TRANSACTION_VERSION, get_selector, str_to_felt, to_uint, from_uint, uint_array, uarr2cd,
+    encode_uint_array, from_call_to_call_array, hash_multicall, CalldataEncoder
+)
+# the merkle tree of the scripts, tested against the contracts
+from merkle import MerkleTree, map_chunks, hash_level_chunk, hash_leaves_chunk, process_multi_proof  # noqa: E402
 
 MAX_UINT256 = (2 ** 128 - 1, 2 ** 128 - 1)
 INVALID_UINT256 = (MAX_UINT256[0] + 1, MAX_UINT256[1])
@@ -21,10 +40,12 @@ ZERO_ADDRESS = 0
 TRUE = 1
 FALSE = 0
 
-TRANSACTION_VERSION = 0
-
 _root = Path(__file__).parent.parent
 
+CAIRO_PATH = [str(_root / "lib/cairo_contracts/src"), str(_root / "lib/starknet_attestations")]
+# Compiled contracts, shared by every test module and xdist worker
+CONTRACT_CACHE_DIR = os.getenv("CONTRACT_CACHE_DIR", str(_root / ".contract_cache"))
+
 
 def contract_path(name):
     if name.startswith("openzeppelin"):
@@ -37,22 +58,127 @@ def contract_path(name):
         return str(_root / "contracts" / name)
 
 
-def str_to_felt(text):
-    b_text = bytes(text, "ascii")
-    return int.from_bytes(b_text, "big")
-
-
 def felt_to_str(felt):
     b_felt = felt.to_bytes(31, "big")
     return b_felt.decode()
 
 
+class EventIndex:
+    """
+    Raw events of an execution info indexed by selector and emitting contract,
+    so looking one up does not scan every event of the transaction.
+
+    Parameters
+    ----------
+
+    raw_events : list of Event
+
+    Examples
+    ---------
+    >>> events = event_index(tx)
+    >>> events.emitted(token.contract_address, "Transfer", [sender, recipient, *to_uint(amount)])
+    True
+    >>> events.decoded(token, "Transfer")[0].value
+    1000
+    """
+
+    def __init__(self, raw_events):
+        # selector -> from_address -> data of the events, in emission order
+        self._events = {}
+        for event in raw_events:
+            if event.keys:
+                self._events.setdefault(event.keys[0], {}).setdefault(
+                    event.from_address, []).append(tuple(event.data))
+        # (from_address, selector) -> set of data, built on first lookup
+        self._data_sets = {}
+
+    def get(self, name, from_address=None):
+        """Data of the `name` events emitted by `from_address`, or by any contract."""
+        by_address = self._events.get(get_selector(name), {})
+        if from_address is not None:
+            return by_address.get(from_address, [])
+        return [data for events in by_address.values() for data in events]
+
+    def emitted(self, from_address, name, data):
+        key = (from_address, get_selector(name))
+        data_set = self._data_sets.get(key)
+        if data_set is None:
+            data_set = self._data_sets[key] = set(self.get(name, from_address))
+        return tuple(data) in data_set
+
+    def decoded(self, contract, name):
+        """The `name` events emitted by `contract`, decoded with its ABI."""
+        decode = _event_decoder(contract, name)
+        return [decode(data) for data in self.get(name, contract.contract_address)]
+
+
+# id(execution info) -> (weakref to it, EventIndex)
+_event_indexes = {}
+
+
+def event_index(tx_exec_info):
+    """Returns the EventIndex of `tx_exec_info`, built once per execution info."""
+    key = id(tx_exec_info)
+    entry = _event_indexes.get(key)
+    if entry is None or entry[0]() is not tx_exec_info:
+        entry = (weakref.ref(tx_exec_info, lambda _: _event_indexes.pop(key, None)),
+                 EventIndex(tx_exec_info.raw_events))
+        _event_indexes[key] = entry
+    return entry[1]
+
+
+def _decode_abi_value(structs, type_, data, offset, length=None):
+    """Decodes the `type_` value at `data[offset]`, returns it and the next offset.
+    Uint256 are decoded to ints, other structs to namedtuples."""
+    if length is not None:
+        values = []
+        for _ in range(length):
+            value, offset = _decode_abi_value(structs, type_, data, offset)
+            values.append(value)
+        return values, offset
+    if type_ == "felt":
+        return data[offset], offset + 1
+    if type_ == "Uint256":
+        return from_uint(data[offset:offset + 2]), offset + 2
+    struct = structs[type_]
+    values = []
+    for member in struct["members"]:
+        value, _ = _decode_abi_value(structs, member["type"], data, offset + member["offset"])
+        values.append(value)
+    return namedtuple(type_, [member["name"] for member in struct["members"]])(*values), offset + struct["size"]
+
+
+# (from_address, name) -> decoder, the address of a contract determines its class and ABI
+_event_decoders = {}
+
+
+def _event_decoder(contract, name):
+    key = (contract.contract_address, name)
+    decoder = _event_decoders.get(key)
+    if decoder is None:
+        structs = {entry["name"]: entry for entry in contract.abi if entry["type"] == "struct"}
+        members = next(entry["data"] for entry in contract.abi
+                       if entry["type"] == "event" and entry["name"] == name)
+        Decoded = namedtuple(name, [member["name"] for member in members])
+
+        def decoder(data):
+            values = []
+            offset = 0
+            for member in members:
+                type_ = member["type"]
+                # arrays follow their `_len` member
+                length = values[-1] if type_.endswith("*") else None
+                value, offset = _decode_abi_value(structs, type_.rstrip("*"), data, offset, length)
+                values.append(value)
+            return Decoded(*values)
+
+        _event_decoders[key] = decoder
+    return decoder
+
+
 def assert_event_emitted(tx_exec_info, from_address, name, data):
-    assert Event(
-        from_address=from_address,
-        keys=[get_selector_from_name(name)],
-        data=data,
-    ) in tx_exec_info.raw_events
+    assert event_index(tx_exec_info).emitted(from_address, name, data), \
+        f"{name}{list(data)} not emitted by {hex(from_address)}"
 
 
 def get_contract_class(path):
@@ -69,21 +195,11 @@ def uint(a):
     return (a, 0)
 
 
-def to_uint(a):
-    """Takes in value, returns uint256-ish tuple."""
-    return (a & ((1 << 128) - 1), a >> 128)
-
-
 def to_uint_typed(a):
     Uint256 = namedtuple("Uint256", "low high")
     return Uint256(low=a & ((1 << 128) - 1), high=a >> 128)
 
 
-def from_uint(uint):
-    """Takes in uint256-ish tuple, returns value."""
-    return uint[0] + (uint[1] << 128)
-
-
 def add_uint(a, b):
     """Returns the sum of two uint256-ish tuples."""
     a = from_uint(a)
@@ -130,15 +246,149 @@ async def assert_revert(fun, reverted_with=None, error_code=None):
             assert error['code'] == error_code
 
 
+class ContractCache:
+    """
+    On-disk cache of compiled contract definitions.
+
+    Entries are keyed by the hash of the contract file, of every file it imports
+    from the Cairo path (transitively), of the Cairo path and of the cairo-lang
+    version, so editing any source compiles the contract again. A lock file per
+    entry makes concurrent xdist workers wait for the one compiling it instead
+    of compiling it too.
+
+    Examples
+    ---------
+    >>> cache = ContractCache(CONTRACT_CACHE_DIR)
+    >>> contract_def = cache.get(contract_path("AstralyStaking.cairo"))
+    """
+
+    _import = re.compile(rb"^\s*from\s+([\w.]+)\s+import", re.MULTILINE)
+
+    def __init__(self, directory, cairo_path=CAIRO_PATH, enabled=True):
+        self.directory = directory
+        self.cairo_path = cairo_path
+        self.enabled = enabled
+        self.compiler = importlib.metadata.version("cairo-lang")
+        self.compiled = 0
+        # external entry points -> contract file name, to label profiled calls
+        self.names = {}
+        self._definitions = {}
+
+    def _resolve(self, module):
+        relative = Path(*module.split(".")).with_suffix(".cairo")
+        # imports like contracts.utils are relative to the repository root
+        for directory in [str(_root), *self.cairo_path]:
+            path = Path(directory) / relative
+            if path.exists():
+                return path
+        return None
+
+    def key(self, path):
+        digests, queue = {}, [os.path.abspath(path)]
+        while queue:
+            path = queue.pop()
+            if path in digests:
+                continue
+            data = Path(path).read_bytes()
+            digests[path] = hashlib.sha256(data).hexdigest()
+            for module in self._import.findall(data):
+                imported = self._resolve(module.decode())
+                if imported is not None:
+                    queue.append(os.path.abspath(imported))
+
+        h = hashlib.sha256(f"cairo-lang {self.compiler} debug_info\n".encode())
+        for directory in self.cairo_path:
+            h.update(f"path {os.path.relpath(directory, _root)}\n".encode())
+        for path, digest in sorted(digests.items()):
+            h.update(f"{os.path.relpath(path, _root)} {digest}\n".encode())
+        return h.hexdigest()
+
+    def compile(self, path):
+        self.compiled += 1
+        return compile_starknet_files(
+            files=[path],
+            debug_info=True,
+            cairo_path=self.cairo_path
+        )
+
+    def get(self, path):
+        """Returns the compiled definition of the contract at `path`."""
+        contract_def = self._get(path)
+        self.names[entry_points_key(contract_def)] = Path(path).stem
+        return contract_def
+
+    def _get(self, path):
+        if not self.enabled:
+            return self.compile(path)
+
+        key = self.key(path)
+        if key in self._definitions:
+            return self._definitions[key]
+
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self._entry(key)
+        with open(f"{entry}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(entry, "rb") as f:
+                    contract_def = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                contract_def = self.compile(path)
+                with open(f"{entry}.tmp", "wb") as f:
+                    pickle.dump(contract_def, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(f"{entry}.tmp", entry)
+        self._definitions[key] = contract_def
+        return contract_def
+
+    def _entry(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def missing(self, paths):
+        """Contracts of `paths` that are not compiled in the cache yet."""
+        return [path for path in paths if not os.path.exists(self._entry(self.key(path)))]
+
+    def precompile(self, paths, max_workers=None):
+        """Compiles the contracts of `paths` missing from the cache in a process pool,
+        returns the paths compiled."""
+        if not self.enabled:
+            return []
+        paths = self.missing(paths)
+        if len(paths) > 1:
+            with ProcessPoolExecutor(max_workers) as executor:
+                list(executor.map(_precompile, [self.directory] * len(paths), paths))
+        elif paths:
+            self.get(paths[0])
+        return paths
+
+
+def entry_points_key(contract_class):
+    """Selectors of the external entry points of `contract_class`, identify it without hashing it."""
+    return tuple(sorted(entry_point.selector for entry_point in
+                        contract_class.entry_points_by_type[EntryPointType.EXTERNAL]))
+
+
+def _precompile(directory, path):
+    ContractCache(directory).get(path)
+
+
+_CONTRACT_REFERENCE = re.compile(r"""['"]([\w/]+\.cairo)['"]""")
+
+
+def referenced_contracts(directory):
+    """Paths of the contracts named in the Python files of `directory`, e.g. 'AstralyStaking.cairo'."""
+    names = set()
+    for file in Path(directory).rglob("*.py"):
+        names.update(_CONTRACT_REFERENCE.findall(file.read_text()))
+    paths = {contract_path(name) for name in names}
+    return sorted(path for path in paths if os.path.exists(path))
+
+
+CONTRACT_CACHE = ContractCache(CONTRACT_CACHE_DIR)
+
+
 def get_contract_def(path):
     """Returns the contract definition from the contract path"""
-    path = contract_path(path)
-    contract_def = compile_starknet_files(
-        files=[path],
-        debug_info=True,
-        cairo_path=[str(_root / "lib/cairo_contracts/src"), str(_root / "lib/starknet_attestations")]
-    )
-    return contract_def
+    return CONTRACT_CACHE.get(contract_path(path))
 
 
 def cached_contract(state, definition, deployed):
@@ -152,21 +402,25 @@ def cached_contract(state, definition, deployed):
     return contract
 
 
-def hash_multicall(sender, calls, nonce, max_fee):
-    hash_array = []
-    for call in calls:
-        call_elements = [call[0], call[1], compute_hash_on_elements(call[2])]
-        hash_array.append(compute_hash_on_elements(call_elements))
+def snapshot_state(state):
+    """
+    Returns a copy-on-write snapshot of the StarknetState `state`.
 
-    message = [
-        str_to_felt('StarkNet Transaction'),
-        sender,
-        compute_hash_on_elements(hash_array),
-        nonce,
-        max_fee,
-        TRANSACTION_VERSION
-    ]
-    return compute_hash_on_elements(message)
+    Unlike `state.copy()`, which deep-copies every contract and storage slot,
+    the snapshot reads through to `state` and its own writes go into a layer
+    on top of it (the ChainMap layers of CarriedState), thrown away with the
+    snapshot. `state` must not change while snapshots of it are in use.
+
+    cairo-lang reserves `create_child_state_for_querying` for queries because
+    the child is never applied back to its parent, which is what a snapshot
+    wants. Transactions only write through `contract_states[...] = replace(...)`
+    and rebinding, which land in the child's own layer, so siblings stay
+    isolated (test_snapshots_are_isolated). The only write reaching the parent
+    is the empty contract state a defaultdict lookup of an undeployed address
+    inserts into `Starknet.empty()`'s base map, the same value every other
+    lookup would get.
+    """
+    return StarknetState(state.state.create_child_state_for_querying(), state.general_config)
 
 
 def get_block_timestamp(starknet_state):
@@ -189,6 +443,13 @@ def set_block_number(starknet_state, block_number):
     )
 
 
+def set_storage(starknet_state, contract_address, var_name, *keys, values):
+    """Writes `values`, e.g. the members of a struct, in the storage var `var_name` of a contract."""
+    address = get_storage_var_address(var_name, *keys)
+    starknet_state.state.update_contract_storage(
+        contract_address, {address + i: StorageLeaf(value) for i, value in enumerate(values)})
+
+
 def assert_approx_eq(a: int, b: int, max_delta: int):
     delta = a - b if a > b else b - a
 
@@ -200,31 +461,9 @@ def assert_approx_eq(a: int, b: int, max_delta: int):
     assert True
 
 
-def uint_array(l):
-    return list(map(to_uint, l))
-
-
-def uarr2cd(arr):
-    acc = [len(arr)]
-    for lo, hi in arr:
-        acc.append(lo)
-        acc.append(hi)
-    return acc
-
-
-def get_next_level(level):
-    next_level = []
-
-    for i in range(0, len(level), 2):
-        node = 0
-        if level[i] < level[i + 1]:
-            node = pedersen_hash(level[i], level[i + 1])
-        else:
-            node = pedersen_hash(level[i + 1], level[i])
-
-        next_level.append(node)
-
-    return next_level
+def get_next_level(level, executor=None):
+    """Hashes `level` pair by pair, on `executor` workers when the level is wide enough."""
+    return map_chunks(hash_level_chunk, level, executor)
 
 
 def generate_proof_helper(level, index, proof):
@@ -251,15 +490,15 @@ def generate_merkle_proof(values, index):
     return generate_proof_helper(values, index, [])
 
 
-def generate_merkle_root(values):
+def generate_merkle_root(values, executor=None):
     if len(values) == 1:
         return values[0]
 
     if len(values) % 2 != 0:
         values.append(0)
 
-    next_level = get_next_level(values)
-    return generate_merkle_root(next_level)
+    next_level = get_next_level(values, executor)
+    return generate_merkle_root(next_level, executor)
 
 
 def verify_merkle_proof(leaf, proof):
@@ -276,6 +515,18 @@ def verify_merkle_proof(leaf, proof):
     return curr == root
 
 
+def generate_merkle_multi_proof(values, indices, executor=None):
+    """Returns the `(proof, proof_flags)` multiproof of the leaves at the sorted `indices`."""
+    return MerkleTree(values, executor).get_multi_proof(indices)
+
+
+def verify_merkle_multi_proof(leaves, root, proof, proof_flags):
+    try:
+        return process_multi_proof(leaves, proof, proof_flags) == root
+    except (ValueError, IndexError, StopIteration):
+        return False
+
+
 def get_leaf(recipient, amount):
     # amount_hash = pedersen_hash(amount, 0)
     leaf = pedersen_hash(recipient, amount)
@@ -285,15 +536,13 @@ def get_leaf(recipient, amount):
 # creates the inital merkle leaf values to use
 
 
-def get_leaves(recipients, amounts):
-    values = []
-    for i in range(0, len(recipients)):
-        leaf = get_leaf(recipients[i], amounts[i])
-        value = (leaf, recipients[i], amounts[i])
-        values.append(value)
+def get_leaves(recipients, amounts, executor=None):
+    leaves = map_chunks(hash_leaves_chunk, list(
+        zip(recipients, amounts)), executor)
+    values = list(zip(leaves, recipients, amounts))
 
     if len(values) % 2 != 0:
         last_value = (0, 0, 0)
         values.append(last_value)
 
-    return values
\ No newline at end of file
+    return values